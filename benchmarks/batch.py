@@ -0,0 +1,52 @@
+"""
+Compares running many short scripts that require the standard library as separate pylisp processes
+with the batch runner (pylisp.batch), which loads the library once and forks a process per script.
+Usage (from the repository root): python -m benchmarks.batch [count of scripts] [jobs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pylisp.batch import run_batch
+
+STDLIB = os.path.abspath("stdlib.cl")
+SCRIPT = '(require! "{0}")\n(print! (sum (map (fun (x) (* x {1})) (list 1 2 3 4 5))))\n'
+
+
+def separate_processes(scripts, jobs):
+    processes = []
+    for path in scripts:
+        if len(processes) >= jobs:
+            processes.pop(0).wait()
+        processes.append(subprocess.Popen([sys.executable, "-m", "pylisp.shell", path], stdout=subprocess.DEVNULL))
+    for process in processes:
+        process.wait()
+
+
+def batch(scripts, jobs):
+    results = run_batch(scripts, preload=[STDLIB], jobs=jobs)
+    assert all(result.status == 0 for result in results)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as directory:
+        scripts = []
+        for idx in range(count):
+            path = os.path.join(directory, f"script{idx}.cl")
+            with open(path, "w") as f:
+                f.write(SCRIPT.format(STDLIB, idx))
+            scripts.append(path)
+        print(f"{count} scripts, {jobs} jobs")
+        for name, run in (("separate processes", separate_processes), ("batch", batch)):
+            start = time.perf_counter()
+            run(scripts, jobs)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20} {elapsed:8.3f}s  {count / elapsed:8.1f} scripts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Measures the memory held by closures: creates many small lambdas in an environment with the builtins and stdlib.cl
+and reports the traced allocation per closure, compared with a full copy of the environment.
+Usage (from the repository root): python -m benchmarks.closure_memory [closure count]
+"""
+import sys
+import tracemalloc
+
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, represent_code, interpret_file
+from pylisp.parser import Parser
+
+
+def allocated_per_item(count, make):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [make() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    env = environment_with_builtins(builtins)
+    with open("stdlib.cl") as f:
+        interpret_file(f, env)
+    lambda_form = represent_code(Parser().parse_expr("(fun (x) (+ x 1))"))
+    print(f"environment size: {len(env._mapping)} bindings")
+    print(f"full environment copy: {allocated_per_item(count, env.fork):10.0f} bytes")
+    print(f"closure:               {allocated_per_item(count, lambda: interpret(lambda_form, env)):10.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
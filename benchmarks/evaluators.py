@@ -0,0 +1,55 @@
+"""
+Compares the recursive interpret with the explicit-continuation evaluator (pylisp.cek)
+on a shallow workload (naive fib) and on deep non-tail recursion.
+Usage (from the repository root): python -m benchmarks.evaluators
+"""
+import time
+
+from pylisp.builtins import builtins
+from pylisp.cek import evaluate
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, represent_code
+from pylisp.parser import Parser
+
+DEFINITIONS = [
+    "(define! fib (letrec ((fib (fun (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))) fib))",
+    "(define! sum-to (letrec ((sum-to (fun (n) (if (= n 0) 0 (+ n (sum-to (- n 1))))))) sum-to))",
+]
+
+WORKLOADS = [
+    ("fib 18 (shallow)", "(fib 18)"),
+    ("sum-to 50 (deep)", "(sum-to 50)"),
+    ("sum-to 100 (deep)", "(sum-to 100)"),
+    ("sum-to 10000 (deep)", "(sum-to 10000)"),
+    ("sum-to 200000 (deep)", "(sum-to 200000)"),
+]
+
+
+def best_time(evaluator, form, env, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        evaluator(form, env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    env = environment_with_builtins(builtins)
+    for definition in DEFINITIONS:
+        interpret(represent_code(Parser().parse_expr(definition)), env)
+    print(f"{'workload':<24} {'interpret':>12} {'cek':>12}")
+    for name, code in WORKLOADS:
+        form = represent_code(Parser().parse_expr(code))
+        results = []
+        for evaluator in (interpret, evaluate):
+            try:
+                results.append(f"{best_time(evaluator, form, env):11.3f}s")
+            except RecursionError:
+                results.append("RecursionError")
+        print(f"{name:<24} {results[0]:>12} {results[1]:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares loading a large library of defun definitions (expanded by the macro of stdlib.cl) with and without
+hash-consing of code (see pylisp.interpreter.HashConsing): the load time, the memory held by the loaded library
+(once, and twice - like a library required again, or by separate environments) and the time of comparing the code
+of the two loads.
+Usage (from the repository root): python -m benchmarks.hash_consing [count of definitions]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, code_parser, hash_consing
+
+DEFUN = "(define! defun (macro (name args body) `(define! ,name (fun ,args ,body))))\n"
+
+# a few idioms repeated across the library, as in real code
+BODIES = [
+    "(if (nil? lst) 0 (+ 1 (f{0} (tail lst))))",
+    "(if (< n 2) n (+ (f{0} (- n 1)) (f{0} (- n 2))))",
+    "(if (nil? lst) acc (f{0} (tail lst) (cons (head lst) acc)))",
+    '(list "item" (quote (a b c)) (+ n 1))',
+]
+ARGS = ["(lst)", "(n)", "(lst acc)", "(n)"]
+
+
+def library(count: int) -> str:
+    return DEFUN + "".join(f"(defun f{idx} {ARGS[idx % 4]} {BODIES[idx % 4].format(idx)})\n"
+                           for idx in range(count))
+
+
+def load(text: str):
+    env = environment_with_builtins(builtins)
+    forms = code_parser().parse_file(text)
+    for form in forms:
+        interpret(form, env)
+    return env, forms
+
+
+def measure(text: str, enabled: bool):
+    hash_consing.enabled = enabled
+    start = time.perf_counter()
+    loaded = load(text)
+    elapsed = time.perf_counter() - start
+    del loaded
+    gc.collect()
+    tracemalloc.start()
+    loaded = load(text)
+    gc.collect()
+    once = tracemalloc.get_traced_memory()[0]
+    again = load(text)
+    gc.collect()
+    twice = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    assert loaded[1] == again[1]
+    comparison = time.perf_counter() - start
+    hash_consing.enabled = False
+    hash_consing.clear()
+    return elapsed, once, twice, comparison
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text = library(count)
+    print(f"source: {count} definitions, {len(text)} characters")
+    for name, enabled in (("fresh cells", False), ("hash-consed", True)):
+        elapsed, once, twice, comparison = measure(text, enabled)
+        print(f"{name:<12} load {elapsed:7.3f}s  held: loaded once {once / 2 ** 20:6.1f} MiB,"
+              f" twice {twice / 2 ** 20:6.1f} MiB  comparing the loads {comparison * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures the cost of keeping the diagnostics of a large document up to date while it is edited: parsing the whole
+text after every keystroke versus the incremental pylisp.document.Document.
+Usage (from the repository root): python -m benchmarks.incremental_parse [count of definitions]
+"""
+import sys
+import time
+
+from parsy import ParseError
+
+from pylisp.document import Document
+from pylisp.interpreter import code_parser
+
+DEFINITION = '(define! f{0} (fun (n lst) (if (< n {0}) (cons (+ n {0}) lst) (list "item {0}" n (quote (a b c))))))\n'
+TYPED = "(print! (f1 2 nil))"
+
+
+def keystrokes(text):
+    """
+    Yields the texts after typing TYPED character by character in the middle of the text.
+    """
+    middle = text.index("(define!", len(text) // 2)
+    for idx in range(1, len(TYPED) + 1):
+        yield text[:middle] + TYPED[:idx] + "\n" + text[middle:]
+
+
+def whole_parse(text):
+    parser = code_parser()
+    start = time.perf_counter()
+    for edited in keystrokes(text):
+        try:
+            parser.parse_file(edited)
+        except ParseError:
+            pass  # the unfinished form makes the whole text invalid
+    return time.perf_counter() - start
+
+
+def incremental(text):
+    document = Document(text)  # parsed when the document is opened
+    start = time.perf_counter()
+    for edited in keystrokes(text):
+        document.update(edited)
+        document.errors()
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    text = "".join(DEFINITION.format(idx) for idx in range(count))
+    print(f"source: {count} definitions, {len(text)} characters, {len(TYPED)} keystrokes")
+    start = time.perf_counter()
+    Document(text)
+    print(f"{'initial document parse':<24} {time.perf_counter() - start:8.3f}s")
+    for name, edit in (("whole text per keystroke", whole_parse), ("incremental", incremental)):
+        elapsed = edit(text)
+        print(f"{name:<24} {elapsed:8.3f}s  {elapsed / len(TYPED) * 1000:8.2f} ms per keystroke")
+
+
+if __name__ == "__main__":
+    main()
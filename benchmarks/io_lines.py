@@ -0,0 +1,63 @@
+"""
+Compares the line throughput of the console based readline! with the file handle builtins.
+Usage (from the repository root): python -m benchmarks.io_lines [line count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, represent_code
+from pylisp.parser import Parser
+
+
+def run(code, env):
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def measure(name, lines, action):
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s {lines / elapsed:12.0f} lines/s")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w") as f:
+        for i in range(lines):
+            f.write(f"line number {i} with some payload\n")
+
+    try:
+        env = environment_with_builtins(builtins)
+        read_line_form = represent_code(Parser().parse_expr("(readline!)"))
+
+        def console_readline():
+            stdin = sys.stdin
+            with open(path) as sys.stdin:
+                for _ in range(lines):
+                    interpret(read_line_form, env)
+            sys.stdin = stdin
+        measure("readline! (console)", lines, console_readline)
+
+        def buffered_read_line():
+            run(f'(define! f (open! "{path}"))', env)
+            form = represent_code(Parser().parse_expr("(read-line! f)"))
+            for _ in range(lines):
+                interpret(form, env)
+            run("(close! f)", env)
+        measure("read-line! (buffered)", lines, buffered_read_line)
+
+        measure("read-lines! stream", lines,
+                lambda: run(f'(let (f (open! "{path}")) (stream->list (read-lines! f)))', env))
+        measure("mmap-lines! stream", lines, lambda: run(f'(stream->list (mmap-lines! "{path}"))', env))
+        measure("read-all! + split", lines, lambda: run(f'(split (read-all! (open! "{path}")) "\n")', env))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
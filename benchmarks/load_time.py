@@ -0,0 +1,46 @@
+"""
+Compares loading a large source through an AST (Parser and represent_code) with reading code values directly
+(pylisp.interpreter.code_parser): the time and the peak of traced memory.
+Usage (from the repository root): python -m benchmarks.load_time [count of definitions]
+"""
+import sys
+import time
+import tracemalloc
+
+from pylisp.interpreter import represent_code, code_parser
+from pylisp.parser import Parser
+
+DEFINITION = '(define! f{0} (fun (n lst) (if (< n {0}) (cons (+ n {0}) lst) (list "item {0}" n (quote (a b c))))))\n'
+
+
+def through_ast(text):
+    return [represent_code(tree) for tree in Parser().parse_file(text)]
+
+
+def direct(text):
+    return code_parser().parse_file(text)
+
+
+def measure(load, text):
+    start = time.perf_counter()
+    load(text)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    code = load(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del code
+    return elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = "".join(DEFINITION.format(idx) for idx in range(count))
+    print(f"source: {count} definitions, {len(text)} characters")
+    for name, load in (("ast + represent_code", through_ast), ("direct code values", direct)):
+        elapsed, peak = measure(load, text)
+        print(f"{name:<22} {elapsed:8.3f}s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
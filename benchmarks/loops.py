@@ -0,0 +1,95 @@
+"""
+Compares filling and summing a Block with recursive functions (the only way to loop without the loop forms)
+and with dotimes and for-each: the time per element, and the longest block each of them can process.
+The recursive loops are limited by the Python stack, so they are run from Python on chunks of 40 elements.
+Usage (from the repository root): python -m benchmarks.loops [count of elements]
+"""
+import sys
+import time
+
+from pylisp.builtins import builtins
+from pylisp.compiler import tiering
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, code_parser
+
+CHUNK = 40
+
+RECURSIVE = """
+(define! fill (letrec ((fill (fun (b i n) (if (< i n) (begin (set! b i (* i i)) (fill b (+ i 1) n)) b)))) fill))
+(define! sum (letrec ((sum (fun (b i n acc) (if (< i n) (sum b (+ i 1) n (+ acc (get! b i))) acc)))) sum))
+"""
+
+LOOPS = """
+(define! run (fun (n) (let (b (alloc! n)) (let (total (alloc! 1)) (begin
+    (dotimes (i n) (set! b i (* i i)))
+    (set! total 0 0)
+    (for-each (x b) (set! total 0 (+ (get! total 0) x)))
+    (get! total 0))))))
+"""
+
+
+def prepare(definitions):
+    env = environment_with_builtins(builtins)
+    for statement in code_parser().parse_file(definitions.strip()):
+        interpret(statement, env)
+    return env
+
+
+def measure_recursive(count):
+    env = prepare(RECURSIVE)
+    parser = code_parser()
+    env.update("b", interpret(parser.parse_expr(f"(alloc! {count})"), env))
+    fill = [parser.parse_expr(f"(fill b {i} {i + CHUNK})") for i in range(0, count, CHUNK)]
+    chunk_sums = [parser.parse_expr(f"(sum b {i} {i + CHUNK} 0)") for i in range(0, count, CHUNK)]
+    start = time.perf_counter()
+    for term in fill:
+        interpret(term, env)
+    result = sum(interpret(term, env) for term in chunk_sums)
+    elapsed = time.perf_counter() - start
+    assert result == sum(i * i for i in range(count))
+    return elapsed
+
+
+def measure_loops(count):
+    env = prepare(LOOPS)
+    start = time.perf_counter()
+    result = interpret(code_parser().parse_expr(f"(run {count})"), env)
+    elapsed = time.perf_counter() - start
+    assert result == sum(i * i for i in range(count))
+    return elapsed
+
+
+def longest(definitions, count):
+    """
+    Returns the length of the longest block processed in one recursive loop (up to count).
+    """
+    env = prepare(definitions)
+    length = 1
+    while length < count:
+        try:
+            interpret(code_parser().parse_expr(f"(fill (alloc! {length * 2}) 0 {length * 2})"), env)
+        except (LispError, RecursionError):
+            break
+        length *= 2
+    return length
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    count -= count % CHUNK
+    default_threshold = tiering.threshold
+    for name, measure, threshold in (("recursive, interpreted", measure_recursive, None),
+                                     ("recursive, compiled", measure_recursive, default_threshold),
+                                     ("dotimes/for-each", measure_loops, default_threshold)):
+        tiering.threshold = threshold
+        elapsed = measure(count)
+        print(f"{name:<24} {count} elements {elapsed:8.3f}s  {elapsed / count * 1e9:7.0f} ns per element")
+    tiering.threshold = None
+    print(f"longest block filled by one recursive loop: about {longest(RECURSIVE, count)} elements,"
+          f" by dotimes: {count} elements")
+    tiering.threshold = default_threshold
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Compares expanding a macro that builds its code with list and quote with one filling a quasiquote template.
+Usage (from the repository root): python -m benchmarks.macro_expansion [expansion count]
+"""
+import sys
+import time
+
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, represent_code
+from pylisp.parser import Parser
+
+MACROS = {
+    "list/quote": "(macro (name args body) (list 'define! name (list 'letrec (list (list name (list 'fun args body))) name)))",
+    "quasiquote": "(macro (name args body) `(define! ,name (letrec ((,name (fun ,args ,body))) ,name)))",
+}
+
+
+def best_time(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    parser = Parser()
+    args = [represent_code(parser.parse_expr(code)) for code in ("f", "(x)", "(+ x 1)")]
+    for name, code in MACROS.items():
+        macro = interpret(represent_code(parser.parse_expr(code)), environment_with_builtins(builtins))
+
+        def expand():
+            for _ in range(count):
+                macro(args)
+        elapsed = best_time(expand)
+        print(f"{name:<12} {count / elapsed:10.0f} expansions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares handing a large array of ints to another process (pickling it, as a pool of workers does with its
+arguments) as a Block, whose values are copied, and as a shared block, which is passed by its name;
+and loading a binary file of ints into a Block with mapping it (mmap-block!).
+Usage (from the repository root): python -m benchmarks.shared_blocks [count of elements]
+"""
+import array
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from pylisp.blocks import Block, MappedBlock, create_shared_block
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def transfer(block):
+    data = pickle.dumps(block)
+    copy = pickle.loads(data)
+    return len(data), copy
+
+
+def load_into_block(path):
+    values = array.array("q")
+    with open(path, "rb") as f:
+        values.frombytes(f.read())
+    block = Block(len(values))
+    block.values = values.tolist()
+    return block
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    block = Block(count)
+    shared = create_shared_block(count)
+    for idx in range(count):
+        block.set(idx, idx)
+        shared.set(idx, idx)
+    print(f"{count} int64 elements")
+    for name, value in (("Block", block), ("shared block", shared)):
+        elapsed, (size, copy) = timed(lambda: transfer(value))
+        assert copy.get(count - 1) == count - 1
+        print(f"pass a {name:<14} {elapsed * 1000:10.2f} ms  {size:>10} bytes pickled")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.bin")
+        with open(path, "wb") as f:
+            array.array("q", range(count)).tofile(f)
+        for name, load in (("read into a Block", load_into_block), ("mmap-block!", MappedBlock)):
+            elapsed, loaded = timed(lambda: load(path))
+            assert loaded.get(count - 1) == count - 1
+            print(f"{name:<21} {elapsed * 1000:10.2f} ms")
+            if isinstance(loaded, MappedBlock):
+                loaded.release()
+    shared.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares running hot functions in the interpreter with running them compiled (see pylisp.compiler):
+a recursive fib, a traversal of a list and a loop over a Block.
+Usage (from the repository root): python -m benchmarks.tiering
+"""
+import time
+
+from pylisp.builtins import builtins
+from pylisp.compiler import tiering
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, represent_code
+from pylisp.parser import Parser
+
+DEFINITIONS = [
+    "(define! fib (letrec ((fib (fun (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))) fib))",
+    "(define! length (letrec ((length (fun (lst) (if (nil? lst) 0 (+ 1 (length (tail lst))))))) length))",
+    "(define! fill (letrec ((fill (fun (b i n) (if (< i n) (begin (set! b i (* i i)) (fill b (+ i 1) n)) b)))) fill))",
+    "(define! numbers (list " + " ".join(map(str, range(40))) + "))",
+    "(define! block (alloc! 40))",
+]
+
+WORKLOADS = {
+    "fib 20": "(fib 20)",
+    "list traversal": "(length numbers)",
+    "block loop": "(fill block 0 40)",
+}
+
+
+def run(code, count, threshold):
+    tiering.threshold = threshold
+    parser = Parser()
+    env = environment_with_builtins(builtins)
+    for definition in DEFINITIONS:
+        interpret(represent_code(parser.parse_expr(definition)), env)
+    term = represent_code(parser.parse_expr(code))
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            interpret(term, env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    default_threshold = tiering.threshold
+    for name, code in WORKLOADS.items():
+        count = 1 if name.startswith("fib") else 500
+        interpreted = run(code, count, None)
+        compiled = run(code, count, default_threshold)
+        print(f"{name:<16} interpreted {interpreted:8.4f}s  compiled {compiled:8.4f}s"
+              f"  speedup {interpreted / compiled:5.1f}x")
+    tiering.threshold = default_threshold
+
+
+if __name__ == "__main__":
+    main()
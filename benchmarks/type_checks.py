@@ -0,0 +1,79 @@
+"""
+Reports how many operand type checks the type inference pass (see pylisp.inference) eliminates
+in the functions of stdlib.cl and of the benchmarks, and the speedup of the interpreter on the benchmark functions.
+Usage (from the repository root): python -m benchmarks.type_checks
+"""
+import time
+
+from benchmarks import evaluators, tiering
+from pylisp.builtins import builtins, Closure
+from pylisp.compiler import tiering as tiering_settings
+from pylisp.environment import environment_with_builtins
+from pylisp.inference import inference, specialize
+from pylisp.interpreter import interpret, represent_code, interpret_file
+from pylisp.parser import Parser
+
+SOURCES = {
+    "stdlib.cl": ["stdlib.cl"],
+    "benchmarks/evaluators.py": evaluators.DEFINITIONS,
+    "benchmarks/tiering.py": tiering.DEFINITIONS,
+}
+
+
+def load(source):
+    env = environment_with_builtins(builtins)
+    if source == ["stdlib.cl"]:
+        with open("stdlib.cl") as f:
+            interpret_file(f, env)
+    else:
+        for definition in source:
+            interpret(represent_code(Parser().parse_expr(definition)), env)
+    return env
+
+
+def report_checks():
+    print(f"{'source':<26} {'functions':>9} {'checks':>7} {'eliminated':>10}")
+    for name, source in SOURCES.items():
+        inference.reset()
+        env = load(source)
+        functions = [value for value in env.bindings() if isinstance(value, Closure)]
+        for function in functions:
+            specialize(function.args, function.body, function.env)
+        print(f"{name:<26} {len(functions):>9} {inference.checks:>7} {inference.eliminated:>10}")
+
+
+def best_time(code, env, count):
+    form = represent_code(Parser().parse_expr(code))
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            interpret(form, env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report_speedup(threshold):
+    tiering_settings.threshold = threshold
+    for name, code in tiering.WORKLOADS.items():
+        count = 1 if name.startswith("fib") else 500
+        times = []
+        for enabled in (False, True):
+            inference.enabled = enabled
+            times.append(best_time(code, load(tiering.DEFINITIONS), count))
+        print(f"{name:<16} checked {times[0]:8.4f}s  inferred {times[1]:8.4f}s  speedup {times[0] / times[1]:5.2f}x")
+
+
+def main():
+    threshold = tiering_settings.threshold
+    inference.enabled = True
+    report_checks()
+    print("interpreted:")
+    report_speedup(None)
+    print("compiled (see pylisp.compiler):")
+    report_speedup(threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares immutable indexed data as cons lists (every update copies the list up to the element, every read walks it)
+with persistent vectors: the time of random updates and reads, and the memory held by all versions after the updates.
+Usage (from the repository root): python -m benchmarks.vectors [count of elements] [count of updates]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from pylisp.interpreter import ConsCell, python_list_to_lisp
+from pylisp.vector import PersistentVector
+
+
+def list_get(lst, idx):
+    for _ in range(idx):
+        lst = lst.tail()
+    return lst.head()
+
+
+def list_assoc(lst, idx, value):
+    prefix = []
+    for _ in range(idx):
+        prefix.append(lst.head())
+        lst = lst.tail()
+    result = ConsCell(value, lst.tail())
+    for element in reversed(prefix):
+        result = ConsCell(element, result)
+    return result
+
+
+def apply_updates(data, assoc, indices) -> list:
+    versions = [data]
+    for idx in indices:
+        versions.append(assoc(versions[-1], idx, -idx))
+    return versions
+
+
+def measure(name, data, get, assoc, indices):
+    start = time.perf_counter()
+    versions = apply_updates(data, assoc, indices)
+    updates = time.perf_counter() - start
+    start = time.perf_counter()
+    for idx in indices:
+        get(versions[-1], idx)
+    reads = time.perf_counter() - start
+    del versions
+    tracemalloc.start()
+    versions = apply_updates(data, assoc, indices)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del versions
+    print(f"{name:<8} updates {updates * 1000:9.1f} ms  reads {reads * 1000:9.1f} ms"
+          f"  all versions {memory / 2 ** 20:8.1f} MiB")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(0)
+    indices = [rng.randrange(count) for _ in range(updates)]
+    print(f"{count} elements, {updates} random updates and reads")
+    measure("list", python_list_to_lisp(list(range(count))), list_get, list_assoc, indices)
+    measure("vector", PersistentVector.from_iterable(range(count)), PersistentVector.get, PersistentVector.assoc,
+            indices)
+    start = time.perf_counter()
+    vector = PersistentVector()
+    for value in range(count):
+        vector = vector.push(value)
+    pushes = time.perf_counter() - start
+    start = time.perf_counter()
+    PersistentVector.from_iterable(range(count))
+    transient = time.perf_counter() - start
+    print(f"build by vpush {pushes * 1000:8.1f} ms, with a transient {transient * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,11 @@ class Tree:
     The parser returns an AST which is an abstract representation of the parsed program,
     this could be used for example for easier implementation of syntax analysis.
     Later the AST can be represented to our value representation that can then be interpreted.
+    The interpreter itself reads code values directly (see pylisp.interpreter.code_parser),
+    ASTs are kept for tooling, so the nodes are kept compact with __slots__.
     """
+    __slots__ = ()
+
     def visit(self,
               identifier: Callable[["Identifier"], T],
               intlit: Callable[["IntLiteral"], T],
@@ -29,6 +33,8 @@ class Tree:
 
 
 class Identifier(Tree):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         super().__init__()
         self.name = name
@@ -51,6 +57,8 @@ class Identifier(Tree):
 
 
 class Literal(Tree):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
         self.value = value
@@ -73,6 +81,8 @@ class Literal(Tree):
 
 
 class IntLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value)
 
@@ -89,6 +99,8 @@ class IntLiteral(Literal):
 
 
 class StringLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value)
 
@@ -105,6 +117,8 @@ class StringLiteral(Literal):
 
 
 class ExpressionList(Tree):
+    __slots__ = ("values",)
+
     def __init__(self, values):
         super().__init__()
         self.values = values
@@ -0,0 +1,159 @@
+"""
+Running many short scripts in parallel, from an interpreter with the shared libraries already loaded.
+
+The files to preload are evaluated once, in the batch process. Every script is then run in its own process forked
+from it, so it starts with the warm environment - shared with the batch process copy-on-write - and cannot affect
+the other scripts. In the scripts, require! of a preloaded file does nothing, as its definitions are already there.
+The output of every script is captured and sent back with its result. A script exceeding its budget is aborted
+(see pylisp.budget.Budget), one that is stuck in a blocking builtin is killed a bit after its timeout.
+"""
+import gc
+import io
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+from contextlib import redirect_stdout, nullcontext
+from typing import List, Optional, Sequence
+
+from parsy import ParseError
+
+from pylisp.budget import Budget
+from pylisp.builtins import builtins, preloaded
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import BudgetExceeded, LispError
+from pylisp.interpreter import interpret, interpret_file
+
+# exit statuses of the scripts, the same as of pylisp running them
+SUCCEEDED = 0
+FAILED = 1
+ABORTED = 3
+
+# how long after its timeout a script that has not been aborted by its budget is killed, and how often it is checked
+KILL_GRACE_PERIOD = 1.0
+KILL_CHECK_INTERVAL = 0.1
+
+
+class ScriptResult:
+    """
+    The outcome of a script run by the batch runner.
+    status - SUCCEEDED, FAILED (an error, or the worker process died) or ABORTED (the budget has been exceeded)
+    output - what the script printed, error - the description of the error
+    elapsed - the time the script took to run, in seconds
+    """
+    def __init__(self, path: str, status: int, output: str, error: Optional[str], elapsed: float):
+        self.path = path
+        self.status = status
+        self.output = output
+        self.error = error
+        self.elapsed = elapsed
+
+
+# the environment with the preloaded files, the evaluator and the budget limits, while a batch is being run;
+# the worker processes inherit it when they are forked
+_warm = None
+
+
+def _run_script(path: str) -> ScriptResult:
+    env, evaluator, max_steps, timeout = _warm
+    output = io.StringIO()
+    status, error = SUCCEEDED, None
+    budget = Budget(max_steps=max_steps, timeout=timeout) \
+        if max_steps is not None or timeout is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with open(path) as f, redirect_stdout(output), budget:
+            interpret_file(f, env, evaluator)
+    except BudgetExceeded as e:
+        status, error = ABORTED, f"Aborted: {e}"
+    except LispError as e:
+        status, error = FAILED, f"Runtime error: {e}"
+    except ParseError as e:
+        status, error = FAILED, f"Parse error: {e}"
+    except (OSError, RecursionError) as e:
+        status, error = FAILED, f"Error: {e}"
+    return ScriptResult(path, status, output.getvalue(), error, time.perf_counter() - start)
+
+
+def _worker(path: str, connection):
+    connection.send(_run_script(path))
+    connection.close()
+
+
+def run_batch(scripts: Sequence[str], preload: Sequence[str] = (), jobs: Optional[int] = None,
+              max_steps: Optional[int] = None, timeout: Optional[float] = None,
+              evaluator=interpret) -> List[ScriptResult]:
+    """
+    Runs the scripts in up to jobs parallel processes (by default as many as there are CPUs), each of them
+    in the environment with the preloaded files and limited by the budget. Returns the results in the order
+    of the scripts. Errors in the preloaded files are raised.
+    """
+    global _warm
+    env = environment_with_builtins(builtins)
+    for path in preload:
+        with open(path) as f:
+            interpret_file(f, env, evaluator)
+    paths = {os.path.abspath(path) for path in preload} - preloaded
+    preloaded.update(paths)
+    _warm = (env, evaluator, max_steps, timeout)
+    # the objects existing now are not visited by the garbage collector of the workers,
+    # which would copy the memory pages they are in
+    gc.freeze()
+    try:
+        return _run_workers(scripts, jobs or os.cpu_count() or 1, timeout)
+    finally:
+        gc.unfreeze()
+        _warm = None
+        preloaded.difference_update(paths)
+
+
+def _run_workers(scripts: Sequence[str], jobs: int, timeout: Optional[float]) -> List[ScriptResult]:
+    context = multiprocessing.get_context("fork")
+    results = [None] * len(scripts)
+    pending = list(reversed(list(enumerate(scripts))))
+    running = {}  # connection receiving the result -> (index of the script, its process, start time)
+    while pending or running:
+        while pending and len(running) < jobs:
+            idx, path = pending.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_worker, args=(path, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (idx, process, time.monotonic())
+        for receiver in wait(list(running), timeout=KILL_CHECK_INTERVAL if timeout is not None else None):
+            idx, process, started = running.pop(receiver)
+            try:
+                results[idx] = receiver.recv()
+            except EOFError:
+                results[idx] = ScriptResult(scripts[idx], FAILED, "", "Error: the worker process died",
+                                            time.monotonic() - started)
+            receiver.close()
+            process.join()
+        if timeout is not None:
+            # the budget cannot interrupt a blocking builtin, such scripts are killed
+            for receiver, (idx, process, started) in list(running.items()):
+                elapsed = time.monotonic() - started
+                if elapsed > timeout + KILL_GRACE_PERIOD:
+                    process.kill()
+                    process.join()
+                    receiver.close()
+                    del running[receiver]
+                    results[idx] = ScriptResult(scripts[idx], ABORTED, "",
+                                                f"Aborted: killed after {elapsed:.1f} seconds", elapsed)
+    return results
+
+
+def report(results: List[ScriptResult], elapsed: float, jobs: int) -> str:
+    """
+    Returns the summary of a batch: the failures and the aggregate throughput.
+    """
+    lines = [f"{result.path}: exit status {result.status}, {result.error}"
+             for result in results if result.status != SUCCEEDED]
+    succeeded = sum(result.status == SUCCEEDED for result in results)
+    aborted = sum(result.status == ABORTED for result in results)
+    busy = sum(result.elapsed for result in results)
+    throughput = len(results) / elapsed if elapsed > 0 else float("inf")
+    lines.append(f"{len(results)} scripts in {elapsed:.2f}s with {jobs} jobs ({throughput:.1f} scripts/s,"
+                 f" {busy:.2f}s spent in the scripts): {succeeded} succeeded,"
+                 f" {len(results) - succeeded - aborted} failed, {aborted} aborted")
+    return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""
+Blocks - the imperative arrays of the language.
+
+A Block holds any values in a Python list. Blocks of fixed-width numbers can instead live outside of the Python heap
+(the values are then a memoryview of the buffer), get! and set! work with them the same way:
+- shared blocks are in shared memory (multiprocessing.shared_memory), other processes can attach to them by name
+  and work with the same values without copying them - a shared block is pickled as its name,
+- mapped blocks are binary files mapped into memory, so large datasets are loaded without reading and copying them.
+"""
+import functools
+import mmap
+import os
+import struct
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+from pylisp.errors import LispError
+from pylisp.interpreter import lisp_data_to_str
+
+# names of the element types of buffer blocks -> memoryview formats
+ELEMENT_TYPES = {"int8": "b", "uint8": "B", "int16": "h", "int32": "i", "int64": "q", "float64": "d"}
+
+# a shared memory segment starts with the name of the element type and the count of elements
+_HEADER = struct.Struct("<8sq")
+
+
+class Block:
+    """
+    An instance of block, can be used to handle imperative arrays in the language.
+    """
+    def __init__(self, size):
+        self.values = [None] * size
+
+    def set(self, idx, value):
+        if idx < 0 or idx >= len(self.values):
+            raise LispError(f"Index {idx} is out of bounds")
+        self.values[idx] = value
+
+    def get(self, idx):
+        if idx < 0 or idx >= len(self.values):
+            raise LispError(f"Index {idx} is out of bounds")
+        return self.values[idx]
+
+    def size(self) -> int:
+        return len(self.values)
+
+    def __str__(self):
+        return f"<allocated block of size {len(self.values)}>"
+
+
+def _item_format(element_type) -> str:
+    if element_type not in ELEMENT_TYPES:
+        raise LispError(f"Unsupported element type: {element_type}, use one of {', '.join(ELEMENT_TYPES)}")
+    return ELEMENT_TYPES[element_type]
+
+
+def _release(views, close):
+    for view in views:
+        view.release()
+    close()
+
+
+class BufferBlock(Block):
+    """
+    A Block of fixed-width numbers stored in a buffer, element_type is one of ELEMENT_TYPES.
+    The buffer is released by release() or when the block is garbage collected, the block cannot be used after that.
+    """
+    def __init__(self, buffer: memoryview, element_type: str, close):
+        """
+        buffer - bytes of the elements, close - the function closing the object they are stored in,
+                 called when the block is released
+        """
+        self.element_type = element_type
+        self.values = buffer.cast(_item_format(element_type))
+        self._finalizer = weakref.finalize(self, _release, (self.values, buffer), close)
+
+    kind = "buffer"
+
+    def set(self, idx, value):
+        try:
+            super().set(idx, value)
+        except (TypeError, ValueError) as e:  # a value of another type or out of the range, or a released block
+            self._ensure_not_released()
+            raise LispError(f"Cannot store {lisp_data_to_str(value)} in a block of {self.element_type}") from e
+
+    def get(self, idx):
+        try:
+            return super().get(idx)
+        except ValueError:
+            self._ensure_not_released()
+            raise
+
+    def size(self) -> int:
+        self._ensure_not_released()
+        return len(self.values)
+
+    def release(self):
+        self._finalizer()
+
+    def _ensure_not_released(self):
+        if not self._finalizer.alive:
+            raise LispError("The block has been released")
+
+    def __str__(self):
+        state = f"of size {len(self.values)}" if self._finalizer.alive else "(released)"
+        return f"<{self.kind} block of {self.element_type} {state}>"
+
+
+class SharedBlock(BufferBlock):
+    """
+    A Block in shared memory, see the module documentation.
+    The process that has created it removes the shared memory when the block is released (or garbage collected),
+    the processes which have attached to it keep their mappings until they release them.
+    Processes started by multiprocessing share the resource tracker of their parent, in an unrelated process
+    the tracker removes the shared memory it has attached to when the process exits.
+    """
+    kind = "shared"
+
+    def __init__(self, memory: SharedMemory, owner_pid: int = None):
+        """
+        owner_pid - the process that removes the shared memory when the block is released (None if this is not
+                    the one), a forked process does not remove the memory of its parent
+        """
+        name, count = _HEADER.unpack_from(memory.buf)
+        element_type = name.rstrip(b"\0").decode("ascii")
+        size = count * struct.calcsize(_item_format(element_type))
+        self.name = memory.name
+        super().__init__(memory.buf[_HEADER.size:_HEADER.size + size], element_type,
+                         functools.partial(_close_shared_memory, memory, owner_pid))
+
+    def __reduce__(self):
+        return attach_shared_block, (self.name,)
+
+
+def _close_shared_memory(memory: SharedMemory, owner_pid: int):
+    memory.close()
+    if owner_pid == os.getpid():
+        memory.unlink()
+
+
+def create_shared_block(count: int, element_type: str = "int64") -> SharedBlock:
+    """
+    Creates a shared block of count zeros.
+    """
+    item_size = struct.calcsize(_item_format(element_type))
+    if count < 0:
+        raise LispError("The size of a block cannot be negative")
+    memory = SharedMemory(create=True, size=_HEADER.size + count * item_size)
+    _HEADER.pack_into(memory.buf, 0, element_type.encode("ascii"), count)
+    return SharedBlock(memory, os.getpid())
+
+
+def attach_shared_block(name: str) -> SharedBlock:
+    """
+    Returns the shared block created (in any process) under the name.
+    """
+    try:
+        memory = SharedMemory(name=name)
+    except FileNotFoundError as e:
+        raise LispError(f"There is no shared block named {name}") from e
+    return SharedBlock(memory)
+
+
+class MappedBlock(BufferBlock):
+    """
+    A Block of the contents of a binary file (count elements of the type, with the native byte order), mapped into
+    memory. If the file is writable, set! writes to it, otherwise the block is read-only.
+    """
+    kind = "mapped"
+
+    def __init__(self, path: str, element_type: str = "int64"):
+        item_size = struct.calcsize(_item_format(element_type))
+        writable = os.access(path, os.W_OK)
+        try:
+            with open(path, "r+b" if writable else "rb") as f:
+                file_size = os.fstat(f.fileno()).st_size
+                if file_size % item_size != 0:
+                    raise LispError(f"The size of {path} ({file_size} bytes) is not a multiple of the size of"
+                                    f" {element_type} ({item_size} bytes)")
+                # an empty file cannot be mapped
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ) \
+                    if file_size else None
+        except (IOError, ValueError) as e:
+            raise LispError(str(e)) from e
+        self.path = path
+        self.read_only = not writable
+        if mapped is None:
+            super().__init__(memoryview(b""), element_type, lambda: None)
+        else:
+            super().__init__(memoryview(mapped), element_type, mapped.close)
+
+    def set(self, idx, value):
+        if self.read_only:
+            raise LispError(f"The block mapped from {self.path} is read-only")
+        super().set(idx, value)
+
+    def __reduce__(self):
+        return MappedBlock, (self.path, self.element_type)
@@ -0,0 +1,71 @@
+import time
+from typing import Optional
+
+from pylisp.errors import StepLimitExceeded, DepthLimitExceeded, DeadlineExceeded
+
+
+class Budget:
+    """
+    Limits of an evaluation: the maximal count of interpretation steps, the maximal nesting depth
+    of evaluated expressions and a wall-clock timeout (in seconds). Any of them can be None, meaning no limit.
+    A budget is activated for the duration of a with block:
+    > with Budget(max_steps=10000, timeout=0.5):
+    >     interpret(code, env)
+    Exceeding the budget raises a subclass of BudgetExceeded.
+    The clock is only checked every CLOCK_CHECK_INTERVAL steps, and a builtin that blocks (like readline!)
+    is not interrupted, so the timeout is enforced with some delay.
+    """
+    CLOCK_CHECK_INTERVAL = 1024
+
+    def __init__(self, max_steps: Optional[int] = None, max_depth: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.steps = 0
+        self.depth = 0
+        self.deadline = None
+        self._previous = None
+
+    def step(self):
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise StepLimitExceeded(f"Evaluation exceeded the limit of {self.max_steps} steps")
+        if self.deadline is not None and self.steps % self.CLOCK_CHECK_INTERVAL == 0 \
+                and time.monotonic() > self.deadline:
+            raise DeadlineExceeded(f"Evaluation exceeded the timeout of {self.timeout} seconds")
+
+    def enter(self):
+        self.depth += 1
+        self.check_depth(self.depth)
+
+    def check_depth(self, depth: int):
+        if self.max_depth is not None and depth > self.max_depth:
+            raise DepthLimitExceeded(f"Evaluation exceeded the maximal depth of {self.max_depth}")
+
+    def leave(self):
+        self.depth -= 1
+
+    def __enter__(self):
+        self.steps = 0
+        self.depth = 0
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        self._previous = budgets.active
+        budgets.active = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        budgets.active = self._previous
+        self._previous = None
+        return False
+
+
+class ActiveBudget:
+    """
+    Holds the budget that is currently being enforced by the interpreter (or None).
+    """
+    def __init__(self):
+        self.active = None
+
+
+budgets = ActiveBudget()
@@ -1,22 +1,45 @@
+import itertools
+import os
 import random
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
 
-from pylisp.environment import Environment
+from pylisp.blocks import Block, BufferBlock, SharedBlock, MappedBlock, create_shared_block, attach_shared_block
+from pylisp.budget import budgets
+from pylisp.compiler import tiering, compile_closure
+from pylisp.environment import Environment, fresh_version
 from pylisp.errors import LispError
+from pylisp.files import FileHandle, mmap_lines, ENCODING
+from pylisp.hamt import HashMap
+from pylisp.inference import inference, specialize
 from pylisp.interpreter import Builtin, interpret, interpret_list, interpret_file, ConsCell, python_list_to_lisp, \
-    Symbol, lisp_list_length, lisp_list_to_python, lisp_list_is_valid, lisp_data_to_str, Macro
+    Symbol, lisp_list_length, lisp_list_to_python, lisp_list_is_valid, lisp_data_to_str, Macro, \
+    lisp_data_size, error_in_form
+from pylisp.quasiquote import expand_quasiquote
+from pylisp.stats import statistics
+from pylisp.streams import Promise, Stream, stream_from_iterator, iterate_stream, stream_map, stream_filter, \
+    stream_take
+from pylisp.vector import Vector, PersistentVector, TransientVector
 
 
 class FuncBuiltin(Builtin):
     """
     A class to wrap a simple function into a 'Builtin' value.
     """
-    def __init__(self, name, arity, doc, func):
-        super().__init__(name, arity, doc)
+    def __init__(self, name, arity, doc, func, strict=None):
+        super().__init__(name, arity, doc, strict)
         self.func = func
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+    def __reduce__(self):
+        return lookup_builtin, (self.name,)  # pickled by name, so code values containing builtins can be pickled
+
+
+def lookup_builtin(name: str) -> Builtin:
+    return builtins[name]
+
 
 class FuncMacro(Macro):
     """
@@ -34,10 +57,11 @@ class FuncMacro(Macro):
 builtins = {"false": False, "true": True, "nil": None}
 
 
-def register_builtin(arity, name=None):
+def register_builtin(arity, name=None, strict=None):
     """
     A decorator to register the wrapped function as a builtin with the provided arity.
     If the name is not provided it is based on the function's __name__.
+    strict is the optional function computing the result from evaluated arguments (see Builtin).
     """
     def wrapper(func):
         nonlocal name
@@ -48,12 +72,9 @@ def register_builtin(arity, name=None):
             try:
                 return func(env, *args)
             except LispError as err:
-                reconstructed_form = python_list_to_lisp([Symbol(name)] + list(args))
-                if len(str(err).splitlines()) > 3:
-                    # we don't add more than 3 traces
-                    raise
-                raise LispError(str(err) + f"\n in: {lisp_data_to_str(reconstructed_form)}") from err
-        builtin = FuncBuiltin(name, arity, func.__doc__, syntax_wrapper)
+                # exceeded budgets are kept as they are, so that embedders can tell aborted evaluations apart
+                raise error_in_form(err, python_list_to_lisp([Symbol(name)] + list(args)))
+        builtin = FuncBuiltin(name, arity, func.__doc__, syntax_wrapper, strict)
         if builtin.name in builtins:
             raise AssertionError(f"Builtin names have to be unique: {builtin.name}")
         builtins[builtin.name] = builtin
@@ -61,12 +82,12 @@ def register_builtin(arity, name=None):
     return wrapper
 
 
-def register_vararg_builtin(name=None):
+def register_vararg_builtin(name=None, strict=None):
     """
     A decorator to register the wrapped function as a builtin with variable arity.
     If the name is not provided it is based on the function's __name__.
     """
-    return register_builtin(None, name)
+    return register_builtin(None, name, strict)
 
 
 @register_builtin(2)
@@ -78,11 +99,9 @@ def let(env: Environment, binding, body):  # this function could be a macro but
     return letrec(env, python_list_to_lisp([binding]), body)
 
 
-@register_builtin(2)
-def letrec(env: Environment, bindings, body):
+def parse_letrec_bindings(bindings) -> list:
     """
-    Allows for mutually recursive bindings.
-    (letrec ((name1 value1) ...) body)
+    Converts the bindings of a letrec form to a list of (name, code) pairs.
     """
     def form_error():
         raise LispError(f"Wrong let form: (letrec {lisp_data_to_str(bindings)} ...)")
@@ -97,7 +116,16 @@ def letrec(env: Environment, bindings, body):
             form_error()
         return symb.name, inner
 
-    bindings = list(map(process_binding, lisp_list_to_python(bindings)))
+    return list(map(process_binding, lisp_list_to_python(bindings)))
+
+
+@register_builtin(2)
+def letrec(env: Environment, bindings, body):
+    """
+    Allows for mutually recursive bindings.
+    (letrec ((name1 value1) ...) body)
+    """
+    bindings = parse_letrec_bindings(bindings)
     inner_env = env.fork()
     # we first allocate forward references to all mutually recursive bindings
     for name, _ in bindings:
@@ -121,6 +149,15 @@ def define(env: Environment, name, body):
     env.update(name.name, inner)
 
 
+def ensure_type(value, type):
+    """
+    Raises an exception if the value does not conform to the provided type.
+    """
+    if not isinstance(value, type):
+        raise LispError(f"{lisp_data_to_str(value)} is not of required type {type.__name__}")
+    return value
+
+
 def interpret_ensuring_type(term, env, type):
     """
     A helper function that interprets the term and raises an exception if it does not conform to the provided type.
@@ -132,7 +169,7 @@ def interpret_ensuring_type(term, env, type):
     return res
 
 
-@register_vararg_builtin("+")
+@register_vararg_builtin("+", strict=lambda *values: sum(ensure_type(value, int) for value in values))
 def plus(env: Environment, *args):
     """
     Computes the sum.
@@ -152,7 +189,7 @@ def register_arithmetic_builtin(name, func):
         a_val = interpret_ensuring_type(a, env, int)
         b_val = interpret_ensuring_type(b, env, int)
         return func(a_val, b_val)
-    register_builtin(2, name)(helper)
+    register_builtin(2, name, strict=lambda a, b: func(ensure_type(a, int), ensure_type(b, int)))(helper)
 
 
 def divide(a, b):
@@ -185,6 +222,188 @@ def conditional(env: Environment, cond, branch_true, branch_else):
         return interpret(branch_else, env)
 
 
+# free symbols of function bodies, keyed (structurally) by the body,
+# so that repeatedly created closures are analysed once
+_body_symbols = WeakKeyDictionary()
+
+
+def symbols_in_code(code) -> frozenset:
+    """
+    Returns names of all symbols occurring anywhere in the code value.
+    This is a conservative approximation of the free variables: quoted symbols or locally bound names are included too.
+    """
+    if not isinstance(code, ConsCell):
+        return frozenset([code.name]) if isinstance(code, Symbol) else frozenset()
+    cached = _body_symbols.get(code)
+    if cached is not None:
+        return cached
+    names = set()
+    stack = [code]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, ConsCell):
+            stack.append(value.head())
+            stack.append(value.tail())
+        elif isinstance(value, Symbol):
+            names.add(value.name)
+    result = frozenset(names)
+    _body_symbols[code] = result
+    return result
+
+
+# what function bodies apply and bind (see applications_in_code), keyed like _body_symbols
+_body_applications = WeakKeyDictionary()
+
+# forms binding the name heading their second element: (let (name value) body), (dotimes (name n) body), ...
+_SINGLE_BINDING_FORMS = frozenset(["let", "dotimes", "for-each"])
+
+
+def _elements(code) -> list:
+    """
+    Returns the elements of a (possibly improper) list, ignoring an improper end.
+    """
+    elements = []
+    while isinstance(code, ConsCell):
+        elements.append(code.head())
+        code = code.tail()
+    return elements
+
+
+def applications_in_code(code) -> tuple:
+    """
+    Analyses what the code value applies, returns a tuple of:
+    - names of all symbols heading a list,
+    - names bound locally (by let, letrec, fun, macro, define!, dotimes and for-each),
+    - whether some list is headed by something else than a symbol (a value computed at run time).
+    Quoted data is skipped. Like symbols_in_code, this is a conservative approximation.
+    """
+    if not isinstance(code, ConsCell):
+        return frozenset(), frozenset(), False
+    cached = _body_applications.get(code)
+    if cached is not None:
+        return cached
+    applied = set()
+    bound = set()
+    computed = False
+    stack = [code]
+    while stack:
+        value = stack.pop()
+        if not isinstance(value, ConsCell):
+            continue
+        head, args = value.head(), _elements(value.tail())
+        if not isinstance(head, Symbol):
+            computed = True
+            stack.append(head)
+            stack.extend(args)
+            continue
+        name = head.name
+        applied.add(name)
+        if name == "quote":
+            continue
+        if name in _SINGLE_BINDING_FORMS and args and isinstance(args[0], ConsCell):
+            binding = _elements(args[0])
+            bound.update(symb.name for symb in binding[:1] if isinstance(symb, Symbol))
+            stack.extend(binding[1:])
+            stack.extend(args[1:])
+        elif name == "letrec" and args:
+            for binding in map(_elements, _elements(args[0])):
+                bound.update(symb.name for symb in binding[:1] if isinstance(symb, Symbol))
+                stack.extend(binding[1:])
+            stack.extend(args[1:])
+        elif name in ("fun", "macro") and args:
+            bound.update(arg.name for arg in _elements(args[0]) if isinstance(arg, Symbol))
+            stack.extend(args[1:])
+        elif name == "define!" and args and isinstance(args[0], Symbol):
+            bound.add(args[0].name)
+            stack.extend(args[1:])
+        else:
+            stack.extend(args)
+    result = (frozenset(applied), frozenset(bound), computed)
+    _body_applications[code] = result
+    return result
+
+
+def capture_environment(env: Environment, arg_names, body) -> Environment:
+    """
+    Creates the environment captured by a closure, to achieve static binding.
+    The closure only needs the bindings its body refers to, so only those are copied.
+    However code produced by macros (or loaded by require!) can refer to names that do not occur in the body,
+    so if the body refers to any of them, the whole environment is copied. A macro can also reach the body
+    as a value - an argument, a locally bound name, a computed head like ((head l) 1 1) - or be bound by letrec
+    after the closure is created, so the same holds for bodies applying such values or unset forward references.
+    """
+    captured = env.restrict(symbols_in_code(body) - frozenset(arg_names))
+    applied, bound, computed = applications_in_code(body)
+    if computed or not applied.isdisjoint(arg_names) or not applied.isdisjoint(bound) \
+            or any(captured.is_unset_reference(name) for name in applied):
+        return env.fork()
+    for value in captured.bindings():
+        if isinstance(value, Macro) or value is builtins["require!"]:
+            return env.fork()
+    return captured
+
+
+class Closure:
+    """
+    A function created by fun.
+    It keeps the environment captured at its creation, each invocation evaluates the body in a fresh fork of it.
+    Once it has been called often enough, the body is compiled to a Python function (see pylisp.compiler)
+    which is used instead, as long as the captured environment does not change.
+    """
+    def __init__(self, args, body, env: Environment):
+        self.args = args
+        self.arg_names = frozenset(args)
+        self.body = body
+        self.env = env
+        # all invocations share a version stamp (as long as the closure's environment does not change),
+        # so that symbols in the body keep their cached values between calls
+        self._call_version = None
+        self._call_version_base = None
+        # the body is specialized on the first call, when the forward references it refers to have been set
+        self._specialize = inference.enabled
+        self.calls = 0
+        self._compiled = None
+        self._compiled_version = None
+
+    def enter(self, arg_values) -> Environment:
+        """
+        Checks the arguments and creates the environment in which the body is evaluated for this invocation.
+        """
+        if len(arg_values) != len(self.args):
+            raise LispError("Function applied to a wrong number of arguments")
+        if self._specialize:
+            self._specialize = False
+            self.body = specialize(self.args, self.body, self.env)
+        if statistics.enabled:
+            statistics.function_calls += 1
+        if self._call_version_base != self.env.version:
+            self._call_version, self._call_version_base = fresh_version(), self.env.version
+        # copy to preserve the closure for future calls
+        return self.env.fork_for_call(self.arg_names, dict(zip(self.args, arg_values)), self._call_version)
+
+    def __call__(self, arg_values):
+        compiled = self._compiled
+        if compiled is not None:
+            if self._compiled_version == self.env.version:
+                if not statistics.enabled and budgets.active is None:  # monitored runs are interpreted
+                    if len(arg_values) != len(self.args):
+                        raise LispError("Function applied to a wrong number of arguments")
+                    return compiled(*arg_values)
+            else:
+                # the bindings the code was compiled against have changed, it will be compiled again if still hot
+                self._compiled = None
+                self.calls = 0
+        self.calls += 1
+        if self.calls == tiering.threshold:
+            self._compiled = compile_closure(self)
+            self._compiled_version = self.env.version
+        env = self.enter(arg_values)  # entering can replace the body with a specialized one
+        return interpret(self.body, env)
+
+    def __str__(self):
+        return f"<function ({' '.join(self.args)})>"
+
+
 @register_builtin(2)
 def fun(env: Environment, args, body):
     """
@@ -199,16 +418,8 @@ def fun(env: Environment, args, body):
     if not lisp_list_is_valid(args):
         raise LispError(f"Wrong function form: (fun {lisp_data_to_str(args)} ...)")
     args = list(map(process_arg, lisp_list_to_python(args)))
-    function_env = env.fork()  # we do a copy to achieve static-binding
-
-    def closure(arg_values):
-        if len(arg_values) != len(args):
-            raise LispError("Function applied to a wrong number of arguments")
-        invokation_env = function_env.fork()  # copy to preserve the closure for future calls
-        for arg_name, arg_value in zip(args, arg_values):
-            invokation_env.update(arg_name, arg_value)
-        return interpret(body, invokation_env)
-    return closure
+    function_env = capture_environment(env, args, body)  # we do a copy to achieve static-binding
+    return Closure(args, body, function_env)
 
 
 @register_builtin(2)
@@ -227,7 +438,7 @@ def macro(env: Environment, args, body):
     if not lisp_list_is_valid(args):
         raise LispError(f"Wrong macro form: (macro {lisp_data_to_str(args)} ...)")
     args = list(map(process_arg, lisp_list_to_python(args)))
-    function_env = env.fork()  # we do a copy to achieve static-binding
+    function_env = capture_environment(env, args, body)  # we do a copy to achieve static-binding
 
     def closure(arg_values):
         if len(arg_values) != len(args):
@@ -239,6 +450,128 @@ def macro(env: Environment, args, body):
     return FuncMacro(closure)
 
 
+def memo_key(arg_values) -> tuple:
+    """
+    Returns the cache key of a memoized call: the arguments, compared structurally, and the types of their atoms
+    - true and 1 are equal in Python, so they are told apart by their types (also inside lists and vectors).
+    """
+    types = []
+    stack = list(arg_values)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, ConsCell):
+            stack.append(value.tail())
+            stack.append(value.head())
+        elif isinstance(value, PersistentVector):
+            stack.extend(value)
+        else:
+            types.append(type(value))
+    return tuple(arg_values), tuple(types)
+
+
+class MemoizedFunction:
+    """
+    Wraps a function with a cache of its results.
+    Arguments are used as the cache key, so they are compared structurally (lists and symbols are hashed by value),
+    see memo_key.
+    The cache can be bounded by the number of entries and/or by the estimated size of the cached data,
+    the least recently used entries are evicted first.
+    """
+    def __init__(self, func, max_entries=None, max_bytes=None):
+        self.func = func
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._cache = OrderedDict()  # key -> (result, estimated size)
+
+    def __call__(self, arg_values):
+        key = memo_key(arg_values)
+        try:
+            result, _ = self._cache[key]
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return result
+        except KeyError:
+            pass
+        except TypeError:  # some argument is not hashable, we just don't cache such calls
+            return self.func(arg_values)
+        self.misses += 1
+        result = self.func(arg_values)
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        size = lisp_data_size(key) + lisp_data_size(result) if self.max_bytes is not None else 0
+        if key in self._cache:  # a recursive call could have already filled the entry
+            self.bytes -= self._cache.pop(key)[1]
+        self._cache[key] = (result, size)
+        self.bytes += size
+        while self._cache and ((self.max_entries is not None and len(self._cache) > self.max_entries)
+                               or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            _, (_, evicted_size) = self._cache.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def clear(self):
+        self._cache.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __str__(self):
+        return f"<memoized function with {len(self)} cached results>"
+
+
+@register_vararg_builtin()
+def memo(env: Environment, *args):
+    """
+    Wraps a function with a cache of its results, evicting the least recently used ones.
+    The optional limits are the maximal count of cached results and their maximal estimated size in bytes,
+    nil means no limit.
+    (memo f)
+    (memo f max-entries)
+    (memo f max-entries max-bytes)
+    """
+    if len(args) < 1 or len(args) > 3:
+        raise LispError(f"memo expects 1 to 3 arguments but was given {len(args)}")
+    func, *limits = interpret_list(args, env)
+    if isinstance(func, (Builtin, Macro)) or not callable(func):
+        raise LispError(f"Only functions can be memoized, not: {lisp_data_to_str(func)}")
+    for limit in limits:
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            raise LispError(f"memo limits have to be non-negative integers or nil, not: {lisp_data_to_str(limit)}")
+    return MemoizedFunction(func, *limits)
+
+
+def ensure_memoized(value) -> MemoizedFunction:
+    if not isinstance(value, MemoizedFunction):
+        raise LispError(f"{lisp_data_to_str(value)} is not a memoized function")
+    return value
+
+
+@register_builtin(1, "memo-stats")
+def memo_stats(env: Environment, func):
+    """
+    Returns an association list describing the cache of a memoized function.
+    (memo-stats f) returns ((hits h) (misses m) (entries n) (bytes b))
+    The byte count is only tracked when a byte limit is set.
+    """
+    func = ensure_memoized(interpret(func, env))
+    counts = [("hits", func.hits), ("misses", func.misses), ("entries", len(func)), ("bytes", func.bytes)]
+    return python_list_to_lisp([python_list_to_lisp([Symbol(name), count]) for name, count in counts])
+
+
+@register_builtin(1, "memo-clear!")
+def memo_clear(env: Environment, func):
+    """
+    Drops all cached results of a memoized function.
+    (memo-clear! f)
+    """
+    ensure_memoized(interpret(func, env)).clear()
+
+
 @register_vararg_builtin()
 def begin(env: Environment, *args):
     """
@@ -250,47 +583,109 @@ def begin(env: Environment, *args):
     return interpret_list(args, env)[-1]  # return the value of the last statement
 
 
-class Block:
+# The loops evaluate their body in a Python loop, so they do not grow the Python stack.
+# The loop variable is rebound in a single fork of the environment, which keeps its version stamp between iterations,
+# so the other symbols of the body keep their cached values (see Environment.rebind_unshared).
+
+@register_builtin(2, "while!")
+def while_loop(env: Environment, cond, body):
     """
-    An instance of block, can be used to handle imperative arrays in the language.
+    Evaluates the body as long as the condition holds, returns nil.
+    (while! condition body)
     """
-    def __init__(self, size):
-        self.values = [None] * size
+    while interpret(cond, env):
+        interpret(body, env)
+
 
-    def set(self, idx, value):
-        if idx < 0 or idx >= len(self.values):
-            raise LispError(f"Index {idx} is out of bounds")
-        self.values[idx] = value
+def parse_loop_binding(form: str, binding) -> (str, object):
+    """
+    Returns the name and the code of the (name code) binding of a loop.
+    """
+    if not isinstance(binding, ConsCell) or lisp_list_length(binding) != 2 \
+            or not isinstance(binding.head(), Symbol):
+        raise LispError(f"Wrong {form} form: ({form} {lisp_data_to_str(binding)} ...)")
+    name, code = lisp_list_to_python(binding)
+    return name.name, code
 
-    def get(self, idx):
-        if idx < 0 or idx >= len(self.values):
-            raise LispError(f"Index {idx} is out of bounds")
-        return self.values[idx]
 
-    def __str__(self):
-        return f"<allocated block of size {len(self.values)}>"
+def run_loop(env: Environment, name: str, values, body):
+    frame = env.fork_for_loop(name)
+    for value in values:
+        frame.rebind_unshared(name, value)
+        interpret(body, frame)
 
 
-@register_builtin(1, "alloc!")
-def block_alloc(env: Environment, size):
+@register_builtin(2)
+def dotimes(env: Environment, binding, body):
     """
-    Allocates an array.
-    (alloc! n)
+    Evaluates the body with name bound to 0, 1, ... n - 1, returns nil.
+    (dotimes (name n) body)
     """
-    size = interpret(size, env)
+    name, count = parse_loop_binding("dotimes", binding)
+    run_loop(env, name, range(interpret_ensuring_type(count, env, int)), body)
+
+
+def iterate_lisp_list(lst):
+    while isinstance(lst, ConsCell):
+        yield lst.head()
+        lst = lst.tail()
+
+
+def iterate_block(block: Block):
+    # the elements are read when they are reached, so the body sees the values set by the previous iterations
+    for idx in range(block.size()):
+        yield block.get(idx)
+
+
+@register_builtin(2, "for-each")
+def for_each(env: Environment, binding, body):
+    """
+    Evaluates the body with name bound to every element of a list, a block, a vector or a stream, returns nil.
+    (for-each (name sequence) body)
+    """
+    name, sequence = parse_loop_binding("for-each", binding)
+    values = interpret(sequence, env)
+    if values is None or isinstance(values, ConsCell):
+        if not lisp_list_is_valid(values):
+            raise LispError(f"{lisp_data_to_str(values)} is not a valid list\n in {lisp_data_to_str(sequence)}")
+        elements = iterate_lisp_list(values)
+    elif isinstance(values, Block):
+        elements = iterate_block(values)
+    elif isinstance(values, PersistentVector):
+        elements = iter(values)
+    elif isinstance(values, TransientVector):  # get checks that it has not been made persistent in the meantime
+        elements = map(values.get, range(len(values)))
+    elif isinstance(values, Stream):
+        elements = iterate_stream(values)
+    else:
+        raise LispError(f"for-each cannot iterate over {lisp_data_to_str(values)}\n in {lisp_data_to_str(sequence)}")
+    run_loop(env, name, elements, body)
+
+
+def alloc_block(size):
     if not isinstance(size, int):
         raise LispError("alloc! needs an integer")
     return Block(size)
 
 
-@register_builtin(2, "get!")
+@register_builtin(1, "alloc!", strict=alloc_block)
+def block_alloc(env: Environment, size):
+    """
+    Allocates an array.
+    (alloc! n)
+    """
+    return alloc_block(interpret(size, env))
+
+
+@register_builtin(2, "get!", strict=lambda block, idx: ensure_type(block, Block).get(ensure_type(idx, int)))
 def block_get(env: Environment, block, idx):
     block = interpret_ensuring_type(block, env, Block)
     idx = interpret_ensuring_type(idx, env, int)
     return block.get(idx)
 
 
-@register_builtin(3, "set!")
+@register_builtin(3, "set!",
+                  strict=lambda block, idx, value: ensure_type(block, Block).set(ensure_type(idx, int), value))
 def block_get(env: Environment, block, idx, value):
     block = interpret_ensuring_type(block, env, Block)
     idx = interpret_ensuring_type(idx, env, int)
@@ -298,7 +693,75 @@ def block_get(env: Environment, block, idx, value):
     return block.set(idx, value)
 
 
-@register_vararg_builtin("list")
+@register_builtin(1, "block-size", strict=lambda block: ensure_type(block, Block).size())
+def block_size(env: Environment, block):
+    """
+    Returns the count of elements of a block.
+    (block-size block)
+    """
+    return interpret_ensuring_type(block, env, Block).size()
+
+
+@register_vararg_builtin("alloc-shared!")
+def block_alloc_shared(env: Environment, *args):
+    """
+    Allocates an array of numbers in shared memory, its elements are zeros of the element type:
+    int8, uint8, int16, int32, int64 (the default) or float64.
+    Other processes can attach to it by its name (see attach-shared!) without copying it.
+    (alloc-shared! n)
+    (alloc-shared! n element-type)
+    """
+    if len(args) not in (1, 2):
+        raise LispError(f"alloc-shared! expects 1 or 2 arguments but was given {len(args)}")
+    size = interpret_ensuring_type(args[0], env, int)
+    element_type = interpret_ensuring_type(args[1], env, str) if len(args) == 2 else "int64"
+    return create_shared_block(size, element_type)
+
+
+@register_builtin(1, "attach-shared!")
+def block_attach_shared(env: Environment, name):
+    """
+    Returns the array in shared memory with the given name, allocated by alloc-shared! (in any process).
+    (attach-shared! name)
+    """
+    return attach_shared_block(interpret_ensuring_type(name, env, str))
+
+
+@register_builtin(1, "shared-name")
+def block_shared_name(env: Environment, block):
+    """
+    Returns the name of an array in shared memory, to be passed to other processes.
+    (shared-name block)
+    """
+    return interpret_ensuring_type(block, env, SharedBlock).name
+
+
+@register_vararg_builtin("mmap-block!")
+def block_mmap(env: Environment, *args):
+    """
+    Maps a binary file of numbers of the element type (int64 by default, see alloc-shared!) into memory as an array,
+    without reading it. If the file is writable, set! writes to the file.
+    (mmap-block! "path")
+    (mmap-block! "path" element-type)
+    """
+    if len(args) not in (1, 2):
+        raise LispError(f"mmap-block! expects 1 or 2 arguments but was given {len(args)}")
+    path = interpret_ensuring_type(args[0], env, str)
+    element_type = interpret_ensuring_type(args[1], env, str) if len(args) == 2 else "int64"
+    return MappedBlock(path, element_type)
+
+
+@register_builtin(1, "release!")
+def block_release(env: Environment, block):
+    """
+    Releases the memory of an array allocated by alloc-shared!, attached by attach-shared! or mapped by mmap-block!,
+    it cannot be used afterwards. The shared memory is removed when the process that has allocated it releases it.
+    (release! block)
+    """
+    interpret_ensuring_type(block, env, BufferBlock).release()
+
+
+@register_vararg_builtin("list", strict=lambda *values: python_list_to_lisp(list(values)))
 def list_make(env: Environment, *args):
     """
     Creates a list.
@@ -309,7 +772,7 @@ def list_make(env: Environment, *args):
     return python_list_to_lisp(args)
 
 
-@register_builtin(2)
+@register_builtin(2, strict=ConsCell)
 def cons(env: Environment, head, tail):
     """
     Creates a cons-cell.
@@ -321,28 +784,422 @@ def cons(env: Environment, head, tail):
     return ConsCell(h, t)
 
 
-@register_builtin(1, "head")
+def head_of(lst):
+    if not isinstance(lst, ConsCell):
+        raise LispError("head can only be applied to a non-empty list")
+    return lst.head()
+
+
+def tail_of(lst):
+    if not isinstance(lst, ConsCell):
+        raise LispError("tail can only be applied to a non-empty list")
+    return lst.tail()
+
+
+@register_builtin(1, "head", strict=head_of)
 def list_head(env: Environment, lst):
     """
     Returns the head of a non-empty list.
     (head lst)
     """
-    lst = interpret(lst, env)
-    if not isinstance(lst, ConsCell):
-        raise LispError("head can only be applied to a non-empty list")
-    return lst.head()
+    return head_of(interpret(lst, env))
 
 
-@register_builtin(1, "tail")
+@register_builtin(1, "tail", strict=tail_of)
 def list_tail(env: Environment, lst):
     """
     Returns the tail of a non-empty list.
     (tail lst)
     """
+    return tail_of(interpret(lst, env))
+
+
+def interpret_hash_key(term, env):
+    """
+    Interprets a term that is used as a hash map key, ensuring that it can be hashed.
+    """
+    key = interpret(term, env)
+    try:
+        hash(key)
+    except TypeError:
+        raise LispError(f"{lisp_data_to_str(key)} cannot be used as a hash map key")
+    return key
+
+
+@register_vararg_builtin()
+def hmap(env: Environment, *args):
+    """
+    Creates an immutable hash map from the provided key-value pairs.
+    (hmap key1 value1 key2 value2 ...)
+    """
+    if len(args) % 2 != 0:
+        raise LispError("hmap expects an even number of arguments")
+    result = HashMap()
+    for key, value in zip(args[::2], args[1::2]):
+        result = result.assoc(interpret_hash_key(key, env), interpret(value, env))
+    return result
+
+
+@register_vararg_builtin()
+def hget(env: Environment, *args):
+    """
+    Returns the value bound to key in the hash map or default (nil if not provided) if it is not present.
+    (hget map key)
+    (hget map key default)
+    """
+    if len(args) not in (2, 3):
+        raise LispError(f"hget expects 2 or 3 arguments but was given {len(args)}")
+    hashmap = interpret_ensuring_type(args[0], env, HashMap)
+    key = interpret_hash_key(args[1], env)
+    default = interpret(args[2], env) if len(args) == 3 else None
+    return hashmap.get(key, default)
+
+
+@register_builtin(3)
+def hassoc(env: Environment, hashmap, key, value):
+    """
+    Returns a new hash map with key bound to value, the original map is left unchanged.
+    (hassoc map key value)
+    """
+    hashmap = interpret_ensuring_type(hashmap, env, HashMap)
+    return hashmap.assoc(interpret_hash_key(key, env), interpret(value, env))
+
+
+@register_builtin(2)
+def hdissoc(env: Environment, hashmap, key):
+    """
+    Returns a new hash map without key, the original map is left unchanged.
+    (hdissoc map key)
+    """
+    hashmap = interpret_ensuring_type(hashmap, env, HashMap)
+    return hashmap.dissoc(interpret_hash_key(key, env))
+
+
+@register_builtin(2, "hcontains?")
+def hcontains(env: Environment, hashmap, key):
+    """
+    Checks if the key is present in the hash map.
+    (hcontains? map key)
+    """
+    hashmap = interpret_ensuring_type(hashmap, env, HashMap)
+    return interpret_hash_key(key, env) in hashmap
+
+
+@register_builtin(1)
+def hkeys(env: Environment, hashmap):
+    """
+    Returns a list of keys of the hash map (in unspecified order).
+    (hkeys map)
+    """
+    return python_list_to_lisp(list(interpret_ensuring_type(hashmap, env, HashMap).keys()))
+
+
+@register_builtin(1)
+def hitems(env: Environment, hashmap):
+    """
+    Returns a list of (key value) pairs of the hash map (in unspecified order), it can be used to iterate over the map.
+    (hitems map)
+    """
+    hashmap = interpret_ensuring_type(hashmap, env, HashMap)
+    return python_list_to_lisp([python_list_to_lisp([key, value]) for key, value in hashmap.items()])
+
+
+@register_builtin(1)
+def hlen(env: Environment, hashmap):
+    """
+    Returns the count of keys in the hash map.
+    (hlen map)
+    """
+    return len(interpret_ensuring_type(hashmap, env, HashMap))
+
+
+@register_builtin(1, "hmap?")
+def ishmap(env: Environment, arg):
+    return isinstance(interpret(arg, env), HashMap)
+
+
+@register_vararg_builtin("vec", strict=lambda *values: PersistentVector.from_iterable(values))
+def vec(env: Environment, *args):
+    """
+    Creates an immutable vector of the provided values.
+    (vec a b c)
+    """
+    return PersistentVector.from_iterable(interpret_list(args, env))
+
+
+@register_builtin(2, strict=lambda vector, idx: ensure_type(vector, Vector).get(ensure_type(idx, int)))
+def vget(env: Environment, vector, idx):
+    """
+    Returns the element of the vector at the index (counted from 0), in O(log32 n).
+    (vget vector idx)
+    """
+    vector = interpret_ensuring_type(vector, env, Vector)
+    return vector.get(interpret_ensuring_type(idx, env, int))
+
+
+@register_builtin(3, strict=lambda vector, idx, value: ensure_type(vector, PersistentVector).assoc(
+    ensure_type(idx, int), value))
+def vassoc(env: Environment, vector, idx, value):
+    """
+    Returns a new vector with the element at the index replaced by value, the original vector is left unchanged
+    (the new one shares most of its structure with it).
+    (vassoc vector idx value)
+    """
+    vector = interpret_ensuring_type(vector, env, PersistentVector)
+    return vector.assoc(interpret_ensuring_type(idx, env, int), interpret(value, env))
+
+
+@register_builtin(2, strict=lambda vector, value: ensure_type(vector, PersistentVector).push(value))
+def vpush(env: Environment, vector, value):
+    """
+    Returns a new vector with value appended, the original vector is left unchanged.
+    (vpush vector value)
+    """
+    return interpret_ensuring_type(vector, env, PersistentVector).push(interpret(value, env))
+
+
+@register_builtin(1, strict=lambda vector: len(ensure_type(vector, Vector)))
+def vlen(env: Environment, vector):
+    """
+    Returns the count of elements of the vector.
+    (vlen vector)
+    """
+    return len(interpret_ensuring_type(vector, env, Vector))
+
+
+@register_builtin(1, "vec?", strict=lambda value: isinstance(value, PersistentVector))
+def isvec(env: Environment, arg):
+    return isinstance(interpret(arg, env), PersistentVector)
+
+
+@register_builtin(1, "list->vec")
+def list_to_vec(env: Environment, lst):
+    """
+    Returns a vector of the list's elements.
+    (list->vec lst)
+    """
     lst = interpret(lst, env)
-    if not isinstance(lst, ConsCell):
-        raise LispError("tail can only be applied to a non-empty list")
-    return lst.tail()
+    if not lisp_list_is_valid(lst):
+        raise LispError(f"{lisp_data_to_str(lst)} is not a list")
+    return PersistentVector.from_iterable(lisp_list_to_python(lst))
+
+
+@register_builtin(1, "vec->list")
+def vec_to_list(env: Environment, vector):
+    """
+    Returns a list of the vector's elements.
+    (vec->list vector)
+    """
+    return python_list_to_lisp(list(interpret_ensuring_type(vector, env, Vector)))
+
+
+@register_builtin(1)
+def transient(env: Environment, vector):
+    """
+    Returns a mutable copy of the vector for building a new vector quickly (see vpush! and vassoc!), it is O(1)
+    as the copy modifies only the nodes it has copied. persistent! turns it into an immutable vector.
+    (transient vector)
+    """
+    return interpret_ensuring_type(vector, env, PersistentVector).transient()
+
+
+@register_builtin(2, "vpush!")
+def vpush_transient(env: Environment, vector, value):
+    """
+    Appends value to a transient vector, returns it.
+    (vpush! transient value)
+    """
+    return interpret_ensuring_type(vector, env, TransientVector).push(interpret(value, env))
+
+
+@register_builtin(3, "vassoc!")
+def vassoc_transient(env: Environment, vector, idx, value):
+    """
+    Replaces the element of a transient vector at the index by value, returns the transient vector.
+    (vassoc! transient idx value)
+    """
+    vector = interpret_ensuring_type(vector, env, TransientVector)
+    return vector.assoc(interpret_ensuring_type(idx, env, int), interpret(value, env))
+
+
+@register_builtin(1, "persistent!")
+def persistent(env: Environment, vector):
+    """
+    Returns an immutable vector of the elements of a transient vector in O(1), the transient cannot be used anymore.
+    (persistent! transient)
+    """
+    return interpret_ensuring_type(vector, env, TransientVector).persistent()
+
+
+def call_function(func, arg_values: list, env: Environment):
+    """
+    Applies a LISP function to already evaluated arguments, used by builtins that take functions as arguments.
+    Builtin operators are supported too, their arguments are passed quoted so that they are not evaluated again.
+    """
+    if isinstance(func, Builtin):
+        if func.arity is not None and len(arg_values) != func.arity:
+            raise LispError(f"{func.name} expects {func.arity} arguments but was given {len(arg_values)}")
+        quote_builtin = builtins["quote"]
+        return func(env, *[python_list_to_lisp([quote_builtin, value]) for value in arg_values])
+    if isinstance(func, Macro) or not callable(func):
+        raise LispError(f"{lisp_data_to_str(func)} cannot be applied to values")
+    return func(arg_values)
+
+
+@register_builtin(1)
+def delay(env: Environment, expr):
+    """
+    Creates a promise - the expression is not evaluated until the promise is forced.
+    The result is remembered, so the expression is evaluated at most once.
+    (delay expr)
+    """
+    return Promise(lambda: interpret(expr, env))
+
+
+@register_builtin(1)
+def force(env: Environment, promise):
+    """
+    Forces a promise, returning its value. Values that are not promises are returned unchanged.
+    (force promise)
+    """
+    promise = interpret(promise, env)
+    if isinstance(promise, Promise):
+        return promise.force()
+    return promise
+
+
+@register_builtin(2, "stream-cons")
+def stream_cons(env: Environment, head, tail):
+    """
+    Creates a lazy stream. The head is evaluated immediately, the tail only when it is first needed.
+    The empty stream is nil.
+    (stream-cons head tail)
+    """
+    return Stream(interpret(head, env), Promise(lambda: interpret(tail, env)))
+
+
+@register_builtin(1, "stream-head")
+def stream_head(env: Environment, stream):
+    """
+    Returns the first element of a non-empty stream.
+    (stream-head s)
+    """
+    return interpret_ensuring_type(stream, env, Stream).head()
+
+
+@register_builtin(1, "stream-tail")
+def stream_tail(env: Environment, stream):
+    """
+    Returns the rest of a non-empty stream, computing it if it is needed for the first time.
+    (stream-tail s)
+    """
+    return interpret_ensuring_type(stream, env, Stream).tail()
+
+
+def interpret_stream(term, env: Environment):
+    stream = interpret(term, env)
+    if stream is not None and not isinstance(stream, Stream):
+        raise LispError(f"{lisp_data_to_str(stream)} is not a stream"
+                        f"\n in {lisp_data_to_str(term)}")
+    return stream
+
+
+@register_builtin(2, "stream-map")
+def builtin_stream_map(env: Environment, func, stream):
+    """
+    Lazily applies the function to every element of the stream.
+    (stream-map f s)
+    """
+    func = interpret(func, env)
+    return stream_map(lambda value: call_function(func, [value], env), interpret_stream(stream, env))
+
+
+@register_builtin(2, "stream-filter")
+def builtin_stream_filter(env: Environment, predicate, stream):
+    """
+    Lazily selects the elements of the stream satisfying the predicate.
+    (stream-filter pred s)
+    """
+    predicate = interpret(predicate, env)
+    return stream_filter(lambda value: call_function(predicate, [value], env), interpret_stream(stream, env))
+
+
+@register_builtin(2, "stream-take")
+def builtin_stream_take(env: Environment, n, stream):
+    """
+    Returns a stream of (at most) the first n elements of the stream.
+    (stream-take n s)
+    """
+    n = interpret_ensuring_type(n, env, int)
+    return stream_take(n, interpret_stream(stream, env))
+
+
+@register_builtin(1, "stream->list")
+def stream_to_list(env: Environment, stream):
+    """
+    Computes all elements of a finite stream and returns them as a list.
+    (stream->list s)
+    """
+    return python_list_to_lisp(list(iterate_stream(interpret_stream(stream, env))))
+
+
+@register_builtin(1, "list->stream")
+def list_to_stream(env: Environment, lst):
+    """
+    Returns a stream of the list's elements.
+    (list->stream lst)
+    """
+    return stream_from_iterator(iter(lisp_list_to_python(interpret(lst, env))))
+
+
+@register_vararg_builtin("range-stream")
+def range_stream(env: Environment, *args):
+    """
+    Returns a lazy stream of integers from start (inclusive) to end (exclusive) increasing by step (1 by default).
+    If end is nil, the stream is infinite.
+    (range-stream start end)
+    (range-stream start end step)
+    """
+    if len(args) not in (2, 3):
+        raise LispError(f"range-stream expects 2 or 3 arguments but was given {len(args)}")
+    start = interpret_ensuring_type(args[0], env, int)
+    end = interpret(args[1], env)
+    step = interpret_ensuring_type(args[2], env, int) if len(args) == 3 else 1
+    if step == 0:
+        raise LispError("range-stream step cannot be 0")
+    if end is None:
+        return stream_from_iterator(itertools.count(start, step))
+    if not isinstance(end, int):
+        raise LispError(f"range-stream end has to be an integer or nil, not: {lisp_data_to_str(end)}")
+    return stream_from_iterator(iter(range(start, end, step)))
+
+
+def read_file_lines(path: str):
+    """
+    A generator yielding lines of a file (without line terminators), the file is open only while it is being read.
+    Errors (including undecodable lines) are raised as LispErrors when the failing line is reached.
+    """
+    try:
+        with open(path, encoding=ENCODING) as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+    except (OSError, ValueError) as e:
+        raise LispError(f"File {path}: {e}") from e
+
+
+@register_builtin(1, "file-lines")
+def file_lines(env: Environment, path):
+    """
+    Returns a lazy stream of lines of a file, lines are read only as the stream is traversed.
+    (file-lines "path")
+    """
+    path = interpret_ensuring_type(path, env, str)
+    return stream_from_iterator(read_file_lines(path))
+
+
+@register_builtin(1, "stream?")
+def isstream(env: Environment, arg):
+    return isinstance(interpret(arg, env), Stream)
 
 
 @register_builtin(1, "quote")
@@ -355,18 +1212,55 @@ def quote(env: Environment, code):
     return code
 
 
-@register_vararg_builtin("print!")
-def builtin_print(env: Environment, *args):
-    def to_str(v):
-        if isinstance(v, str):
-            return v
-        return lisp_data_to_str(v)
-    args = map(to_str, interpret_list(args, env))
-    print(" ".join(args))
+@register_builtin(1, "quasiquote")
+def quasiquote(env: Environment, template):
+    """
+    Returns the template as a code value, like quote, but with the (unquote x) parts replaced by the value of x
+    and the (unquote-splicing x) parts replaced by the elements of the list x:
+    (quasiquote (a (unquote (+ 1 2)) (unquote-splicing (list 4 5)))) returns (a 3 4 5)
+    `(a ,(+ 1 2) ,@(list 4 5)) (syntax sugar)
+    The template is compiled once, constant parts of it are shared by all the returned values.
+    """
+    return expand_quasiquote(template, env)
+
+
+@register_builtin(1)
+def unquote(env: Environment, expr):
+    """
+    (unquote x) or ,x - inserts the value of x into a quasiquote template, cannot be used outside of one
+    """
+    raise LispError(f"unquote used outside of a quasiquote: {lisp_data_to_str(expr)}")
+
+
+@register_builtin(1, "unquote-splicing")
+def unquote_splicing(env: Environment, expr):
+    """
+    (unquote-splicing x) or ,@x - inserts the elements of the list x into a quasiquote template,
+    cannot be used outside of one
+    """
+    raise LispError(f"unquote-splicing used outside of a quasiquote: {lisp_data_to_str(expr)}")
+
+
+def to_display_str(value) -> str:
+    """
+    Converts a value to the text that is displayed by print! - strings are displayed without quotes.
+    """
+    if isinstance(value, str):
+        return value
+    return lisp_data_to_str(value)
+
+
+def print_values(*values):
+    print(" ".join(map(to_display_str, values)))
     return None
 
 
-@register_builtin(1, "str")
+@register_vararg_builtin("print!", strict=print_values)
+def builtin_print(env: Environment, *args):
+    return print_values(*interpret_list(args, env))
+
+
+@register_builtin(1, "str", strict=lisp_data_to_str)
 def builtin_str(env: Environment, arg):
     return lisp_data_to_str(interpret(arg, env))
 
@@ -377,11 +1271,246 @@ def str2int(env: Environment, arg):
     return int(arg)
 
 
+@register_vararg_builtin()
+def concat(env: Environment, *args):
+    """
+    Concatenates strings.
+    All parts are joined at once, so the cost is linear in the length of the result.
+    (concat "a" "b" ...)
+    """
+    return "".join(interpret_ensuring_type(term, env, str) for term in args)
+
+
+@register_builtin(1, "str-len")
+def str_len(env: Environment, s):
+    """
+    Returns the length of a string.
+    (str-len s)
+    """
+    return len(interpret_ensuring_type(s, env, str))
+
+
+@register_vararg_builtin()
+def substring(env: Environment, *args):
+    """
+    Returns the part of the string starting at index start and ending before index end
+    (or at the end of the string if end is not provided).
+    (substring s start)
+    (substring s start end)
+    """
+    if len(args) not in (2, 3):
+        raise LispError(f"substring expects 2 or 3 arguments but was given {len(args)}")
+    s = interpret_ensuring_type(args[0], env, str)
+    start = interpret_ensuring_type(args[1], env, int)
+    end = interpret_ensuring_type(args[2], env, int) if len(args) == 3 else len(s)
+    if not 0 <= start <= end <= len(s):
+        raise LispError(f"Substring bounds {start}, {end} are invalid for a string of length {len(s)}")
+    return s[start:end]
+
+
+@register_vararg_builtin()
+def split(env: Environment, *args):
+    """
+    Splits a string into a list of parts separated by sep.
+    If sep is not provided the string is split on runs of whitespace.
+    (split s)
+    (split s sep)
+    """
+    if len(args) not in (1, 2):
+        raise LispError(f"split expects 1 or 2 arguments but was given {len(args)}")
+    s = interpret_ensuring_type(args[0], env, str)
+    sep = interpret_ensuring_type(args[1], env, str) if len(args) == 2 else None
+    if sep == "":
+        raise LispError("Cannot split on an empty separator")
+    return python_list_to_lisp(s.split(sep))
+
+
+@register_builtin(2)
+def join(env: Environment, sep, lst):
+    """
+    Joins a list of strings putting sep between them.
+    (join sep lst)
+
+    (join ", " (list "a" "b")) returns "a, b"
+    """
+    sep = interpret_ensuring_type(sep, env, str)
+    parts = lisp_list_to_python(interpret(lst, env))
+    for part in parts:
+        if not isinstance(part, str):
+            raise LispError(f"join can only join strings, got {lisp_data_to_str(part)}")
+    return sep.join(parts)
+
+
+@register_vararg_builtin("format-number")
+def format_number(env: Environment, *args):
+    """
+    Formats an integer as a string, right-aligned to width characters using the pad character (space by default).
+    (format-number n)
+    (format-number n width)
+    (format-number n width pad)
+
+    (format-number 42 5 "0") returns "00042"
+    """
+    if len(args) not in (1, 2, 3):
+        raise LispError(f"format-number expects 1 to 3 arguments but was given {len(args)}")
+    n = interpret_ensuring_type(args[0], env, int)
+    width = interpret_ensuring_type(args[1], env, int) if len(args) >= 2 else 0
+    pad = interpret_ensuring_type(args[2], env, str) if len(args) == 3 else " "
+    if len(pad) != 1:
+        raise LispError(f"The padding has to be a single character, got {lisp_data_to_str(pad)}")
+    if pad == "0" and n < 0:
+        return "-" + str(-n).rjust(width - 1, pad)
+    return str(n).rjust(width, pad)
+
+
+class StringBuilder:
+    """
+    A mutable string accumulator.
+    Appending only records the part, so it is amortized O(1);
+    the string is materialized on demand and the result is cached until the next append.
+    """
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+
+    def append(self, part: str):
+        self.parts.append(part)
+        self.length += len(part)
+
+    def build(self) -> str:
+        if len(self.parts) != 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def __str__(self):
+        return f"<string builder of length {self.length}>"
+
+
+@register_builtin(0, "string-builder!")
+def string_builder(_: Environment):
+    """
+    Creates an empty string builder, use it to assemble long strings in linear time.
+    (string-builder!)
+    """
+    return StringBuilder()
+
+
+@register_vararg_builtin("sb-append!")
+def sb_append(env: Environment, *args):
+    """
+    Appends values to a string builder, values are converted to text the same way print! does.
+    Returns the builder so that appends can be chained.
+    (sb-append! builder values...)
+    """
+    if len(args) < 1:
+        raise LispError("sb-append! expects a string builder")
+    builder = interpret_ensuring_type(args[0], env, StringBuilder)
+    for value in interpret_list(args[1:], env):
+        builder.append(to_display_str(value))
+    return builder
+
+
+@register_builtin(1, "sb-str")
+def sb_str(env: Environment, builder):
+    """
+    Returns the string assembled in a string builder.
+    (sb-str builder)
+    """
+    return interpret_ensuring_type(builder, env, StringBuilder).build()
+
+
+@register_builtin(1, "sb-len")
+def sb_len(env: Environment, builder):
+    """
+    Returns the length of the string assembled in a string builder.
+    (sb-len builder)
+    """
+    return interpret_ensuring_type(builder, env, StringBuilder).length
+
+
 @register_builtin(0, "readline!")
 def read_line(_: Environment):
     return input()
 
 
+@register_vararg_builtin("open!")
+def file_open(env: Environment, *args):
+    """
+    Opens a file for buffered reading ("r", the default), writing ("w") or appending ("a").
+    (open! "path")
+    (open! "path" mode)
+    """
+    if len(args) not in (1, 2):
+        raise LispError(f"open! expects 1 or 2 arguments but was given {len(args)}")
+    path = interpret_ensuring_type(args[0], env, str)
+    mode = interpret_ensuring_type(args[1], env, str) if len(args) == 2 else "r"
+    return FileHandle(path, mode)
+
+
+@register_builtin(1, "read-line!")
+def file_read_line(env: Environment, handle):
+    """
+    Reads the next line from a file (without the line terminator), returns nil at the end of the file.
+    (read-line! file)
+    """
+    return interpret_ensuring_type(handle, env, FileHandle).read_line()
+
+
+@register_builtin(1, "read-all!")
+def file_read_all(env: Environment, handle):
+    """
+    Reads the remaining contents of a file as a single string.
+    (read-all! file)
+    """
+    return interpret_ensuring_type(handle, env, FileHandle).read_all()
+
+
+@register_builtin(1, "read-lines!")
+def file_read_lines(env: Environment, handle):
+    """
+    Returns a lazy stream of the remaining lines of a file, lines are read as the stream is traversed.
+    (read-lines! file)
+    """
+    return stream_from_iterator(interpret_ensuring_type(handle, env, FileHandle).lines())
+
+
+@register_vararg_builtin("write!")
+def file_write(env: Environment, *args):
+    """
+    Writes values to a file, they are converted to text the same way print! does, but without separators.
+    (write! file values...)
+    """
+    if len(args) < 1:
+        raise LispError("write! expects a file handle")
+    handle = interpret_ensuring_type(args[0], env, FileHandle)
+    for value in interpret_list(args[1:], env):
+        handle.write(to_display_str(value))
+
+
+@register_builtin(1, "close!")
+def file_close(env: Environment, handle):
+    """
+    Closes a file, flushing any buffered writes.
+    (close! file)
+    """
+    interpret_ensuring_type(handle, env, FileHandle).close()
+
+
+@register_builtin(1, "mmap-lines!")
+def file_mmap_lines(env: Environment, path):
+    """
+    Returns a lazy stream of lines of a memory-mapped file, well suited for large files.
+    (mmap-lines! "path")
+    """
+    path = interpret_ensuring_type(path, env, str)
+    return stream_from_iterator(mmap_lines(path))
+
+
+# absolute paths of the files that have been loaded into the environment before the program was run
+# (by the batch runner, see pylisp.batch), require! does not load them again
+preloaded = set()
+
+
 @register_builtin(1, "require!")
 def require(env: Environment, path):
     """
@@ -392,6 +1521,8 @@ def require(env: Environment, path):
     path = interpret(path, env)
     if not isinstance(path, str):
         raise LispError("Can only import a string path")
+    if preloaded and os.path.abspath(path) in preloaded:
+        return None
     try:
         with open(path) as f:
             interpret_file(f, env)
@@ -399,6 +1530,21 @@ def require(env: Environment, path):
         raise LispError(str(e)) from e
 
 
+@register_builtin(0, "stats!")
+def builtin_stats(_: Environment):
+    """
+    Returns an association list of the interpreter statistics counters,
+    they are only updated when statistics are enabled (pylisp --stats).
+    (stats!) returns ((steps n) (function-calls n) (builtin-calls ((name n) ...)) ...)
+    """
+    def to_lisp(value):
+        if isinstance(value, list):
+            return python_list_to_lisp([python_list_to_lisp([Symbol(name), count]) for name, count in value])
+        return value
+    return python_list_to_lisp([python_list_to_lisp([Symbol(name), to_lisp(value)])
+                                for name, value in statistics.items()])
+
+
 @register_builtin(1, "help!")
 def builtin_help(env: Environment, builtin):
     """
@@ -419,16 +1565,21 @@ def builtin_help(env: Environment, builtin):
 register_arithmetic_builtin("randint!", lambda a, b: random.randint(a, b))
 
 
-@register_builtin(1, "int?")
+@register_builtin(1, "int?", strict=lambda value: isinstance(value, int))
 def isint(env: Environment, arg):
     return isinstance(interpret(arg, env), int)
 
 
-@register_builtin(1, "str?")
+@register_builtin(1, "str?", strict=lambda value: isinstance(value, str))
 def isstr(env: Environment, arg):
     return isinstance(interpret(arg, env), str)
 
 
-@register_builtin(1, "list?")
+@register_builtin(1, "list?", strict=lambda value: lisp_list_is_valid(value))
 def islist(env: Environment, arg):
     return lisp_list_is_valid(interpret(arg, env))
+
+
+@register_builtin(1, "nil?", strict=lambda value: value is None)
+def isnil(env: Environment, arg):
+    return interpret(arg, env) is None
@@ -0,0 +1,212 @@
+"""
+Bundling of whole programs into a single precompiled artifact.
+
+Building a bundle:
+- inlines the files loaded by top-level (require! "path") forms, recursively,
+- expands macros used by top-level forms (macros and pure definitions are evaluated at build time for that),
+- drops top-level definitions that are pure (evaluating them has no side effects) and that are not reachable
+  from the other top-level forms,
+- pickles the remaining code values after a magic header.
+A bundle is run by evaluating its forms in order, without parsing anything.
+Reading a bundle unpickles it, which can run arbitrary Python code, so only bundles from trusted sources
+should be run - the shell runs a bundle only when asked to by --bundle.
+
+The reachability is based on the names of symbols occurring in the code, so it is conservative. As code loaded at
+run time could refer to anything, no definitions are dropped if the remaining code uses require!.
+"""
+import pickle
+from typing import List
+
+from pylisp.builtins import builtins, symbols_in_code
+from pylisp.environment import Environment, environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.interpreter import ConsCell, Symbol, Macro, interpret, code_parser, lisp_list_is_valid, \
+    lisp_list_to_python
+
+MAGIC = b"PYLISP-BUNDLE 1\n"
+
+# forms which evaluation has no side effects, when all their subforms are pure as well
+_PURE_FORMS = ("fun", "macro", "quote")
+_PURE_BINDING_FORMS = ("let", "letrec")
+
+
+def _form_name(code):
+    """
+    Returns the name of the symbol heading the form, or None.
+    """
+    if isinstance(code, ConsCell) and isinstance(code.head(), Symbol) and lisp_list_is_valid(code):
+        return code.head().name
+    return None
+
+
+def _is_require(form) -> bool:
+    return _form_name(form) == "require!" and lisp_list_is_valid(form) and len(lisp_list_to_python(form)) == 2 \
+        and isinstance(form.tail().head(), str)
+
+
+def _definition(form):
+    """
+    Returns (name, value code) if the form is (define! name value), otherwise None.
+    """
+    if _form_name(form) == "define!":
+        parts = lisp_list_to_python(form)
+        if len(parts) == 3 and isinstance(parts[1], Symbol):
+            return parts[1].name, parts[2]
+    return None
+
+
+def _pure_definition(form):
+    """
+    Returns (name, value code) if the form is a definition of a pure value, otherwise None.
+    """
+    definition = _definition(form)
+    if definition is not None and is_pure(definition[1]):
+        return definition
+    return None
+
+
+def is_pure(code) -> bool:
+    """
+    Tells whether evaluating the code surely has no side effects (it can still fail).
+    """
+    if not isinstance(code, ConsCell):
+        return True
+    name = _form_name(code)
+    if name in _PURE_FORMS:
+        return True
+    if name in _PURE_BINDING_FORMS:
+        parts = lisp_list_to_python(code)
+        if len(parts) != 3:
+            return False
+        bindings = [parts[1]] if name == "let" else lisp_list_to_python(parts[1]) \
+            if lisp_list_is_valid(parts[1]) else None
+        if bindings is None:
+            return False
+        for binding in bindings:
+            if not lisp_list_is_valid(binding) or len(lisp_list_to_python(binding)) != 2 \
+                    or not is_pure(binding.tail().head()):
+                return False
+        return is_pure(parts[2])
+    return False
+
+
+class Bundler:
+    """
+    Collects the top-level forms of a program, see the module documentation.
+    """
+    def __init__(self):
+        self.parser = code_parser()
+        self.env = environment_with_builtins(builtins)  # holds the macros and pure definitions, for expansion
+        self.forms = []
+        self._loading = []  # paths of the files being inlined, to detect cycles
+
+    def add_file(self, path: str):
+        if path in self._loading:
+            raise LispError(f"Cyclic require! of {path}: {' -> '.join(self._loading + [path])}")
+        try:
+            with open(path) as f:
+                text = f.read()
+        except IOError as e:
+            raise LispError(str(e)) from e
+        self._loading.append(path)
+        try:
+            for form in self.parser.parse_file(text):
+                self.add_form(form)
+        finally:
+            self._loading.pop()
+
+    def add_form(self, form):
+        form = self.expand(form)
+        if _is_require(form):
+            self.add_file(form.tail().head())
+            return
+        if _pure_definition(form) is not None:
+            try:
+                interpret(form, self.env)
+            except LispError:
+                pass  # it will fail at run time as well
+        self.forms.append(form)
+
+    def expand(self, form):
+        """
+        Expands the macro heading the form (repeatedly) if there is one.
+        """
+        while isinstance(form, ConsCell) and isinstance(form.head(), Symbol):
+            try:
+                op = self.env.lookup(form.head().name)
+            except LispError:
+                return form
+            if not isinstance(op, Macro) or not lisp_list_is_valid(form):
+                return form
+            try:
+                form = op(lisp_list_to_python(form.tail()))
+            except LispError:
+                return form  # the error is reported at run time
+        return form
+
+    def live_forms(self) -> list:
+        """
+        Returns the forms without the pure definitions unreachable from the other forms.
+        """
+        roots = set()
+        definitions = {}  # name -> value codes of its pure definitions
+        for form in self.forms:
+            definition = _pure_definition(form)
+            if definition is not None:
+                definitions.setdefault(definition[0], []).append(definition[1])
+            else:
+                roots |= symbols_in_code(form)
+        reachable = set()
+        pending = list(roots)
+        while pending:
+            name = pending.pop()
+            if name in reachable:
+                continue
+            reachable.add(name)
+            for value in definitions.get(name, ()):
+                pending.extend(symbols_in_code(value) - reachable)
+        if "require!" in reachable:
+            return list(self.forms)
+        return [form for form in self.forms
+                if _pure_definition(form) is None or _pure_definition(form)[0] in reachable]
+
+
+def build_bundle(path: str, output: str) -> (int, int):
+    """
+    Builds the bundle of the program in path, writes it to output.
+    Returns the count of the inlined top-level forms and of the forms kept in the bundle.
+    """
+    bundler = Bundler()
+    bundler.add_file(path)
+    forms = bundler.live_forms()
+    try:
+        data = pickle.dumps(forms)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise LispError(f"The program contains values that cannot be bundled: {e}") from e
+    with open(output, "wb") as f:
+        f.write(MAGIC)
+        f.write(data)
+    return len(bundler.forms), len(forms)
+
+
+def is_bundle(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_bundle(path: str) -> List:
+    """
+    Returns the code values of the forms in the bundle, which has to be trusted (see the module documentation).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise LispError(f"{path} is not a bundle")
+        return pickle.load(f)
+
+
+def run_bundle(path: str, env: Environment, evaluator=interpret):
+    """
+    Evaluates the forms of the bundle in the environment.
+    """
+    for form in read_bundle(path):
+        evaluator(form, env)
@@ -0,0 +1,178 @@
+"""
+An evaluator keeping its continuation in an explicit stack instead of the Python call stack (a CEK machine:
+Control - the evaluated term, Environment, Kontinuation - the stack of pending frames).
+
+The core forms (if, begin, let, letrec, define!, quote), function application and builtins that just evaluate
+all their arguments (see Builtin.strict) are handled by the machine itself, so LISP recursion through them
+only grows the heap-allocated stack and is limited only by the available memory.
+Calls in tail position do not grow the stack at all.
+Other builtins are called as usual and evaluate their arguments with the recursive interpret.
+"""
+from pylisp.budget import budgets
+from pylisp.builtins import builtins, Closure, parse_letrec_bindings
+from pylisp.environment import Environment
+from pylisp.errors import LispError
+from pylisp.interpreter import ConsCell, Symbol, Builtin, Macro, interpret, lisp_list_to_python, lisp_data_to_str, \
+    hash_consing
+from pylisp.stats import statistics
+
+_IF = builtins["if"]
+_BEGIN = builtins["begin"]
+_LET = builtins["let"]
+_LETREC = builtins["letrec"]
+_DEFINE = builtins["define!"]
+
+# kinds of continuation frames
+_APPLY = 0  # the operator of (frame[1]) has been evaluated, frame[2] is the environment of the application
+_ARGUMENT = 1  # an argument has been evaluated: operator, values so far, argument terms, environment
+_BRANCH = 2  # the condition of if has been evaluated: true branch, false branch, environment
+_SEQUENCE = 3  # an expression of begin has been evaluated: all terms, index of the next one, environment
+_BINDING = 4  # a letrec value has been evaluated: environment, bindings, index of the evaluated one, body
+_DEFINITION = 5  # the value of define! has been evaluated: name, environment
+
+
+def _check_arity(op: Builtin, args: list):
+    if op.arity is not None and len(args) != op.arity:
+        raise LispError(f"{op.name} expects {op.arity} arguments but was given {len(args)})")
+
+
+def evaluate(term, env: Environment):
+    """
+    Interprets the given code value in the environment, like interpret, but without recursion on the Python stack.
+    """
+    stack = []
+    while True:
+        # evaluate the term, either obtaining its value or pushing a frame and continuing with a subterm
+        if budgets.active is not None or statistics.enabled:
+            _monitor(len(stack))
+        if isinstance(term, ConsCell):
+            stack.append((_APPLY, term, env))
+            term = term.head()
+            continue
+        elif isinstance(term, Symbol):
+            value = interpret(term, env)
+        else:
+            value = term
+
+        # pass the value to the pending frames until one of them needs another term to be evaluated
+        while True:
+            if not stack:
+                return value
+            frame = stack.pop()
+            kind = frame[0]
+            if kind == _ARGUMENT:
+                _, op, values, args, env = frame
+                values.append(value)
+                if len(values) < len(args):
+                    stack.append(frame)
+                    term = args[len(values)]
+                    break
+                if isinstance(op, Builtin):
+                    value = op.strict(*values)
+                    continue
+                if isinstance(op, Closure):  # the body replaces the application, so no frame is left behind
+                    env = op.enter(values)
+                    term = op.body
+                    break
+                value = op(values)
+            elif kind == _APPLY:
+                _, sexpr, env = frame
+                op = value
+                args = lisp_list_to_python(sexpr.tail())
+                if isinstance(op, Builtin):
+                    _check_arity(op, args)
+                    if statistics.enabled:
+                        statistics.builtin_calls[op.name] += 1
+                    if op is _IF:
+                        stack.append((_BRANCH, args[1], args[2], env))
+                        term = args[0]
+                        break
+                    if op is _BEGIN and args:
+                        if len(args) > 1:
+                            stack.append((_SEQUENCE, args, 1, env))
+                        term = args[0]
+                        break
+                    if op is _LET or op is _LETREC:
+                        bindings = parse_letrec_bindings(ConsCell(args[0], None) if op is _LET else args[0])
+                        body = args[1]
+                        env = env.fork()
+                        for name, _ in bindings:
+                            env.allocate_forward_reference(name)
+                        if bindings:
+                            stack.append((_BINDING, env, bindings, 0, body))
+                            term = bindings[0][1]
+                        else:
+                            term = body
+                        break
+                    if op is _DEFINE:
+                        if not isinstance(args[0], Symbol):
+                            raise LispError(f"You can only bind to symbols, not to: {lisp_data_to_str(args[0])}")
+                        stack.append((_DEFINITION, args[0].name, env))
+                        term = args[1]
+                        break
+                    if op.strict is not None:
+                        if not args:
+                            value = op.strict()
+                            continue
+                        stack.append((_ARGUMENT, op, [], args, env))
+                        term = args[0]
+                        break
+                    value = op(env, *args)
+                elif isinstance(op, Macro):
+                    if statistics.enabled:
+                        statistics.macro_expansions += 1
+                    term = op(args)
+                    if hash_consing.enabled:
+                        term = hash_consing.canonical(term)
+                    break
+                elif callable(op):
+                    if args:
+                        stack.append((_ARGUMENT, op, [], args, env))
+                        term = args[0]
+                        break
+                    if isinstance(op, Closure):
+                        env = op.enter([])
+                        term = op.body
+                        break
+                    value = op([])
+                else:
+                    raise LispError(f"{lisp_data_to_str(sexpr.head())} cannot be applied"
+                                    f"\n in {lisp_data_to_str(sexpr)}")
+            elif kind == _BRANCH:
+                _, branch_true, branch_else, env = frame
+                term = branch_true if value else branch_else
+                break
+            elif kind == _SEQUENCE:
+                _, terms, index, env = frame
+                if index + 1 < len(terms):
+                    stack.append((_SEQUENCE, terms, index + 1, env))
+                term = terms[index]
+                break
+            elif kind == _BINDING:
+                _, env, bindings, index, body = frame
+                env.fill_forward_reference(bindings[index][0], value)
+                index += 1
+                if index < len(bindings):
+                    stack.append((_BINDING, env, bindings, index, body))
+                    term = bindings[index][1]
+                else:
+                    term = body
+                break
+            elif kind == _DEFINITION:
+                _, name, env = frame
+                env.update(name, value)
+                value = None
+
+
+def _monitor(depth: int):
+    """
+    Updates the statistics and enforces the active budget, the depth is the size of the continuation stack.
+    """
+    if statistics.enabled:
+        statistics.steps += 1
+        if depth > statistics.max_depth:
+            statistics.max_depth = depth
+    budget = budgets.active
+    if budget is not None:
+        budget.step()
+        budget.check_depth(depth)
@@ -0,0 +1,287 @@
+"""
+Tiered compilation of hot functions.
+
+Closures count their invocations, once a closure has been called tiering.threshold times its body is translated
+into the source of a Python function and compiled with compile(). In the translation:
+- the function arguments (and names bound by let) are Python local variables,
+- the other symbols are resolved once, in the environment captured by the closure,
+- builtins computing their result from evaluated arguments (see Builtin.strict) are called directly,
+  if, begin, quote and let are translated to Python statements,
+- recursive calls of the function itself call the compiled Python function,
+- errors are reported with the same forms as in the interpreter, the forms of builtins are wrapped in try statements
+  (which cost nothing unless an error is raised).
+The compiled code is only valid for the bindings it has been compiled against, so the closure only uses it
+while its environment keeps the version stamp it had at the time of compilation, and falls back to the interpreter
+otherwise. Bodies that use other forms (define!, fun, macros ...) are never compiled.
+"""
+from typing import Callable, Optional
+
+from pylisp.environment import Environment, fresh_version
+from pylisp.errors import LispError
+from pylisp.inference import UncheckedBuiltin
+from pylisp.interpreter import ConsCell, Symbol, Builtin, Macro, interpret, lisp_list_is_valid, \
+    lisp_list_to_python, lisp_data_to_str, python_list_to_lisp, error_in_form
+
+
+class Tiering:
+    """
+    Settings of the tiered compilation.
+    """
+    def __init__(self):
+        self.threshold = 50  # count of calls after which a closure is compiled, None disables the compilation
+        self.compiled = 0  # count of compiled closures
+        self.rejected = 0  # count of closures which bodies could not be compiled
+
+
+# the settings used by closures
+tiering = Tiering()
+
+
+class Unsupported(Exception):
+    """
+    Raised when a body contains a form that the compiler does not translate.
+    """
+    pass
+
+
+class FunctionCompiler:
+    """
+    Translates the body of a closure into the source of a Python function.
+    Every form is translated to statements storing its value in a Python local, so that the forms of builtins
+    can be wrapped in try statements which add the forms to the messages of errors, as the interpreter does.
+    """
+    def __init__(self, closure):
+        self.closure = closure
+        self.constants = {}  # names of the Python globals -> values
+        self.lines = []
+        self.locals_count = 0
+
+    def constant(self, value) -> str:
+        name = f"k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def fresh_local(self) -> str:
+        name = f"l{self.locals_count}"
+        self.locals_count += 1
+        return name
+
+    def emit(self, line: str, indent: int):
+        self.lines.append("    " * indent + line)
+
+    def assign(self, expression: str, indent: int) -> str:
+        local = self.fresh_local()
+        self.emit(f"{local} = {expression}", indent)
+        return local
+
+    def expression(self, code, scope: dict, indent: int) -> str:
+        """
+        Emits the statements computing the value of the code, scope maps LISP names to Python locals.
+        Returns a Python expression without side effects (a local, a constant or an operator applied to them)
+        that holds the value.
+        """
+        if isinstance(code, ConsCell):
+            return self.application(code, scope, indent)
+        if isinstance(code, Symbol):
+            if code.name in scope:
+                return scope[code.name]
+            try:
+                return self.constant(self.closure.env.lookup(code.name))
+            except LispError:
+                # undefined or a forward reference that has not been set yet, looked up when evaluated
+                return self.assign(f"_env.lookup({self.constant(code.name)})", indent)
+        if code is None:
+            return "None"
+        if type(code) is int:
+            return repr(code)
+        return self.constant(code)
+
+    def in_form(self, form, indent: int, emit_statements: Callable[[int], str]) -> str:
+        """
+        Emits the statements emitted by emit_statements(indentation), so that the LispErrors they raise get the form
+        added to their message (see error_in_form), returns the result of emit_statements.
+        """
+        start = len(self.lines)
+        self.emit("try:", indent)
+        result = emit_statements(indent + 1)
+        if len(self.lines) == start + 1:  # nothing is computed, so nothing can fail
+            self.lines.pop()
+            return result
+        self.emit("except LispError as err:", indent)
+        self.emit(f"raise _error_in_form(err, {self.constant(form)})", indent + 1)
+        return result
+
+    def values(self, args: list, scope: dict, indent: int) -> list:
+        return [self.expression(arg, scope, indent) for arg in args]
+
+    def operator(self, code, scope: dict):
+        """
+        Returns the value of an operator that can be resolved at compile time, or None.
+        """
+        if isinstance(code, Symbol) and code.name not in scope:
+            try:
+                return self.closure.env.lookup(code.name)
+            except LispError:
+                return None
+        if isinstance(code, Builtin):  # code built by macros or call_function can contain builtins themselves
+            return code
+        return None
+
+    def application(self, sexpr: ConsCell, scope: dict, indent: int) -> str:
+        if not lisp_list_is_valid(sexpr):
+            raise Unsupported(lisp_data_to_str(sexpr))
+        args = lisp_list_to_python(sexpr.tail())
+        op = self.operator(sexpr.head(), scope)
+        if op is None:  # computed at run time
+            return self.run_time_application(sexpr, args, scope, indent)
+        if isinstance(op, Builtin):
+            if op.arity is not None and len(args) != op.arity:
+                raise Unsupported(lisp_data_to_str(sexpr))
+            return self.builtin_application(op, args, scope, indent)
+        if isinstance(op, Macro) or not callable(op):
+            raise Unsupported(lisp_data_to_str(sexpr))
+        values = ", ".join(self.values(args, scope, indent))
+        if op is self.closure and len(args) == len(self.closure.args):
+            return self.assign(f"_self({values})", indent)
+        return self.assign(f"{self.constant(op)}([{values}])", indent)
+
+    def run_time_application(self, sexpr: ConsCell, args: list, scope: dict, indent: int) -> str:
+        op = self.expression(sexpr.head(), scope, indent)
+        result = self.fresh_local()
+        local_values = ", ".join(f"{name!r}: {local}" for name, local in scope.items())
+        self.emit(f"if _takes_code({op}):", indent)
+        self.emit(f"{result} = _interpret_at_run_time({op}, {self.constant(sexpr)}, {{{local_values}}}, _env)",
+                  indent + 1)
+        self.emit("else:", indent)
+        values = ", ".join(self.values(args, scope, indent + 1))
+        self.emit(f"{result} = {op}([{values}])", indent + 1)
+        return result
+
+    def builtin_application(self, op: Builtin, args: list, scope: dict, indent: int) -> str:
+        if op.name == "quote":
+            value = args[0]
+            return repr(value) if value is None or type(value) is int else self.constant(value)
+        if isinstance(op, UncheckedBuiltin):
+            # unchecked variants are applied without adding the form to errors, also by the interpreter
+            values = self.values(args, scope, indent)
+            if op.infix is not None and args:
+                # the types of the operands have been proven, so Python operators compute the same values
+                return f"({f' {op.infix} '.join(values)})"
+            return self.assign(f"{self.constant(op.strict)}({', '.join(values)})", indent)
+        form = python_list_to_lisp([Symbol(op.name)] + args)  # the form reported by the builtin
+        if op.name == "if":
+            return self.in_form(form, indent, lambda inner: self.conditional(args, scope, inner))
+        if op.name == "begin":
+            if not args:
+                raise Unsupported("(begin)")
+            return self.in_form(form, indent, lambda inner: self.values(args, scope, inner)[-1])
+        if op.name == "let":
+            return self.in_form(form, indent, lambda inner: self.let(args[0], args[1], scope, inner))
+        if op.strict is None:
+            raise Unsupported(op.name)
+        values = self.in_form(form, indent, lambda inner: self.values(args, scope, inner))
+        result = self.fresh_local()
+        self.emit("try:", indent)
+        self.emit(f"{result} = {self.constant(op.strict)}({', '.join(values)})", indent + 1)
+        self.emit("except LispError as err:", indent)
+        self.emit(f"raise _builtin_error(err, {self.constant(op)}, {self.constant(args)}, [{', '.join(values)}])",
+                  indent + 1)
+        return result
+
+    def conditional(self, args: list, scope: dict, indent: int) -> str:
+        cond, branch_true, branch_else = args
+        result = self.fresh_local()
+        self.emit(f"if {self.expression(cond, scope, indent)}:", indent)
+        self.emit(f"{result} = {self.expression(branch_true, scope, indent + 1)}", indent + 1)
+        self.emit("else:", indent)
+        self.emit(f"{result} = {self.expression(branch_else, scope, indent + 1)}", indent + 1)
+        return result
+
+    def let(self, binding, body, scope: dict, indent: int) -> str:
+        if not lisp_list_is_valid(binding) or len(lisp_list_to_python(binding)) != 2:
+            raise Unsupported("let")
+        name, value = lisp_list_to_python(binding)
+        if not isinstance(name, Symbol) or _refers_to(value, name.name):
+            # let is recursive, a value referring to its own name is left to the interpreter
+            raise Unsupported("let")
+        local = self.assign(self.expression(value, scope, indent), indent)
+        inner_scope = dict(scope)
+        inner_scope[name.name] = local
+        return self.expression(body, inner_scope, indent)
+
+
+def _refers_to(code, name: str) -> bool:
+    stack = [code]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, ConsCell):
+            stack.append(value.head())
+            stack.append(value.tail())
+        elif isinstance(value, Symbol) and value.name == name:
+            return True
+    return False
+
+
+def _takes_code(op) -> bool:
+    """
+    Checks if an operator known only at run time is applied by the interpreter (see _interpret_at_run_time).
+    """
+    return isinstance(op, (Builtin, Macro)) or not callable(op)
+
+
+def _interpret_at_run_time(op, form: ConsCell, local_values: dict, env: Environment):
+    """
+    Applies an operator that is only known at run time and is not a function. Builtins and macros take the code
+    of their operands (and builtins report errors with it), so the form is interpreted with the operator in place
+    of its head - in the closure's environment with the local variables bound.
+    """
+    if isinstance(op, (Builtin, Macro)):
+        form = ConsCell(op, form.tail())
+    # values that cannot be applied are reported with the original form
+    return interpret(form, env.fork_for_call(frozenset(local_values), local_values, fresh_version()))
+
+
+def _builtin_error(err: LispError, op: Builtin, args: list, values: list) -> LispError:
+    """
+    Returns the error of a builtin applied to values as the interpreter reports it, with the codes of the operands.
+    The builtin is applied again by the interpreter to operands that are symbols named like the original operands
+    (x, (f x) ...) and bound to their values, so that the operands are not evaluated again.
+    """
+    mapping = {}
+    operands = []
+    for code, value in zip(args, values):
+        if isinstance(code, (ConsCell, Symbol)):
+            name = lisp_data_to_str(code)
+            mapping.setdefault(name, value)
+            operands.append(Symbol(name))
+        else:
+            operands.append(code)
+    try:
+        op(Environment(mapping), *operands)
+    except LispError as reported:
+        return reported
+    return error_in_form(err, python_list_to_lisp([Symbol(op.name)] + args))
+
+
+def compile_closure(closure) -> Optional[Callable]:
+    """
+    Compiles the body of the closure into a Python function taking the argument values,
+    returns None if the body cannot be compiled.
+    """
+    compiler = FunctionCompiler(closure)
+    params = [f"a{idx}" for idx in range(len(closure.args))]
+    try:
+        body = compiler.expression(closure.body, dict(zip(closure.args, params)), 1)
+        compiler.emit(f"return {body}", 1)
+        source = f"def compiled({', '.join(params)}):\n" + "\n".join(compiler.lines) + "\n"
+        code = compile(source, f"<compiled {lisp_data_to_str(closure.body)[:40]}>", "exec")
+    except (Unsupported, RecursionError, SyntaxError, MemoryError):
+        tiering.rejected += 1
+        return None
+    namespace = dict(compiler.constants, _env=closure.env, LispError=LispError, _error_in_form=error_in_form,
+                     _builtin_error=_builtin_error, _takes_code=_takes_code,
+                     _interpret_at_run_time=_interpret_at_run_time)
+    exec(code, namespace)
+    namespace["_self"] = namespace["compiled"]
+    tiering.compiled += 1
+    return namespace["compiled"]
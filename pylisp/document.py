@@ -0,0 +1,251 @@
+"""
+Incremental parsing of source buffers being edited, for editor tooling (see pylisp.language_server).
+
+The text of a document is split into the spans of its top-level forms by a cheap scan that only follows parentheses
+and string literals. Each span is parsed on its own and the result is cached under the text of the span, so after
+an edit only the forms whose text changed are parsed again - forms that merely moved (because of an edit above
+them) keep their parse results. A syntax error only affects the form it occurs in, the rest of the document is
+still parsed.
+"""
+import re
+from bisect import bisect_right
+from typing import List, Optional
+
+from parsy import ParseError
+
+from pylisp.interpreter import code_parser, Symbol, ConsCell
+
+_NEWLINE = re.compile("\n")
+_WHITESPACE = " \t\r\n\f\v"
+_SPACE = re.compile(r"[ \t\r\n\f\v]*")
+_PREFIX = re.compile(r"(?:,@|['`,])*")
+_ATOM = re.compile(r"[^ \t\r\n\f\v()\"'`,]*")
+_LIST_TOKEN = re.compile(r'[()]|"[^"]*"?')  # a string without the closing quote is unclosed
+# forms (name value ...) defining the name: define! and the definition macros of the standard library
+_DEFINING_FORMS = ("define!", "defun", "defmacro", "defrec")
+
+
+def split_forms(text: str) -> List[tuple]:
+    """
+    Returns the (start, end) spans of the top-level forms of the text, without the whitespace between them.
+    An unmatched closing parenthesis is a span of its own. An unclosed list extends up to the next line starting with
+    an opening parenthesis (where the next top-level form most likely starts), an unclosed string to the end.
+    """
+    return list(_scan(text, 0))
+
+
+def _scan(text: str, idx: int):
+    """
+    Yields the spans of the forms from the offset on. The spans only depend on the text following the offset.
+    """
+    length = len(text)
+    while True:
+        idx = _SPACE.match(text, idx).end()
+        if idx >= length:
+            return
+        start = idx
+        idx = _PREFIX.match(text, idx).end()
+        idx = _form_end(text, idx)
+        yield start, idx
+
+
+def _form_end(text: str, idx: int) -> int:
+    length = len(text)
+    if idx >= length or text[idx] in _WHITESPACE:
+        return idx
+    if text[idx] == ")":
+        return idx + 1
+    if text[idx] == '"':
+        end = text.find('"', idx + 1)
+        return length if end == -1 else end + 1
+    if text[idx] != "(":
+        return _ATOM.match(text, idx).end()
+    start = idx
+    depth = 0
+    for match in _LIST_TOKEN.finditer(text, idx):
+        token = match.group()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+        elif len(token) == 1 or not token.endswith('"'):
+            return length  # an unclosed string
+    recovery = text.find("\n(", start)
+    return length if recovery == -1 else recovery
+
+
+def _common_prefix(first: str, second: str) -> int:
+    """
+    Returns the length of the common prefix of the texts (comparing slices, which is much faster than characters).
+    """
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(first: str, second: str, limit: int) -> int:
+    """
+    Returns the length of the common suffix of the texts, at most limit.
+    """
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[len(first) - middle:len(first) - low] == second[len(second) - middle:len(second) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class TopLevelForm:
+    """
+    A top-level form of a document.
+    start, end - the span of the form in the text of the document
+    values - the code values parsed from the span (usually one), None if it could not be parsed
+    error - the parse error message, error_offset its position in the text of the document
+    """
+    def __init__(self, start: int, end: int, text: str, values: Optional[list], error: Optional[str] = None,
+                 error_offset: Optional[int] = None):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.values = values
+        self.error = error
+        self.error_offset = error_offset
+
+
+class Document:
+    """
+    The text of a document and its top-level forms, updated incrementally, see the module documentation.
+    """
+    def __init__(self, text: str = ""):
+        self.parser = code_parser()
+        self.text = ""
+        self.forms = []
+        self._line_starts = [0]
+        self._parsed = {}  # text of a span -> (values, error message, error position within the span)
+        self.parsed = 0  # count of spans parsed by the last update
+        self.update(text)
+
+    def update(self, text: str) -> List[TopLevelForm]:
+        """
+        Replaces the text of the document, returns the forms which text was not in the document before
+        (so a client keeping the document evaluated only needs to evaluate them).
+        Only the part of the text around the change is scanned again: the forms before it are kept and the scan stops
+        as soon as it reaches the start of an old form following the change, the rest are the old forms moved.
+        """
+        previous = self._parsed
+        old_text, old_forms = self.text, self.forms
+        prefix = _common_prefix(old_text, text)
+        suffix = _common_suffix(old_text, text, min(len(old_text), len(text)) - prefix)
+        shift = len(text) - len(old_text)
+        kept = 0
+        # the scan of a form that parses looks at most 1 character past its end (the extent of an unclosed one depends
+        # on all the text following it)
+        while kept < len(old_forms) and old_forms[kept].end + 1 < prefix and old_forms[kept].error is None:
+            kept += 1
+        old_starts = {form.start: idx for idx, form in enumerate(old_forms[kept:], kept)}
+
+        self._parsed = {}
+        self.parsed = 0
+        self.text = text
+        self.forms = old_forms[:kept]
+        self._line_starts = [0] + [match.end() for match in _NEWLINE.finditer(text)]
+        changed = []
+        moved = len(old_forms)
+        for start, end in _scan(text, self.forms[-1].end if self.forms else 0):
+            if start >= len(text) - suffix and start - shift in old_starts:
+                moved = old_starts[start - shift]
+                break
+            span = text[start:end]
+            result = self._parsed.get(span) or previous.get(span)
+            if result is None:
+                result = self._parse(span)
+                self.parsed += 1
+            self._parsed[span] = result
+            values, error, error_idx = result
+            form = TopLevelForm(start, end, span, values, error, None if error_idx is None else start + error_idx)
+            self.forms.append(form)
+            if span not in previous:
+                changed.append(form)
+        for form in old_forms[moved:]:
+            self.forms.append(TopLevelForm(form.start + shift, form.end + shift, form.text, form.values, form.error,
+                                           None if form.error_offset is None else form.error_offset + shift))
+        for form in self.forms:  # the kept and moved ones
+            if form.text not in self._parsed:
+                self._parsed[form.text] = previous[form.text]
+        return changed
+
+    def edit(self, start: int, end: int, replacement: str) -> List[TopLevelForm]:
+        """
+        Replaces the text between the offsets, see update.
+        """
+        return self.update(self.text[:start] + replacement + self.text[end:])
+
+    def position(self, offset: int) -> (int, int):
+        """
+        Returns the (line, column) of the offset, both counted from 0.
+        """
+        line = bisect_right(self._line_starts, offset) - 1
+        return line, offset - self._line_starts[line]
+
+    def offset(self, line: int, column: int) -> int:
+        """
+        Returns the offset of the (line, column) position, positions past the end of a line or of the text are
+        moved to the end.
+        """
+        if line >= len(self._line_starts):
+            return len(self.text)
+        line_end = self._line_starts[line + 1] - 1 if line + 1 < len(self._line_starts) else len(self.text)
+        return min(self._line_starts[line] + column, line_end)
+
+    def _parse(self, span: str):
+        try:
+            return self.parser.parse_file(span), None, None
+        except ParseError as e:
+            if e.index >= len(span):
+                return None, "Syntax error: unexpected end of the form (an unclosed list or string)", e.index
+            return None, f"Syntax error: unexpected {span[e.index]!r}", e.index
+        except RecursionError:
+            return None, "Syntax error: the form nests too deeply", 0
+
+    def values(self) -> list:
+        """
+        Returns the code values of all forms that could be parsed, in order.
+        """
+        return [value for form in self.forms if form.values is not None for value in form.values]
+
+    def errors(self) -> List[TopLevelForm]:
+        return [form for form in self.forms if form.error is not None]
+
+    def form_at(self, offset: int) -> Optional[TopLevelForm]:
+        """
+        Returns the top-level form containing the offset (or ending at it), or None.
+        """
+        for form in self.forms:
+            if form.start <= offset <= form.end:
+                return form
+            if form.start > offset:
+                break
+        return None
+
+    def definitions(self) -> dict:
+        """
+        Returns the names defined by the top-level forms (define! name value), (defun name args body) ...
+        mapped to the last form defining them.
+        """
+        defined = {}
+        for form in self.forms:
+            for value in form.values or ():
+                if isinstance(value, ConsCell) and isinstance(value.head(), Symbol) \
+                        and value.head().name in _DEFINING_FORMS \
+                        and isinstance(value.tail(), ConsCell) and isinstance(value.tail().head(), Symbol):
+                    defined[value.tail().head().name] = form
+        return defined
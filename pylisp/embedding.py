@@ -0,0 +1,192 @@
+"""
+An API for embedding the interpreter in Python programs.
+
+> lisp = Interpreter()
+> lisp.eval("(define! double (fun (x) (* 2 x)))")
+> rule = lisp.prepare("(if (> amount limit) (double amount) amount)", ["amount", "limit"])
+> rule(30, 20)
+60
+> lisp.eval_many(rule, [(1, 2), (5, 3)])
+[1, 10]
+
+Prepared expressions are parsed once and evaluated as functions of their parameters, so evaluating them again
+costs no parsing at all (and hot ones get compiled, see pylisp.compiler).
+Values are converted between Python and LISP data: lists and tuples become LISP lists, dicts become hash maps
+and vice versa.
+Untrusted code can be limited by a budget, every evaluation exceeding it raises a BudgetExceeded error:
+> lisp = Interpreter(max_steps=100000, timeout=0.5)
+"""
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Iterable, Sequence, Optional
+
+from pylisp.budget import Budget
+from pylisp.builtins import builtins, Closure, capture_environment
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.hamt import HashMap
+from pylisp.interpreter import ConsCell, interpret, code_parser, python_list_to_lisp, lisp_list_is_valid, \
+    lisp_list_to_python
+from pylisp.vector import PersistentVector
+
+# count of distinct expression texts whose parsed code is kept by an Interpreter
+PARSE_CACHE_SIZE = 1024
+
+
+def to_lisp(value):
+    """
+    Converts a Python value to LISP data: lists and tuples to LISP lists, dicts to hash maps.
+    Other values (ints, strings, booleans, None ...) are used as they are.
+    """
+    if isinstance(value, (list, tuple)):
+        return python_list_to_lisp([to_lisp(element) for element in value])
+    if isinstance(value, dict):
+        return HashMap.from_items((to_lisp(key), to_lisp(item)) for key, item in value.items())
+    return value
+
+
+def to_python(value):
+    """
+    Converts LISP data to a Python value: LISP lists and vectors to lists, hash maps to dicts.
+    Other values are returned as they are.
+    """
+    if isinstance(value, ConsCell) and lisp_list_is_valid(value):
+        return [to_python(element) for element in lisp_list_to_python(value)]
+    if isinstance(value, PersistentVector):
+        return [to_python(element) for element in value]
+    if isinstance(value, HashMap):
+        return {_hashable(to_python(key)): to_python(item) for key, item in value.items()}
+    return value
+
+
+def _hashable(key):
+    # LISP lists can be hash map keys, but Python lists cannot be dict keys
+    return tuple(map(_hashable, key)) if isinstance(key, list) else key
+
+
+class PreparedExpression:
+    """
+    An expression parsed once, that can be evaluated many times with different values of its parameters.
+    Like a function, it sees the definitions made before it has been prepared.
+    """
+    def __init__(self, code, params: Sequence[str], function: Closure, budget=nullcontext):
+        """
+        budget - returns the context limiting an evaluation (see Interpreter.budget)
+        """
+        self.code = code
+        self.params = list(params)
+        self._function = function
+        self._budget = budget
+
+    def __call__(self, *args, **kwargs):
+        """
+        Evaluates the expression, the parameters are given as Python values, either positionally or by name.
+        The result is converted to a Python value.
+        """
+        if kwargs:
+            args = list(args)
+            for name in self.params[len(args):]:
+                if name not in kwargs:
+                    raise LispError(f"Missing value of the parameter {name}")
+                args.append(kwargs.pop(name))
+            if kwargs:
+                raise LispError(f"Unknown parameters: {', '.join(kwargs)}")
+        with self._budget():
+            return to_python(self._function([to_lisp(arg) for arg in args]))
+
+
+class Interpreter:
+    """
+    An interpreter with its own environment, meant to be used from Python code.
+    Parsed expression texts are cached, so evaluating the same text again does not parse it.
+    """
+    def __init__(self, max_steps: Optional[int] = None, max_depth: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        max_steps, max_depth, timeout - the limits of every evaluation (see pylisp.budget.Budget), None for no limit
+        """
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.parser = code_parser()
+        self.env = environment_with_builtins(builtins)
+        self._parsed = OrderedDict()  # expression text -> list of code values, in the order of use
+
+    def parse(self, text: str) -> list:
+        """
+        Parses the text into code values of all the expressions it contains.
+        """
+        try:
+            code = self._parsed[text]
+            self._parsed.move_to_end(text)
+            return code
+        except KeyError:
+            pass
+        code = self.parser.parse_file(text)
+        self._parsed[text] = code
+        if len(self._parsed) > PARSE_CACHE_SIZE:
+            self._parsed.popitem(last=False)
+        return code
+
+    def budget(self):
+        """
+        Returns the context limiting an evaluation by the interpreter's budget.
+        """
+        if self.max_steps is None and self.max_depth is None and self.timeout is None:
+            return nullcontext()  # an unlimited budget would only slow the interpreter down
+        return Budget(max_steps=self.max_steps, max_depth=self.max_depth, timeout=self.timeout)
+
+    def eval(self, text: str):
+        """
+        Evaluates all expressions in the text and returns the value of the last one as a Python value.
+        """
+        return to_python(self._evaluate(self.parse(text)))
+
+    def _evaluate(self, codes: list):
+        result = None
+        with self.budget():
+            for code in codes:
+                result = interpret(code, self.env)
+        return result
+
+    def load(self, path: str):
+        """
+        Evaluates a file of LISP code, for example a library.
+        The file is parsed without the cache, as it is not expected to be evaluated again.
+        """
+        with open(path) as f:
+            self._evaluate(self.parser.parse_file(f.read()))
+
+    def define(self, name: str, value):
+        """
+        Binds the name to a Python value (converted to LISP data) in the environment.
+        """
+        self.env.update(name, to_lisp(value))
+
+    def lookup(self, name: str):
+        """
+        Returns the value bound to the name, converted to a Python value.
+        """
+        return to_python(self.env.lookup(name))
+
+    def prepare(self, text: str, params: Sequence[str] = ()) -> PreparedExpression:
+        """
+        Prepares a single expression, the names of its parameters are bound to the values it is called with.
+        """
+        code = self.parse(text)
+        if len(code) != 1:
+            raise LispError(f"Expected a single expression, got {len(code)}")
+        params = list(params)
+        if len(set(params)) != len(params):
+            raise LispError(f"Parameter names have to be unique: {', '.join(params)}")
+        function = Closure(params, code[0], capture_environment(self.env, params, code[0]))
+        return PreparedExpression(code[0], params, function, self.budget)
+
+    def eval_many(self, expression, batch: Iterable, params: Sequence[str] = ()) -> list:
+        """
+        Evaluates the expression (a PreparedExpression, or a text that is prepared with the given parameters)
+        for every item of the batch, which is either a sequence of positional parameter values or a dict of them.
+        """
+        if not isinstance(expression, PreparedExpression):
+            expression = self.prepare(expression, params)
+        return [expression(**item) if isinstance(item, dict) else expression(*item) for item in batch]
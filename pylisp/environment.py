@@ -1,4 +1,17 @@
+import sys
+from itertools import count
+
 from pylisp.errors import UndefinedIdentifier, LispError
+from pylisp.stats import statistics
+
+_versions = count()
+
+
+def fresh_version() -> int:
+    """
+    Returns a new, globally unique, environment version stamp.
+    """
+    return next(_versions)
 
 
 class ForwardReference:
@@ -42,8 +55,12 @@ class Environment:
     To solve that issue we introduce ForwardReference which is added to the environment
     and is shallowly copied into environment forks, so once the forward reference is filled-in,
     it is updated in all forks.
+
+    Every environment carries a version stamp, environments with the same stamp are guaranteed to bind the same names
+    to the same values. A fork inherits the stamp of its origin and every modification assigns a fresh stamp.
+    This allows code symbols to cache the values they resolved to (see lookup_symbol).
     """
-    def __init__(self, mapping=None):
+    def __init__(self, mapping=None, version=None):
         """
         The constructor may be provided with an optional dictionary (str -> object).
         > Environment(map)
@@ -53,6 +70,9 @@ class Environment:
         >    env.update(k, v)
         """
         self._mapping = mapping if mapping is not None else {}
+        self.version = fresh_version() if version is None else version
+        # names which may be bound to different values in environments sharing our version (see fork_for_call)
+        self._unshared = frozenset()
 
     def fork(self):
         """
@@ -60,7 +80,76 @@ class Environment:
         All modifications to the new and original environment will be independent,
         with the exception of ForwardReferences which updates will be shared.
         """
-        return Environment(mapping=self._mapping.copy())
+        forked = Environment(mapping=self._mapping.copy(), version=self.version)
+        forked._unshared = self._unshared
+        if statistics.enabled:
+            forked._count_copy()
+        return forked
+
+    def fork_for_call(self, names: frozenset, values: dict, version: int):
+        """
+        Creates a fork with the provided arguments bound, used for function invocations.
+        All invocations of the same function pass the same version, so that their environments share the stamp
+        and symbols in the function body can reuse their cached values between calls.
+        The argument names are the only bindings that differ between these environments, so they are never cached.
+        """
+        forked = Environment(mapping=self._mapping.copy(), version=version)
+        forked._mapping.update(values)
+        forked._unshared = names
+        if statistics.enabled:
+            forked._count_copy()
+        return forked
+
+    def fork_for_loop(self, name: str):
+        """
+        Creates a fork in which a loop binds its variable, see rebind_unshared.
+        The fork gets a fresh stamp, as its variable can be bound differently than in the original environment.
+        """
+        return self.fork_for_call(frozenset([name]), {name: None}, fresh_version())
+
+    def rebind_unshared(self, identifier: str, value):
+        """
+        Rebinds a name that is never cached (see fork_for_call) without changing the version stamp,
+        so that the values cached for the other names stay valid - a loop binds its variable in every iteration.
+        If the environment has been modified since, the name could have been cached, so it gets a fresh stamp.
+        """
+        if identifier not in self._unshared:
+            self.version = fresh_version()
+            self._unshared = frozenset([identifier])
+        self._mapping[identifier] = value
+
+    def restrict(self, identifiers):
+        """
+        Creates an environment containing only the bindings of the provided identifiers (the ones that are bound).
+        Like in a fork, ForwardReferences are shared with the original environment.
+        """
+        mapping = self._mapping
+        restricted = Environment(mapping={name: mapping[name] for name in identifiers if name in mapping})
+        if statistics.enabled:
+            restricted._count_copy()
+        return restricted
+
+    def _count_copy(self):
+        statistics.forks += 1
+        statistics.fork_bytes += sys.getsizeof(self._mapping)
+
+    def bindings(self):
+        """
+        Iterates over the bound values, values of forward references are returned only if they have been set.
+        """
+        for value in self._mapping.values():
+            if isinstance(value, ForwardReference):
+                if value.is_set:
+                    yield value.get()
+            else:
+                yield value
+
+    def is_unset_reference(self, identifier: str) -> bool:
+        """
+        Checks if the identifier is bound to a forward reference that has not been set yet.
+        """
+        value = self._mapping.get(identifier)
+        return isinstance(value, ForwardReference) and not value.is_set
 
     def lookup(self, identifier: str):
         """
@@ -74,18 +163,34 @@ class Environment:
         except KeyError:
             raise UndefinedIdentifier(f"{identifier} is not defined")
 
+    def lookup_symbol(self, symbol):
+        """
+        Looks up the value of a code symbol, caching it in the symbol together with our version stamp.
+        As long as the symbol is evaluated in environments with the same stamp (a loop body, a top-level form,
+        successive invocations of a function) the cached value is returned without a lookup.
+        """
+        cache = symbol.cache
+        if cache is not None and cache[0] == self.version:
+            return cache[1]
+        value = self.lookup(symbol.name)
+        if symbol.name not in self._unshared:
+            symbol.cache = (self.version, value)
+        return value
+
     def update(self, identifier: str, value):
         """
         Binds the identifier to a new value.
         If it was already bound to something, it is rebound.
         """
         self._mapping[identifier] = value
+        self._modified()
 
     def allocate_forward_reference(self, identifier: str):
         """
         Allocates an empty forward reference.
         """
         self._mapping[identifier] = ForwardReference(identifier)
+        self._modified()
 
     def fill_forward_reference(self, identifier: str, value):
         """
@@ -97,9 +202,18 @@ class Environment:
             if not isinstance(ref, ForwardReference):
                 raise LispError(f"{identifier} is not a forward reference")
             ref.set(value)
+            self._modified()
         except KeyError:
             raise LispError(f"forward reference {identifier} has not been declared")
 
+    def _modified(self):
+        """
+        Gives the environment a fresh version stamp, invalidating values cached for the previous one.
+        The new stamp is not shared with any other environment, so all names can be cached again.
+        """
+        self.version = fresh_version()
+        self._unshared = frozenset()
+
     def __str__(self):
         return f"Env{str(self._mapping)}"
 
@@ -114,5 +228,6 @@ def empty_environment() -> Environment:
 def environment_with_builtins(builtins: dict) -> Environment:
     """
     Returns an environment with predefined values.
+    The dictionary is copied, so definitions made in the environment do not leak into it.
     """
-    return Environment(mapping=builtins)
+    return Environment(mapping=dict(builtins))
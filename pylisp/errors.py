@@ -8,3 +8,22 @@ class UndefinedIdentifier(LispError):
 
 class InvalidList(LispError):
     pass
+
+
+class BudgetExceeded(LispError):
+    """
+    Raised when an evaluation exceeds its budget (see pylisp.budget.Budget).
+    """
+    pass
+
+
+class StepLimitExceeded(BudgetExceeded):
+    pass
+
+
+class DepthLimitExceeded(BudgetExceeded):
+    pass
+
+
+class DeadlineExceeded(BudgetExceeded):
+    pass
@@ -0,0 +1,105 @@
+import mmap
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from pylisp.errors import LispError
+
+# reading files line by line is dominated by the count of system calls, so we use a buffer larger than the default
+BUFFER_SIZE = 1 << 16
+
+# files are read and written as UTF-8, whatever the locale (like memory-mapped files, which are decoded by us)
+ENCODING = "utf-8"
+
+
+class FileHandle:
+    """
+    An open file, reads and writes go through a buffer.
+    """
+    def __init__(self, path: str, mode: str):
+        if mode not in ("r", "w", "a"):
+            raise LispError(f"Unsupported file mode: {mode}, use one of r, w, a")
+        try:
+            self._file = open(path, mode, buffering=BUFFER_SIZE, encoding=ENCODING)
+        except IOError as e:
+            raise LispError(str(e)) from e
+        self.path = path
+        self.mode = mode
+
+    def _ensure_open(self):
+        if self._file.closed:
+            raise LispError(f"File {self.path} has already been closed")
+
+    @contextmanager
+    def _io_errors(self):
+        """
+        Converts the errors of the file operations (including a wrong mode or undecodable text) to LispErrors.
+        """
+        try:
+            yield
+        except (OSError, ValueError) as e:
+            raise LispError(f"File {self.path}: {e}") from e
+
+    def read_line(self) -> Optional[str]:
+        """
+        Returns the next line without its line terminator, or None at the end of file.
+        """
+        self._ensure_open()
+        with self._io_errors():
+            line = self._file.readline()
+        if line == "":
+            return None
+        return line.rstrip("\r\n")
+
+    def read_all(self) -> str:
+        self._ensure_open()
+        with self._io_errors():
+            return self._file.read()
+
+    def lines(self) -> Iterator[str]:
+        """
+        Iterates over the remaining lines, stops early if the file gets closed.
+        """
+        while not self._file.closed:
+            with self._io_errors():
+                line = self._file.readline()
+            if line == "":
+                return
+            yield line.rstrip("\r\n")
+
+    def write(self, text: str):
+        self._ensure_open()
+        with self._io_errors():
+            self._file.write(text)
+
+    def close(self):
+        with self._io_errors():  # the buffered text is written when the file is closed
+            self._file.close()
+
+    def __str__(self):
+        state = "closed" if self._file.closed else "open"
+        return f"<{state} file handle {self.path}>"
+
+
+def mmap_lines(path: str) -> Iterator[str]:
+    """
+    Iterates over lines of a file that is memory-mapped instead of being read through a buffer,
+    the operating system pages the data in on demand.
+    Errors (including undecodable lines) are raised as LispErrors when the failing line is reached.
+    """
+    try:
+        with open(path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files cannot be mapped
+                return
+            with mapped:
+                position = 0
+                size = len(mapped)
+                while position < size:
+                    end = mapped.find(b"\n", position)
+                    if end == -1:
+                        end = size
+                    yield mapped[position:end].decode(ENCODING).rstrip("\r")
+                    position = end + 1
+    except (OSError, ValueError) as e:
+        raise LispError(f"File {path}: {e}") from e
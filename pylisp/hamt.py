@@ -0,0 +1,268 @@
+"""
+A persistent (immutable) hash map implemented as a hash array mapped trie.
+
+Each level of the trie consumes 5 bits of the key's hash, so a node has at most 32 children.
+Nodes only store the children that are present, a bitmap tells which of the 32 slots are occupied.
+Updates copy only the nodes on the path from the root to the modified entry,
+all other nodes are shared between the old and the new version of the map.
+"""
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+_missing = object()
+
+
+def _hash(key) -> int:
+    # true and 1 are equal in Python, keys are told apart by their types too (see _same)
+    return hash((type(key), key)) & _HASH_MASK
+
+
+def _same(first, second) -> bool:
+    return type(first) is type(second) and first == second
+
+
+def _bit_index(bitmap: int, bit: int) -> int:
+    return bin(bitmap & (bit - 1)).count("1")
+
+
+class _BitmapNode:
+    """
+    An inner node of the trie.
+    Entries are either leaves - (hash, key, value) tuples - or sub-nodes.
+    """
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _CollisionNode:
+    """
+    Holds the leaves whose keys have exactly the same hash.
+    """
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, key_hash, entries):
+        self.hash = key_hash
+        self.entries = entries
+
+
+def _leaf_hash(entry) -> int:
+    return entry.hash if isinstance(entry, _CollisionNode) else entry[0]
+
+
+def _merge(first, second, shift):
+    """
+    Creates a node holding two entries (a leaf or a collision node and a leaf) whose hashes differ at or after shift.
+    """
+    first_hash, second_hash = _leaf_hash(first), _leaf_hash(second)
+    if first_hash == second_hash:
+        if isinstance(first, _CollisionNode):
+            return _CollisionNode(first_hash, first.entries + (second,))
+        return _CollisionNode(first_hash, (first, second))
+    first_bit = 1 << ((first_hash >> shift) & _MASK)
+    second_bit = 1 << ((second_hash >> shift) & _MASK)
+    if first_bit == second_bit:
+        return _BitmapNode(first_bit, (_merge(first, second, shift + _BITS),))
+    if first_bit < second_bit:
+        return _BitmapNode(first_bit | second_bit, (first, second))
+    return _BitmapNode(first_bit | second_bit, (second, first))
+
+
+def _lookup(node, key_hash, key, default):
+    shift = 0
+    while True:
+        if isinstance(node, _CollisionNode):
+            if node.hash == key_hash:
+                for _, k, v in node.entries:
+                    if _same(k, key):
+                        return v
+            return default
+        bit = 1 << ((key_hash >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return default
+        entry = node.entries[_bit_index(node.bitmap, bit)]
+        if isinstance(entry, tuple):
+            if entry[0] == key_hash and _same(entry[1], key):
+                return entry[2]
+            return default
+        node = entry
+        shift += _BITS
+
+
+def _assoc(node, shift, leaf):
+    """
+    Returns a pair (new node, whether a new key has been added).
+    """
+    key_hash, key, value = leaf
+    if isinstance(node, _CollisionNode):
+        if node.hash != key_hash:
+            return _merge(node, leaf, shift), True
+        for idx, (_, k, v) in enumerate(node.entries):
+            if _same(k, key):
+                if v is value:
+                    return node, False
+                return _CollisionNode(key_hash, node.entries[:idx] + (leaf,) + node.entries[idx + 1:]), False
+        return _CollisionNode(key_hash, node.entries + (leaf,)), True
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    idx = _bit_index(node.bitmap, bit)
+    entries = node.entries
+    if not node.bitmap & bit:
+        return _BitmapNode(node.bitmap | bit, entries[:idx] + (leaf,) + entries[idx:]), True
+
+    entry = entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] == key_hash and _same(entry[1], key):
+            if entry[2] is value:
+                return node, False
+            replacement, added = leaf, False
+        else:
+            replacement, added = _merge(entry, leaf, shift + _BITS), True
+    else:
+        replacement, added = _assoc(entry, shift + _BITS, leaf)
+        if replacement is entry:
+            return node, False
+    return _BitmapNode(node.bitmap, entries[:idx] + (replacement,) + entries[idx + 1:]), added
+
+
+def _dissoc(node, shift, key_hash, key):
+    """
+    Returns the node without the key, None if the node became empty.
+    A node reduced to a single leaf is returned as that leaf, so that the parent can inline it.
+    """
+    if isinstance(node, _CollisionNode):
+        if node.hash != key_hash:
+            return node
+        remaining = tuple(entry for entry in node.entries if not _same(entry[1], key))
+        if len(remaining) == len(node.entries):
+            return node
+        if len(remaining) == 1:
+            return remaining[0]
+        return _CollisionNode(key_hash, remaining)
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    idx = _bit_index(node.bitmap, bit)
+    entries = node.entries
+    entry = entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] != key_hash or not _same(entry[1], key):
+            return node
+        replacement = None
+    else:
+        replacement = _dissoc(entry, shift + _BITS, key_hash, key)
+        if replacement is entry:
+            return node
+
+    if replacement is None:
+        if len(entries) == 1:
+            return None
+        remaining = entries[:idx] + entries[idx + 1:]
+        if shift > 0 and len(remaining) == 1 and isinstance(remaining[0], tuple):
+            return remaining[0]
+        return _BitmapNode(node.bitmap & ~bit, remaining)
+    if shift > 0 and len(entries) == 1 and isinstance(replacement, tuple):
+        return replacement
+    return _BitmapNode(node.bitmap, entries[:idx] + (replacement,) + entries[idx + 1:])
+
+
+def _leaves(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for entry in reversed(node.entries):
+            if isinstance(entry, tuple):
+                yield entry
+            else:
+                stack.append(entry)
+
+
+_empty_node = _BitmapNode(0, ())
+
+
+class HashMap:
+    """
+    An immutable hash map, all 'modifying' operations return a new map sharing most of its structure with the old one.
+    Lookups and updates are O(log32 n).
+    Keys have to be hashable, LISP lists and symbols are hashed structurally.
+    """
+    __slots__ = ("_root", "_count", "_hash")
+
+    def __init__(self, root=_empty_node, count=0):
+        self._root = root
+        self._count = count
+        self._hash = None
+
+    @staticmethod
+    def from_items(items) -> "HashMap":
+        result = HashMap()
+        for key, value in items:
+            result = result.assoc(key, value)
+        return result
+
+    def get(self, key, default=None):
+        return _lookup(self._root, _hash(key), key, default)
+
+    def assoc(self, key, value) -> "HashMap":
+        """
+        Returns a map with the key bound to value.
+        """
+        root, added = _assoc(self._root, 0, (_hash(key), key, value))
+        if root is self._root:
+            return self
+        return HashMap(root, self._count + 1 if added else self._count)
+
+    def dissoc(self, key) -> "HashMap":
+        """
+        Returns a map without the key.
+        """
+        root = _dissoc(self._root, 0, _hash(key), key)
+        if root is self._root:
+            return self
+        if root is None:
+            return HashMap()
+        return HashMap(root, self._count - 1)
+
+    def items(self):
+        for _, key, value in _leaves(self._root):
+            yield key, value
+
+    def keys(self):
+        for _, key, _ in _leaves(self._root):
+            yield key
+
+    def values(self):
+        for _, _, value in _leaves(self._root):
+            yield value
+
+    def __contains__(self, key):
+        return _lookup(self._root, _hash(key), key, _missing) is not _missing
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self._count
+
+    def __eq__(self, other):
+        if not isinstance(other, HashMap):
+            return False
+        if self is other:
+            return True
+        if len(self) != len(other):
+            return False
+        return all(_same(other.get(key, _missing), value) for key, value in self.items())
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((HashMap, frozenset(self.items())))
+        return self._hash
+
+    def __str__(self):
+        return f"<hash map of size {len(self)}>"
@@ -0,0 +1,330 @@
+"""
+A local type inference pass over function bodies, eliminating runtime type checks.
+
+Arithmetic and Block builtins check the types of their operands on every call. When a closure is called for the
+first time (and the pass is enabled), its body is analysed in the order in which it will be evaluated, tracking which
+local names (function arguments and names bound by let) are known to hold ints or Blocks:
+- int literals and the results of +, -, *, mod are ints, the results of alloc! are Blocks,
+- once an operation checking its operands has been evaluated, the checked local names are known to have the types
+  (so in (if (< n 2) n (- n 1)), n is an int in both branches),
+- in the true branch of (if (int? x) ...), x is an int.
+Operations which all checked operands are proven are rewritten into unchecked variants of the builtins,
+everything else is left as it is.
+
+The rewriting relies on the operators resolving to the builtins in the environment captured by the closure,
+which cannot change. Bodies that could rebind names (using define!, require! or macros) are left as they are,
+as well as the code the analysis does not understand (nested functions, letrec, other special forms ...).
+"""
+import operator
+from weakref import WeakKeyDictionary
+
+from pylisp.environment import Environment
+from pylisp.errors import LispError
+from pylisp.interpreter import Builtin, ConsCell, Symbol, Macro, interpret, lisp_list_is_valid, \
+    lisp_list_to_python, python_list_to_lisp
+
+INT = "int"
+BLOCK = "Block"
+
+
+class Inference:
+    """
+    Settings and counters of the type inference pass.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.checks = 0  # count of operand type checks in the analysed bodies
+        self.specialized = 0  # count of operations rewritten into unchecked ones
+        self.eliminated = 0  # count of operand type checks removed by the rewriting
+
+    def reset(self):
+        self.checks = 0
+        self.specialized = 0
+        self.eliminated = 0
+
+
+# the settings used by closures
+inference = Inference()
+
+
+def _divide(a, b):
+    if b == 0:
+        raise LispError("Division by 0")
+    return a / b
+
+
+class Operation:
+    """
+    Describes what a builtin checks and computes.
+    operands - the type each operand is checked to have (None for operands which are not checked),
+               for vararg builtins a single type of all operands
+    result - the type of the result, if known
+    unchecked - the function computing the result without the checks (None if there is no unchecked variant)
+    infix - a Python operator computing the same result as unchecked, for compiled code (see pylisp.compiler)
+    """
+    def __init__(self, operands, result=None, unchecked=None, infix=None):
+        self.operands = operands
+        self.result = result
+        self.unchecked = unchecked
+        self.infix = infix
+
+    def operand_types(self, count: int) -> list:
+        return [self.operands] * count if isinstance(self.operands, str) else list(self.operands)
+
+
+OPERATIONS = {
+    "+": Operation(INT, INT, lambda *values: sum(values), "+"),
+    "-": Operation((INT, INT), INT, operator.sub, "-"),
+    "*": Operation((INT, INT), INT, operator.mul, "*"),
+    "/": Operation((INT, INT), None, _divide),
+    "mod": Operation((INT, INT), INT, operator.mod, "%"),
+    "=": Operation((INT, INT), None, operator.eq, "=="),
+    "<=": Operation((INT, INT), None, operator.le, "<="),
+    ">=": Operation((INT, INT), None, operator.ge, ">="),
+    "<": Operation((INT, INT), None, operator.lt, "<"),
+    ">": Operation((INT, INT), None, operator.gt, ">"),
+    "alloc!": Operation((INT,), BLOCK),
+    "get!": Operation((BLOCK, INT), None, lambda block, idx: block.get(idx)),
+    "set!": Operation((BLOCK, INT, None), None, lambda block, idx, value: block.set(idx, value)),
+}
+
+
+class UncheckedBuiltin(Builtin):
+    """
+    A variant of a builtin that does not check the types of its operands, used where the types have been proven.
+    It is pickled as the original builtin.
+    """
+    def __init__(self, original: Builtin, operation: Operation):
+        super().__init__(original.name, original.arity, original.doc, strict=operation.unchecked)
+        self.original = original
+        self.infix = operation.infix
+
+    def __call__(self, env: Environment, *args):
+        if len(args) == 2:
+            return self.strict(interpret(args[0], env), interpret(args[1], env))
+        return self.strict(*[interpret(arg, env) for arg in args])
+
+    def __reduce__(self):
+        return self.original.__reduce__()
+
+
+_unchecked_builtins = {}  # original builtin -> its unchecked variant
+
+
+def unchecked_variant(builtin: Builtin) -> UncheckedBuiltin:
+    unchecked = _unchecked_builtins.get(builtin)
+    if unchecked is None:
+        unchecked = UncheckedBuiltin(builtin, OPERATIONS[builtin.name])
+        _unchecked_builtins[builtin] = unchecked
+    return unchecked
+
+
+class BodyAnalysis:
+    """
+    Analyses and rewrites one function body, see the module documentation.
+    Facts map local names to their known types, they are updated as the analysis follows the evaluation order.
+    """
+    def __init__(self, env: Environment):
+        self.env = env
+        self.assumptions = {}  # names of the operators the analysis relied on -> values they resolve to
+        self.checks = 0
+        self.specialized = 0
+        self.eliminated = 0
+
+    def resolve(self, name: str):
+        value = _lookup(self.env, name)
+        self.assumptions[name] = value
+        return None if value is _UNBOUND else value
+
+    def analyse(self, code, facts: dict, scope: frozenset):
+        """
+        Returns the rewritten code and the type of its value (or None), updates the facts.
+        """
+        if isinstance(code, Symbol):
+            return code, facts.get(code.name) if code.name in scope else None
+        if not isinstance(code, ConsCell):
+            return code, INT if type(code) is int else None
+        if not lisp_list_is_valid(code):
+            return code, None
+        head = code.head()
+        args = lisp_list_to_python(code.tail())
+        if not isinstance(head, Symbol):
+            return code, None
+        if head.name in scope:  # a call of a function held in a local name
+            return self.rebuild(code, head, self.sequence(args, facts, scope)[0]), None
+        op = self.resolve(head.name)
+        if isinstance(op, Builtin):
+            if op.arity is not None and len(args) != op.arity:
+                return code, None
+            return self.builtin_application(code, head, op, args, facts, scope)
+        if callable(op) and not isinstance(op, Macro):  # a function, its arguments are evaluated in order
+            return self.rebuild(code, head, self.sequence(args, facts, scope)[0]), None
+        return code, None
+
+    def sequence(self, terms: list, facts: dict, scope: frozenset):
+        results = [self.analyse(term, facts, scope) for term in terms]
+        return [term for term, _ in results], [value_type for _, value_type in results]
+
+    def builtin_application(self, code: ConsCell, head, op: Builtin, args: list, facts: dict, scope: frozenset):
+        name = op.name
+        if name == "quote":
+            return code, INT if type(args[0]) is int else None
+        if name == "begin":
+            if not args:
+                return code, None
+            terms, types = self.sequence(args, facts, scope)
+            return self.rebuild(code, head, terms), types[-1]
+        if name == "if":
+            return self.conditional(code, head, args, facts, scope)
+        if name == "let":
+            return self.let(code, head, args, facts, scope)
+        if op.strict is None:  # a special form, or an operator that evaluates its operands in its own way
+            return code, None
+        terms, types = self.sequence(args, facts, scope)
+        operation = OPERATIONS.get(name)
+        if operation is None:
+            return self.rebuild(code, head, terms), None
+        required = operation.operand_types(len(args))
+        checked = [idx for idx, required_type in enumerate(required) if required_type is not None]
+        self.checks += len(checked)
+        if operation.unchecked is not None and all(types[idx] == required[idx] for idx in checked):
+            self.specialized += 1
+            self.eliminated += len(checked)
+            head = unchecked_variant(op)
+        # the operation only succeeds if the operands have the types, so from now on they are known to have them
+        for idx in checked:
+            if isinstance(args[idx], Symbol) and args[idx].name in scope:
+                facts[args[idx].name] = required[idx]
+        return self.rebuild(code, head, terms), operation.result
+
+    def conditional(self, code: ConsCell, head, args: list, facts: dict, scope: frozenset):
+        cond, branch_true, branch_else = args
+        cond, _ = self.analyse(cond, facts, scope)
+        facts_true = dict(facts)
+        refined = self.refinement(cond, scope)
+        if refined is not None:
+            facts_true[refined] = INT
+        facts_else = dict(facts)
+        branch_true, type_true = self.analyse(branch_true, facts_true, scope)
+        branch_else, type_else = self.analyse(branch_else, facts_else, scope)
+        # after the if, only what holds after both branches is known
+        facts.clear()
+        facts.update({name: value_type for name, value_type in facts_true.items()
+                      if facts_else.get(name) == value_type})
+        return self.rebuild(code, head, [cond, branch_true, branch_else]), \
+            type_true if type_true == type_else else None
+
+    def refinement(self, cond, scope: frozenset):
+        """
+        Returns the local name that is an int if the condition holds, for conditions (int? name).
+        """
+        if isinstance(cond, ConsCell) and isinstance(cond.head(), Symbol) and cond.head().name not in scope \
+                and lisp_list_is_valid(cond) and len(lisp_list_to_python(cond)) == 2:
+            op = self.resolve(cond.head().name)
+            arg = cond.tail().head()
+            if isinstance(op, Builtin) and op.name == "int?" and isinstance(arg, Symbol) and arg.name in scope:
+                return arg.name
+        return None
+
+    def let(self, code: ConsCell, head, args: list, facts: dict, scope: frozenset):
+        binding, body = args
+        if not lisp_list_is_valid(binding) or len(lisp_list_to_python(binding)) != 2:
+            return code, None
+        name, value = lisp_list_to_python(binding)
+        if not isinstance(name, Symbol) or name.name in symbols_of(value):
+            return code, None  # let is recursive, a value referring to its own name is left as it is
+        value, value_type = self.analyse(value, facts, scope)
+        inner_facts = dict(facts)
+        inner_facts.pop(name.name, None)
+        if value_type is not None:
+            inner_facts[name.name] = value_type
+        body, body_type = self.analyse(body, inner_facts, scope | {name.name})
+        shadowed = facts.get(name.name)
+        facts.clear()
+        facts.update(inner_facts)
+        facts.pop(name.name, None)
+        if shadowed is not None:
+            facts[name.name] = shadowed
+        if value is not binding.tail().head():
+            binding = python_list_to_lisp([name, value])
+        return self.rebuild(code, head, [binding, body]), body_type
+
+    def can_rebind(self, body) -> bool:
+        """
+        Tells whether evaluating the body could rebind names in the environment of the invocation
+        - it refers to define!, require! or to a macro (which could expand to them).
+        """
+        for value in _code_values(body):
+            if isinstance(value, Symbol):
+                if value.name in ("define!", "require!"):
+                    return True
+                value = self.resolve(value.name)
+            if isinstance(value, Macro) or isinstance(value, Builtin) and value.name in ("define!", "require!"):
+                return True
+        return False
+
+    @staticmethod
+    def rebuild(code: ConsCell, head, terms: list):
+        """
+        Returns the code with the head and arguments replaced, or the original code if none of them changed.
+        """
+        if head is code.head() and all(new is old for new, old in zip(terms, lisp_list_to_python(code.tail()))):
+            return code
+        return ConsCell(head, python_list_to_lisp(terms))
+
+
+def _code_values(code):
+    """
+    Iterates over the symbols and other atoms of the code.
+    """
+    stack = [code]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, ConsCell):
+            stack.append(value.head())
+            stack.append(value.tail())
+        else:
+            yield value
+
+
+def symbols_of(code) -> set:
+    return {value.name for value in _code_values(code) if isinstance(value, Symbol)}
+
+
+# body -> (rewritten body or None if it is unchanged, assumptions, argument names), the rewriting is reused
+# by closures created from the same code - an unchanged body is not stored, as the entry would keep its key alive
+_specialized_bodies = WeakKeyDictionary()
+
+
+def specialize(args: list, body, env: Environment):
+    """
+    Returns the body of a function with the given argument names and captured environment,
+    with the operations on proven types rewritten into unchecked ones.
+    """
+    if not isinstance(body, ConsCell):
+        return body
+    cached = _specialized_bodies.get(body)
+    if cached is not None:
+        rewritten, assumptions, arg_names = cached
+        if arg_names == args and all(_lookup(env, name) is value for name, value in assumptions.items()):
+            return body if rewritten is None else rewritten
+    analysis = BodyAnalysis(env)
+    if analysis.can_rebind(body):
+        rewritten = body
+    else:
+        rewritten, _ = analysis.analyse(body, {}, frozenset(args))
+    _specialized_bodies[body] = (None if rewritten is body else rewritten, analysis.assumptions, list(args))
+    inference.checks += analysis.checks
+    inference.specialized += analysis.specialized
+    inference.eliminated += analysis.eliminated
+    return rewritten
+
+
+_UNBOUND = object()
+
+
+def _lookup(env: Environment, name: str):
+    try:
+        return env.lookup(name)
+    except LispError:
+        return _UNBOUND
@@ -1,18 +1,27 @@
+import sys
 from typing import Iterable, IO, Union, List
+from weakref import WeakValueDictionary
 
 from pylisp.ast import *
+from pylisp.budget import budgets
 from pylisp.environment import Environment
-from pylisp.errors import LispError, InvalidList
+from pylisp.errors import LispError, InvalidList, BudgetExceeded
 from pylisp.parser import Parser
+from pylisp.stats import statistics
 
 
 class ConsCell:
     """
     A basic building block of a LISP list.
     """
+    __slots__ = ("_head", "_tail", "_hash", "__weakref__")  # weak references are used by caches keyed by code
+
     def __init__(self, head, tail):
         self._head = head
         self._tail = tail
+        self._hash = None  # cells are immutable, so the structural hash is computed at most once
+        if statistics.enabled:
+            statistics.cons_allocations += 1
 
     def head(self):
         return self._head
@@ -21,10 +30,47 @@ class ConsCell:
         return self._tail
 
     def __eq__(self, other):
+        if self is other:  # shared (hash-consed) code is compared without walking it
+            return True
         if isinstance(other, ConsCell):
-            return self.head() == other.head() and self.tail() == other.tail()
+            # true and 1 are equal in Python, but not as elements of LISP data
+            head, other_head = self.head(), other.head()
+            return type(head) is type(other_head) and head == other_head and self.tail() == other.tail()
         return False
 
+    def __hash__(self):
+        """
+        Structural hash, consistent with __eq__.
+        The spine of the list is walked iteratively so that long lists do not hit the recursion limit.
+        """
+        if self._hash is None:
+            heads = []
+            cell = self
+            while isinstance(cell, ConsCell):
+                heads.append(cell.head())
+                cell = cell.tail()
+            self._hash = hash((ConsCell, tuple(heads), cell))
+        return self._hash
+
+    def __reduce__(self):
+        """
+        Pickles the whole spine of the list at once, so that long lists do not hit the recursion limit
+        (and the structural hash, which depends on the process, is not stored).
+        """
+        heads = []
+        cell = self
+        while isinstance(cell, ConsCell):
+            heads.append(cell.head())
+            cell = cell.tail()
+        return _rebuild_list, (heads, cell)
+
+
+def _rebuild_list(heads: list, tail):
+    result = tail
+    for value in reversed(heads):
+        result = ConsCell(value, result)
+    return result
+
 
 class Symbol:
     """
@@ -32,6 +78,7 @@ class Symbol:
     """
     def __init__(self, name):
         self.name = name
+        self.cache = None  # (environment version, value) the symbol has last been resolved to
 
     def __str__(self):
         return f"Symbol({self.name})"
@@ -41,6 +88,12 @@ class Symbol:
             return self.name == other.name
         return False
 
+    def __hash__(self):
+        return hash((Symbol, self.name))
+
+    def __reduce__(self):
+        return Symbol, (self.name,)  # the cached value is not pickled
+
 
 LispList = Union[ConsCell, None]  # a LISP list is either a ConsCell or nil (None)
 
@@ -49,31 +102,131 @@ def python_list_to_lisp(lst: list) -> LispList:
     """
     Converts a Python list to a LISP list.
     """
-    if len(lst) == 0:
-        return None
-    return ConsCell(lst[0], python_list_to_lisp(lst[1:]))
+    # built from the end, so that long lists neither hit the recursion limit nor copy slices (which is O(N^2))
+    result = None
+    for value in reversed(lst):
+        result = ConsCell(value, result)
+    return result
+
+
+class HashConsing:
+    """
+    Settings and the table of the hash-consing of code.
+    When enabled, the lists read by code_parser and the code produced by macro expansions are hash-consed:
+    structurally equal lists (and symbols of the same name) are represented by a single shared instance.
+    Cells are immutable, so the sharing only shows in the memory used by large programs (definitions expanded
+    from the same macro share their skeleton, required files share the lists they have in common)
+    and in comparisons and hashing of equal code (the caches keyed by code), which take O(1) instead of walking it.
+    The table references the instances weakly, so the ones not used by any code anymore are collected.
+    A shared symbol caches a single value for all the places it occurs at (see Environment.lookup_symbol),
+    so code alternating between many environments looks up symbols more often - hence it is optional.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.shared = 0  # count of cells and symbols replaced by an existing instance
+        # cells are keyed by their head and tail, which are already hash-consed: immutable atoms are keyed by value
+        # (and type, as True == 1), other values by identity - the entry lives only as long as its cell,
+        # which keeps the values alive, so their identities are not reused in the meantime
+        self._cells = WeakValueDictionary()  # (type of head or None, head or its id, None or id of tail) -> cell
+        self._symbols = WeakValueDictionary()  # name -> symbol
+
+    def __len__(self):
+        """
+        Returns the count of live hash-consed cells.
+        """
+        return len(self._cells)
+
+    def symbol(self, name: str) -> "Symbol":
+        symbol = self._symbols.get(name)
+        if symbol is None:
+            symbol = self._symbols[name] = Symbol(name)
+        else:
+            self.shared += 1
+        return symbol
+
+    def cons(self, head, tail, original: ConsCell = None) -> ConsCell:
+        """
+        Returns the shared cell of the head and tail, which have to be hash-consed already.
+        The original cell of the same head and tail is registered if there is no shared one yet, instead of a new one.
+        """
+        if head is None or type(head) in _SHARED_ATOMS:
+            key = (type(head), head, tail if tail is None else id(tail))
+        else:
+            key = (None, id(head), tail if tail is None else id(tail))
+        cell = self._cells.get(key)
+        if cell is not None:
+            self.shared += 1
+            return cell
+        if original is None or original.head() is not head or original.tail() is not tail:
+            original = ConsCell(head, tail)
+        self._cells[key] = original
+        return original
+
+    def list(self, values: list) -> LispList:
+        """
+        Converts a Python list of hash-consed values to a hash-consed LISP list.
+        """
+        result = None
+        for value in reversed(values):
+            result = self.cons(value, result)
+        return result
+
+    def canonical(self, value):
+        """
+        Returns the hash-consed instance of a code value.
+        """
+        if isinstance(value, Symbol):
+            symbol = self._symbols.setdefault(value.name, value)
+            if symbol is not value:
+                self.shared += 1
+            return symbol
+        if not isinstance(value, ConsCell):
+            return value
+        # the spine of the list is walked iteratively so that long lists do not hit the recursion limit
+        cells = []
+        cell = value
+        while isinstance(cell, ConsCell):
+            cells.append(cell)
+            cell = cell.tail()
+        result = self.canonical(cell)
+        for cell in reversed(cells):
+            result = self.cons(self.canonical(cell.head()), result, cell)
+        return result
+
+    def clear(self):
+        self._cells.clear()
+        self._symbols.clear()
+        self.shared = 0
+
+
+# the types of heads of hash-consed cells that are compared by value
+_SHARED_ATOMS = (int, str, bool)
+
+
+# the settings used by code_parser and macro expansions
+hash_consing = HashConsing()
 
 
 def lisp_list_is_valid(lst) -> bool:
     """
     Checks if a LISP list is valid.
     """
-    if lst is None:
-        return True
-    if isinstance(lst, ConsCell):
-        return lisp_list_is_valid(lst.tail())
-    return False
+    while isinstance(lst, ConsCell):
+        lst = lst.tail()
+    return lst is None
 
 
 def lisp_list_length(lst) -> int:
     """
     Returns the length of a valid LISP list.
     """
-    if lst is None:
-        return 0
-    if isinstance(lst, ConsCell):
-        return 1 + lisp_list_length(lst.tail())
-    raise InvalidList("Expected a valid list")
+    length = 0
+    while isinstance(lst, ConsCell):
+        length += 1
+        lst = lst.tail()
+    if lst is not None:
+        raise InvalidList("Expected a valid list")
+    return length
 
 
 def lisp_list_to_python(lst) -> list:
@@ -104,14 +257,18 @@ class Builtin:
     Such an operation is called with its environment and the provided arguments' code values,
     a lot of interpretation logic actually happens in the builtins implementations.
     """
-    def __init__(self, name, arity, doc):
+    def __init__(self, name, arity, doc, strict=None):
         """
         name - name of the operator used to invoke it
         arity - arguments count, if None the operator is Vararg
+        strict - for operators that just evaluate all their arguments and compute the result from their values,
+                 a function computing the result from the values; it allows evaluators to evaluate the arguments
+                 themselves (see pylisp.cek)
         """
         self.name = name
         self.arity = arity
         self.doc = doc
+        self.strict = strict
 
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
@@ -157,6 +314,55 @@ def lisp_data_to_str(data):
     return str(data)
 
 
+def error_in_form(err: LispError, form) -> LispError:
+    """
+    Returns the error with the form it occurred in added to its message, this is how builtins report where errors
+    happened (at most 3 forms are reported). Exceeded budgets are kept as they are.
+    """
+    if isinstance(err, BudgetExceeded) or len(str(err).splitlines()) > 3:
+        return err
+    error = LispError(str(err) + f"\n in: {lisp_data_to_str(form)}")
+    error.__cause__ = err
+    return error
+
+
+def lisp_data_size(data) -> int:
+    """
+    Estimates the memory footprint (in bytes) of LISP data.
+    Shared substructures are counted once, opaque values (functions, blocks) only by their own object size.
+    """
+    seen = set()
+    stack = [data]
+    size = 0
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, ConsCell):
+            stack.append(value.head())
+            stack.append(value.tail())
+        elif isinstance(value, Symbol):
+            stack.append(value.name)
+    return size
+
+
+def code_parser() -> Parser:
+    """
+    Returns a parser that reads code values directly, without building an AST first.
+    """
+    return Parser(identifier=_read_symbol, int_literal=int, str_literal=str, expression_list=_read_list)
+
+
+def _read_symbol(name: str) -> Symbol:
+    return hash_consing.symbol(name) if hash_consing.enabled else Symbol(name)
+
+
+def _read_list(values: list) -> LispList:
+    return hash_consing.list(values) if hash_consing.enabled else python_list_to_lisp(values)
+
+
 def represent_code(tree: Tree):
     """
     To adhere to code as data paradigm, we convert the AST into data
@@ -184,16 +390,52 @@ def interpret(term, env: Environment):
     """
     Interprets the given code value in the environment
     """
+    if statistics.enabled or budgets.active is not None:
+        return interpret_monitored(term, env)
     # a list is executed according to its specific semantics (it can be a builtin, a macro or a function call)
     if isinstance(term, ConsCell):
         return interpret_sexpr(term, env)
     # a symbol is evaluated based on the environment to the value that is bound to it
     elif isinstance(term, Symbol):
-        return env.lookup(term.name)
+        # the cache check of Environment.lookup_symbol is inlined, as this is the hottest path of the interpreter
+        cache = term.cache
+        if cache is not None and cache[0] == env.version:
+            return cache[1]
+        return env.lookup_symbol(term)
     # other data is already treated as a value
     return term
 
 
+def interpret_monitored(term, env: Environment):
+    """
+    A variant of interpret that updates the statistics and enforces the active budget,
+    used when statistics are enabled or a budget is active.
+    """
+    budget = budgets.active
+    counted = statistics.enabled
+    if counted:
+        statistics.steps += 1
+    if budget is not None:
+        budget.step()
+    if isinstance(term, ConsCell):
+        if counted:
+            statistics.depth += 1
+            if statistics.depth > statistics.max_depth:
+                statistics.max_depth = statistics.depth
+        if budget is not None:
+            budget.enter()
+        try:
+            return interpret_sexpr(term, env)
+        finally:
+            if counted:
+                statistics.depth -= 1
+            if budget is not None:
+                budget.leave()
+    elif isinstance(term, Symbol):
+        return env.lookup_symbol(term)
+    return term
+
+
 def interpret_sexpr(sexpr: ConsCell, env: Environment):
     """
     A helper function to interpret a list of expressions - usually a function or builtin application
@@ -204,10 +446,16 @@ def interpret_sexpr(sexpr: ConsCell, env: Environment):
     if isinstance(op, Builtin):
         if op.arity is not None and len(args) != op.arity:
             raise LispError(f"{op.name} expects {op.arity} arguments but was given {len(args)})")
+        if statistics.enabled:
+            statistics.builtin_calls[op.name] += 1
         return op(env, *args)
 
     elif isinstance(op, Macro):
+        if statistics.enabled:
+            statistics.macro_expansions += 1
         code = op(args)
+        if hash_consing.enabled:
+            code = hash_consing.canonical(code)
         return interpret(code, env)
     elif callable(op):  # by default do a call-by-value
         return op(interpret_list(args, env))
@@ -223,11 +471,11 @@ def interpret_list(terms: Iterable[Tree], env: Environment) -> list:
     return list(map(lambda term: interpret(term, env), terms))
 
 
-def interpret_file(file: IO, env: Environment):
+def interpret_file(file: IO, env: Environment, evaluator=interpret):
     """
-    Reads a provided file and interprets all contained lines, mutating the provided environment
+    Reads a provided file and interprets all contained lines, mutating the provided environment.
+    The evaluator used for each statement can be replaced (see pylisp.cek).
     """
     code = file.read()
-    ast = Parser().parse_file(code)
-    for statement in map(represent_code, ast):
-        interpret(statement, env)
+    for statement in code_parser().parse_file(code):
+        evaluator(statement, env)
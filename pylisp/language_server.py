@@ -0,0 +1,233 @@
+"""
+A small language server for editors, speaking the Language Server Protocol (JSON-RPC messages with Content-Length
+headers) over stdin and stdout. Started by "pylisp lsp".
+
+Supported messages:
+- initialize, initialized, shutdown, exit,
+- textDocument/didOpen, textDocument/didChange (whole texts or ranged changes), textDocument/didClose
+  - after every change the syntax errors of the document are published (textDocument/publishDiagnostics),
+- textDocument/hover - the documentation of builtins (what help! prints), or the top-level form defining the name.
+A message that cannot be handled is answered by an internal error (or logged, if it is a notification).
+Documents are parsed incrementally (see pylisp.document), so a change only reparses the forms it touched.
+Positions are counted in characters of the text.
+"""
+import json
+import re
+import sys
+from inspect import cleandoc
+from typing import Optional
+
+from pylisp.builtins import builtins
+from pylisp.document import Document
+from pylisp.errors import LispError
+from pylisp.interpreter import Builtin
+
+_SYMBOL_CHAR = re.compile(r"[a-zA-Z0-9+\-*/=<>!?_]")
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+def read_message(stream) -> Optional[dict]:
+    """
+    Reads a message from the binary stream, returns None at the end of the stream.
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    if length is None:
+        raise ValueError("Missing Content-Length header")
+    return json.loads(stream.read(length).decode("utf-8"))
+
+
+def write_message(stream, message: dict):
+    body = json.dumps(message).encode("utf-8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    stream.flush()
+
+
+class LanguageServer:
+    """
+    Handles the messages of one editor session, see the module documentation.
+    """
+    def __init__(self):
+        self.documents = {}  # uri -> Document
+        self.shutdown_requested = False
+        self.exited = False
+
+    def handle(self, message: dict) -> list:
+        """
+        Handles a message from the editor, returns the messages to send back.
+        """
+        method = message.get("method")
+        params = message.get("params") or {}
+        is_request = "id" in message
+        if method == "exit":
+            self.exited = True
+            return []
+        if self.shutdown_requested and is_request:
+            return [self._error(message["id"], INVALID_REQUEST, "The server is shutting down")]
+        handler = self._handlers.get(method)
+        if handler is None:
+            return [self._error(message["id"], METHOD_NOT_FOUND, f"Unknown method {method}")] if is_request else []
+        try:
+            result, notifications = handler(self, params)
+        except (Exception, LispError) as e:  # a bad message must not stop the server
+            text = f"Failed to handle {method}: {e!r}"
+            if is_request:
+                return [self._error(message["id"], INTERNAL_ERROR, text)]
+            return [{"jsonrpc": "2.0", "method": "window/logMessage", "params": {"type": 1, "message": text}}]
+        if is_request:
+            return [{"jsonrpc": "2.0", "id": message["id"], "result": result}] + notifications
+        return notifications
+
+    def serve(self, input_stream=None, output_stream=None) -> int:
+        """
+        Serves the messages until the exit notification or the end of the input (stdin and stdout by default),
+        returns the exit code.
+        """
+        input_stream = input_stream if input_stream is not None else sys.stdin.buffer
+        output_stream = output_stream if output_stream is not None else sys.stdout.buffer
+        while not self.exited:
+            try:
+                message = read_message(input_stream)
+            except ValueError as e:  # includes malformed JSON
+                write_message(output_stream, self._error(None, PARSE_ERROR, str(e)))
+                continue
+            if message is None:
+                break
+            for response in self.handle(message):
+                write_message(output_stream, response)
+        return 0 if self.shutdown_requested else 1
+
+    @staticmethod
+    def _error(request_id, code: int, text: str) -> dict:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": text}}
+
+    def initialize(self, params: dict):
+        capabilities = {
+            "textDocumentSync": {"openClose": True, "change": 2},  # incremental changes
+            "hoverProvider": True,
+        }
+        return {"capabilities": capabilities, "serverInfo": {"name": "pylisp"}}, []
+
+    def shutdown(self, params: dict):
+        self.shutdown_requested = True
+        return None, []
+
+    def did_open(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        self.documents[uri] = Document(params["textDocument"]["text"])
+        return None, [self.diagnostics(uri)]
+
+    def did_change(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        document = self.documents.setdefault(uri, Document())
+        text = document.text
+        for change in params["contentChanges"]:
+            if "range" in change:
+                # the positions of consecutive changes refer to the text after the previous ones
+                start = _offset(text, change["range"]["start"])
+                end = _offset(text, change["range"]["end"])
+                text = text[:start] + change["text"] + text[end:]
+            else:
+                text = change["text"]
+        document.update(text)
+        return None, [self.diagnostics(uri)]
+
+    def did_close(self, params: dict):
+        uri = params["textDocument"]["uri"]
+        self.documents.pop(uri, None)
+        return None, [{"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+                       "params": {"uri": uri, "diagnostics": []}}]
+
+    def diagnostics(self, uri: str) -> dict:
+        """
+        Returns the notification publishing the syntax errors of the document.
+        """
+        document = self.documents[uri]
+        diagnostics = []
+        for form in document.errors():
+            diagnostics.append({
+                "range": self._range(document, form.error_offset, max(form.end, form.error_offset + 1)),
+                "severity": 1,
+                "source": "pylisp",
+                "message": form.error,
+            })
+        return {"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+                "params": {"uri": uri, "diagnostics": diagnostics}}
+
+    def hover(self, params: dict):
+        document = self.documents.get(params["textDocument"]["uri"])
+        if document is None:
+            return None, []
+        offset = document.offset(params["position"]["line"], params["position"]["character"])
+        start, end = _symbol_at(document.text, offset)
+        if start == end:
+            return None, []
+        name = document.text[start:end]
+        builtin = builtins.get(name)
+        definition = document.definitions().get(name)
+        if isinstance(builtin, Builtin):
+            doc = cleandoc(builtin.doc) if builtin.doc else "No documentation found"
+            contents = f"Documentation for: {builtin.name}\n\n{doc}"
+        elif definition is not None:
+            contents = definition.text
+        else:
+            return None, []
+        return {"contents": {"kind": "plaintext", "value": contents},
+                "range": self._range(document, start, end)}, []
+
+    @staticmethod
+    def _range(document: Document, start: int, end: int) -> dict:
+        start_line, start_column = document.position(start)
+        end_line, end_column = document.position(end)
+        return {"start": {"line": start_line, "character": start_column},
+                "end": {"line": end_line, "character": end_column}}
+
+    _handlers = {
+        "initialize": initialize,
+        "initialized": lambda self, params: (None, []),
+        "shutdown": shutdown,
+        "textDocument/didOpen": did_open,
+        "textDocument/didChange": did_change,
+        "textDocument/didClose": did_close,
+        "textDocument/hover": hover,
+    }
+
+
+def _offset(text: str, position: dict) -> int:
+    """
+    Returns the offset of the LSP position in the text, see Document.offset.
+    """
+    line_start = 0
+    for _ in range(position["line"]):
+        line_start = text.find("\n", line_start) + 1
+        if line_start == 0:
+            return len(text)
+    line_end = text.find("\n", line_start)
+    return min(line_start + position["character"], len(text) if line_end == -1 else line_end)
+
+
+def _symbol_at(text: str, offset: int) -> (int, int):
+    """
+    Returns the span of the symbol at (or ending at) the offset, an empty span if there is none.
+    """
+    start = offset
+    while start > 0 and _SYMBOL_CHAR.match(text[start - 1]):
+        start -= 1
+    end = offset
+    while end < len(text) and _SYMBOL_CHAR.match(text[end]):
+        end += 1
+    return start, end
@@ -6,16 +6,28 @@ from pylisp.ast import *
 
 
 class Parser(object):
-    def __init__(self):
+    def __init__(self, identifier=Identifier, int_literal=IntLiteral, str_literal=StringLiteral,
+                 expression_list=ExpressionList):
+        """
+        By default the parser returns ASTs, the factories building the nodes can be replaced to build other values
+        (see pylisp.interpreter.code_parser which builds code values directly):
+        identifier(name), int_literal(value), str_literal(value), expression_list(list of values)
+        """
         whitespace = regex(r'\s*')
 
         def lexeme(p):
             return p << whitespace
 
-        number_literal = lexeme(regex("\\-?[0-9]+")).map(lambda v: IntLiteral(int(v)))
-        symbol = lexeme(regex("[a-zA-Z+\\-*/=<>!?_][a-zA-Z+\\-*/=<>!?0-9_]*")).map(Identifier)
+        def prefixed_form(operator, value):
+            """
+            Desugars a reader prefix ('x, `x, ,x or ,@x) into the list (operator x).
+            """
+            return expression_list([identifier(operator), value])
+
+        number_literal = lexeme(regex("\\-?[0-9]+")).map(lambda v: int_literal(int(v)))
+        symbol = lexeme(regex("[a-zA-Z+\\-*/=<>!?_][a-zA-Z+\\-*/=<>!?0-9_]*")).map(identifier)
         string_part = regex(r'[^"\\]+')
-        string_literal = lexeme(string("\"") >> string_part.many().concat() << string("\"") | string("'") >> string_part.many().concat() << string("'")).map(StringLiteral)
+        string_literal = lexeme(string("\"") >> string_part.many().concat() << string("\"") | string("'") >> string_part.many().concat() << string("'")).map(str_literal)
         open_paren = lexeme(string("("))
         close_paren = lexeme(string(")"))
 
@@ -24,26 +36,40 @@ class Parser(object):
             yield open_paren
             elements = yield self._expr.many()
             yield close_paren
-            return ExpressionList(elements)
+            return expression_list(elements)
 
         # sample of desugaring
         @generate
         def quote():
             yield string("'")
             expr = yield self._expr
-            return ExpressionList([Identifier("quote"), expr])
+            return prefixed_form("quote", expr)
+
+        @generate
+        def quasiquote():
+            yield string("`")
+            expr = yield self._expr
+            return prefixed_form("quasiquote", expr)
+
+        @generate
+        def unquote():
+            yield string(",")
+            splicing = yield string("@").optional()
+            expr = yield self._expr
+            return prefixed_form("unquote-splicing" if splicing else "unquote", expr)
 
-        self._expr = number_literal | string_literal | quote | symbol | exprlist
+        self._expr = number_literal | string_literal | quote | quasiquote | unquote | symbol | exprlist
         self._file = self._expr.many()
 
     def parse_expr(self, code: str) -> Tree:
         """
-        Parses a single expression and returns an AST.
+        Parses a single expression and returns an AST (or the value built by the factories).
         """
         return self._expr.parse(code)
 
     def parse_file(self, code: str) -> List[Tree]:
         """
-        Parses a list of expressions (separated by whitespace) and returns list of ASTs of each expression.
+        Parses a list of expressions (separated by whitespace) and returns list of ASTs of each expression
+        (or of the values built by the factories).
         """
         return self._file.parse(code)
@@ -0,0 +1,113 @@
+"""
+Compilation of quasiquote templates.
+
+A template like `(define! ,name (fun ,args ,body)) is compiled once into a filler - a function that,
+given an environment, evaluates the unquoted expressions and builds the resulting list.
+Only the cells leading to the varying parts are built anew, constant sublists and the constant suffix
+of a list are shared with the template itself.
+"""
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+
+from pylisp.environment import Environment
+from pylisp.errors import LispError
+from pylisp.interpreter import ConsCell, Symbol, interpret, lisp_list_to_python, lisp_data_to_str
+
+Filler = Callable[[Environment], object]
+
+# compiled templates, keyed (structurally) by the template so that every template is compiled once
+_fillers = WeakKeyDictionary()
+
+# kinds of parts of a compiled list
+_CONSTANT = 0
+_VALUE = 1
+_SPLICE = 2
+
+
+def _form_argument(template, operator: str):
+    """
+    If the template is a form (operator x), returns x, otherwise None.
+    """
+    if isinstance(template, ConsCell) and isinstance(template.head(), Symbol) and template.head().name == operator:
+        if not isinstance(template.tail(), ConsCell) or template.tail().tail() is not None:
+            raise LispError(f"{operator} expects exactly one argument, in: {lisp_data_to_str(template)}")
+        return template.tail()
+    return None
+
+
+def _evaluator(expr) -> Filler:
+    return lambda env: interpret(expr, env)
+
+
+def compile_template(template, depth: int = 1) -> Optional[Filler]:
+    """
+    Compiles a quasiquote template nested depth quasiquotes deep.
+    Returns None if the template is constant (contains no unquotes at depth 1), so it can be used as it is.
+    """
+    if not isinstance(template, ConsCell):
+        return None
+    if _form_argument(template, "unquote") is not None:
+        if depth == 1:
+            return _evaluator(template.tail().head())
+        return _compile_list(template, depth - 1)
+    if _form_argument(template, "unquote-splicing") is not None:
+        if depth == 1:
+            raise LispError(f"unquote-splicing can only be used inside of a list, in: {lisp_data_to_str(template)}")
+        return _compile_list(template, depth - 1)
+    if _form_argument(template, "quasiquote") is not None:
+        return _compile_list(template, depth + 1)
+    return _compile_list(template, depth)
+
+
+def _compile_list(template: ConsCell, depth: int) -> Optional[Filler]:
+    parts = []  # (kind, constant value or filler) for each element
+    cells = []  # the cell of each element, so that the constant suffix can be shared
+    cell = template
+    while isinstance(cell, ConsCell):
+        element = cell.head()
+        spliced = _form_argument(element, "unquote-splicing") if depth == 1 else None
+        if spliced is not None:
+            parts.append((_SPLICE, _evaluator(spliced.head())))
+        else:
+            filler = compile_template(element, depth)
+            parts.append((_CONSTANT, element) if filler is None else (_VALUE, filler))
+        cells.append(cell)
+        cell = cell.tail()
+    tail_filler = compile_template(cell, depth)  # an improper list can have an unquote as its tail
+    if tail_filler is None:
+        varying = [idx for idx, (kind, _) in enumerate(parts) if kind != _CONSTANT]
+        if not varying:
+            return None
+        # everything after the last varying element is shared with the template
+        shared_tail = cells[varying[-1]].tail()
+        parts = parts[:varying[-1] + 1]
+    else:
+        shared_tail = None
+
+    def fill(env: Environment):
+        # the unquoted expressions are evaluated from left to right, the list is then built from its end
+        values = [(kind, part(env) if kind != _CONSTANT else part) for kind, part in parts]
+        result = tail_filler(env) if tail_filler is not None else shared_tail
+        for kind, value in reversed(values):
+            if kind == _SPLICE:
+                for spliced_value in reversed(lisp_list_to_python(value)):
+                    result = ConsCell(spliced_value, result)
+            else:
+                result = ConsCell(value, result)
+        return result
+    return fill
+
+
+def expand_quasiquote(template, env: Environment):
+    """
+    Fills in the template in the environment, compiling it on first use.
+    """
+    if not isinstance(template, ConsCell):
+        return template
+    filler = _fillers.get(template, _fillers)
+    if filler is _fillers:
+        filler = compile_template(template)
+        _fillers[template] = filler
+    if filler is None:
+        return template
+    return filler(env)
@@ -1,3 +1,4 @@
+from contextlib import nullcontext
 from traceback import print_exc
 
 from parsy import ParseError
@@ -6,26 +7,29 @@ from cmd import Cmd
 from pylisp.environment import environment_with_builtins
 from pylisp.builtins import builtins
 from pylisp.errors import LispError
-from pylisp.interpreter import represent_code, interpret, lisp_data_to_str
-from pylisp.parser import Parser
+from pylisp.interpreter import code_parser, interpret, lisp_data_to_str
 
 
 class Repl(Cmd):
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, budget_factory=nullcontext):
+        """
+        budget_factory creates the Budget every evaluated line is limited by (by default they are unlimited).
+        """
         super().__init__()
-        self.parser = Parser()
+        self.parser = code_parser()
         self.env = environment_with_builtins(builtins)
         self.prompt = "> "
         self._debug = debug
+        self._budget_factory = budget_factory
 
     def default(self, line):
         if line == "EOF":
             print("Bye!")
             return True
         try:
-            ast = self.parser.parse_expr(line)
-            code = represent_code(ast)
-            res = interpret(code, self.env)
+            code = self.parser.parse_expr(line)
+            with self._budget_factory():
+                res = interpret(code, self.env)
             if res is not None or self._debug:
                 print(lisp_data_to_str(res))
         except LispError as e:
@@ -1,24 +1,144 @@
 import argparse
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+from parsy import ParseError
 
 from pylisp.repl import Repl
-from pylisp.interpreter import interpret_file
+from pylisp.interpreter import interpret_file, interpret, hash_consing
+from pylisp.batch import run_batch, report, SUCCEEDED
+from pylisp.budget import Budget
 from pylisp.builtins import builtins
+from pylisp.bundle import build_bundle, is_bundle, run_bundle
+from pylisp.cek import evaluate
 from pylisp.environment import environment_with_builtins
+from pylisp.errors import BudgetExceeded, LispError
+from pylisp.inference import inference
+from pylisp.language_server import LanguageServer
+from pylisp.stats import statistics
+
+
+def build(argv):
+    parser = argparse.ArgumentParser(prog="pylisp build",
+                                     description='Bundle a program with the files it requires into a single file')
+    parser.add_argument('prog', help='program to bundle')
+    parser.add_argument('-o', '--output', default=None, help='the bundle file (by default prog with .bundle suffix)')
+    args = parser.parse_args(argv)
+    output = args.output if args.output is not None else os.path.splitext(args.prog)[0] + ".bundle"
+    try:
+        total, kept = build_bundle(args.prog, output)
+    except LispError as e:
+        print("Build failed:", e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Wrote {output}: {kept} of {total} top-level forms kept", file=sys.stderr)
+
+
+def batch(argv):
+    parser = argparse.ArgumentParser(prog="pylisp batch",
+                                     description='Run many scripts in parallel, each in its own process forked from'
+                                                 ' an interpreter that has loaded the preloaded files')
+    parser.add_argument('scripts', nargs='+', help='scripts to run')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='count of parallel processes')
+    parser.add_argument('--preload', action='append', default=[],
+                        help='file to load once before running the scripts (can be repeated)')
+    parser.add_argument("--cek", action='store_true',
+                        help='run the scripts with the evaluator that does not use the Python stack for recursion')
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help='abort a script after this many interpretation steps')
+    parser.add_argument("--timeout", type=float, default=None,
+                        help='abort a script that takes longer than this many seconds')
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("the count of jobs has to be at least 1")
+    start = time.perf_counter()
+    try:
+        results = run_batch(args.scripts, args.preload, args.jobs, max_steps=args.max_steps, timeout=args.timeout,
+                            evaluator=evaluate if args.cek else interpret)
+    except (LispError, ParseError, OSError) as e:
+        print("Preloading failed:", e, file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        if result.output:
+            print(f"==> {result.path} <==")
+            print(result.output, end="" if result.output.endswith("\n") else "\n")
+    print(report(results, elapsed, args.jobs), file=sys.stderr)
+    sys.exit(0 if all(result.status == SUCCEEDED for result in results) else 1)
+
+
+def language_server(argv):
+    # the arguments are ignored, editors pass options like --stdio which is the only transport anyway
+    sys.exit(LanguageServer().serve())
+
+
+SUBCOMMANDS = {"build": build, "batch": batch, "lsp": language_server}
 
 
 def main():
+    # an existing file named like a subcommand is a program to run
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS and not os.path.exists(sys.argv[1]):
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description='PyLisp interpreter')
     parser.add_argument('prog', nargs="?",
                         default="",
-                        help='program to run (if not specified, launches a REPL)')
+                        help='program (or bundle, with --bundle) to run (if not specified, launches a REPL),'
+                             ' use "pylisp build prog" to create a bundle,'
+                         ' "pylisp batch scripts..." to run many scripts in parallel'
+                         ' and "pylisp lsp" to start the language server for editors')
     parser.add_argument("--debug", action='store_true')
+    parser.add_argument("--bundle", action='store_true',
+                        help='run a bundle created by "pylisp build" - only run bundles you trust, as they are pickled')
+    parser.add_argument("--stats", action='store_true',
+                        help='report interpreter statistics (evaluation steps, calls, allocations...) after the run')
+    parser.add_argument("--cek", action='store_true',
+                        help='run the program with the evaluator that does not use the Python stack for recursion')
+    parser.add_argument("--infer-types", action='store_true',
+                        help='rewrite operations on proven ints and Blocks in function bodies to skip type checks')
+    parser.add_argument("--hash-cons", action='store_true',
+                        help='share structurally equal code (read or expanded from macros) to save memory')
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help='abort an evaluation after this many interpretation steps')
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help='abort an evaluation that nests deeper than this')
+    parser.add_argument("--timeout", type=float, default=None,
+                        help='abort an evaluation that takes longer than this many seconds')
 
     args = parser.parse_args()
+    statistics.enabled = args.stats
+    inference.enabled = args.infer_types
+    hash_consing.enabled = args.hash_cons
+
+    def make_budget():
+        if args.max_steps is None and args.max_depth is None and args.timeout is None:
+            return nullcontext()  # an unlimited budget would only slow the interpreter down
+        return Budget(max_steps=args.max_steps, max_depth=args.max_depth, timeout=args.timeout)
+
     if args.prog == "":
-        Repl(debug=args.debug).cmdloop()
+        Repl(debug=args.debug, budget_factory=make_budget).cmdloop()
     else:
-        with open(args.prog) as f:
-            interpret_file(f, environment_with_builtins(builtins))
+        try:
+            evaluator = evaluate if args.cek else interpret
+            if args.bundle:
+                with make_budget():
+                    run_bundle(args.prog, environment_with_builtins(builtins), evaluator)
+            elif is_bundle(args.prog):
+                # the header is only used to explain the error, a bundle is never loaded without --bundle
+                print(f"{args.prog} is a bundle, run it with --bundle if you trust it"
+                      f" (loading a bundle can run arbitrary Python code)", file=sys.stderr)
+                sys.exit(1)
+            else:
+                with open(args.prog) as f, make_budget():
+                    interpret_file(f, environment_with_builtins(builtins), evaluator)
+        except BudgetExceeded as e:
+            print("Aborted:", e, file=sys.stderr)
+            sys.exit(3)
+        finally:
+            if args.stats:
+                print(statistics.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
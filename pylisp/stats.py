@@ -0,0 +1,56 @@
+from collections import Counter
+
+
+class Statistics:
+    """
+    Counters describing the cost of a program run.
+    The interpreter only updates them when they are enabled, so that there is no overhead
+    (apart from checking the flag) otherwise.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.steps = 0  # calls of interpret
+        self.function_calls = 0
+        self.builtin_calls = Counter()  # builtin name -> count of calls
+        self.cons_allocations = 0
+        self.forks = 0  # environment copies
+        self.fork_bytes = 0  # size of the copied environment mappings
+        self.macro_expansions = 0
+        self.depth = 0  # current nesting of evaluated expressions
+        self.max_depth = 0
+
+    def items(self):
+        """
+        Returns the counters as (name, value) pairs, the builtin calls are a list of (name, count) pairs.
+        """
+        return [
+            ("steps", self.steps),
+            ("function-calls", self.function_calls),
+            ("builtin-calls", sorted(self.builtin_calls.items(), key=lambda item: (-item[1], item[0]))),
+            ("cons-allocations", self.cons_allocations),
+            ("forks", self.forks),
+            ("fork-bytes", self.fork_bytes),
+            ("macro-expansions", self.macro_expansions),
+            ("max-depth", self.max_depth),
+        ]
+
+    def report(self) -> str:
+        lines = [
+            f"interpret steps:       {self.steps}",
+            f"function calls:        {self.function_calls}",
+            f"cons allocations:      {self.cons_allocations}",
+            f"environment forks:     {self.forks} ({self.fork_bytes} bytes copied)",
+            f"macro expansions:      {self.macro_expansions}",
+            f"max recursion depth:   {self.max_depth}",
+            f"builtin calls:         {sum(self.builtin_calls.values())}",
+        ]
+        for name, count in self.items()[2][1]:
+            lines.append(f"  {name:<20} {count}")
+        return "\n".join(lines)
+
+
+# the statistics of the interpreter
+statistics = Statistics()
@@ -0,0 +1,88 @@
+from typing import Callable, Iterator, Optional
+
+
+class Promise:
+    """
+    A delayed computation.
+    The computation is run the first time the promise is forced, the result is remembered for subsequent forces.
+    """
+    def __init__(self, thunk: Callable[[], object]):
+        self._thunk = thunk
+        self._value = None
+        self.is_forced = False
+
+    def force(self):
+        if not self.is_forced:
+            value = self._thunk()
+            # the thunk may have forced this promise itself, in which case the first result is kept
+            if not self.is_forced:
+                self._value = value
+                self.is_forced = True
+                self._thunk = None  # the computation is no longer needed, so we let it be collected
+        return self._value
+
+    def __str__(self):
+        return "<forced promise>" if self.is_forced else "<promise>"
+
+
+class Stream:
+    """
+    A non-empty lazy list: the head is a value and the tail is a promise of the rest of the stream.
+    The empty stream is represented by nil (None), just like the empty list.
+    As the tails are memoized, traversing a stream computes every element at most once,
+    and the already traversed prefix can be garbage collected if nothing else refers to it.
+    """
+    __slots__ = ("_head", "_tail")
+
+    def __init__(self, head, tail: Promise):
+        self._head = head
+        self._tail = tail
+
+    def head(self):
+        return self._head
+
+    def tail(self) -> Optional["Stream"]:
+        return self._tail.force()
+
+    def __str__(self):
+        return "<stream>"
+
+
+def stream_from_iterator(iterator: Iterator) -> Optional[Stream]:
+    """
+    Creates a stream that lazily pulls its elements from a Python iterator (for example a generator).
+    """
+    for value in iterator:
+        return Stream(value, Promise(lambda: stream_from_iterator(iterator)))
+    return None
+
+
+def iterate_stream(stream: Optional[Stream]) -> Iterator:
+    """
+    Iterates over the elements of a stream without keeping the traversed prefix alive.
+    """
+    while stream is not None:
+        yield stream.head()
+        stream = stream.tail()
+
+
+def stream_map(func: Callable[[object], object], stream: Optional[Stream]) -> Optional[Stream]:
+    if stream is None:
+        return None
+    return Stream(func(stream.head()), Promise(lambda: stream_map(func, stream.tail())))
+
+
+def stream_filter(predicate: Callable[[object], object], stream: Optional[Stream]) -> Optional[Stream]:
+    # the rejected elements are skipped in a loop, so long runs of them do not cause deep recursion
+    while stream is not None and not predicate(stream.head()):
+        stream = stream.tail()
+    if stream is None:
+        return None
+    return Stream(stream.head(), Promise(lambda: stream_filter(predicate, stream.tail())))
+
+
+def stream_take(n: int, stream: Optional[Stream]) -> Optional[Stream]:
+    if n <= 0 or stream is None:
+        return None
+    # the tail of the last taken element is not forced, so no element past the first n is ever computed
+    return Stream(stream.head(), Promise(lambda: stream_take(n - 1, stream.tail()) if n > 1 else None))
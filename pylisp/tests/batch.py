@@ -0,0 +1,43 @@
+from pylisp.batch import run_batch, report, SUCCEEDED, FAILED, ABORTED
+
+
+def write(directory, name, text):
+    path = directory / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_batch(tmp_path):
+    library = write(tmp_path, "lib.cl", '(print! "loading")\n(define! double (fun (x) (* 2 x)))')
+    scripts = [
+        write(tmp_path, "uses.cl", f'(require! "{library}")\n(print! (double 21))'),
+        write(tmp_path, "defines.cl", "(define! secret 1)\n(print! secret)"),
+        write(tmp_path, "isolated.cl", "(print! secret)"),
+        write(tmp_path, "parse.cl", "(print! 1"),
+        write(tmp_path, "loop.cl", "(letrec ((count (fun (n) (if (= n 0) 0 (count (- n 1)))))) (count 50))"),
+        str(tmp_path / "missing.cl"),
+    ]
+    results = run_batch(scripts, preload=[library], jobs=2, max_steps=200)
+    assert [result.path for result in results] == scripts
+    assert [result.status for result in results] == [SUCCEEDED, SUCCEEDED, FAILED, FAILED, ABORTED, FAILED]
+    assert results[0].output == "42\n"
+    assert results[1].output == "1\n"
+    assert results[2].error.startswith("Runtime error")
+    assert results[3].error.startswith("Parse error")
+    summary = report(results, 1.0, 2)
+    assert "6 scripts in 1.00s with 2 jobs" in summary
+    assert "2 succeeded, 3 failed, 1 aborted" in summary
+
+
+def test_preloaded_files_are_only_skipped_during_the_batch(tmp_path, capsys):
+    from pylisp.builtins import builtins, preloaded
+    from pylisp.environment import environment_with_builtins
+    from pylisp.interpreter import code_parser, interpret
+
+    library = write(tmp_path, "lib.cl", '(print! "loading")')
+    [result] = run_batch([write(tmp_path, "a.cl", f'(require! "{library}")')], preload=[library], jobs=1)
+    assert result.status == SUCCEEDED and result.output == ""
+    assert not preloaded
+    capsys.readouterr()
+    interpret(code_parser().parse_expr(f'(require! "{library}")'), environment_with_builtins(builtins))
+    assert capsys.readouterr().out == "loading\n"
@@ -0,0 +1,88 @@
+import array
+import multiprocessing
+import pickle
+
+import pytest
+
+from pylisp.blocks import create_shared_block, attach_shared_block, MappedBlock, SharedBlock
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, code_parser
+
+
+def run(code, env):
+    result = None
+    for statement in code_parser().parse_file(code):
+        result = interpret(statement, env)
+    return result
+
+
+def test_shared_blocks_in_lisp():
+    env = environment_with_builtins(builtins)
+    run('(define! b (alloc-shared! 4)) (set! b 1 42) (define! c (attach-shared! (shared-name b)))', env)
+    assert run("(get! c 1)", env) == 42
+    run("(set! c 2 7)", env)
+    assert run("(list (get! b 2) (block-size b) (block-size (alloc! 3)))", env).head() == 7
+    assert run('(get! (alloc-shared! 2 "float64") 0)', env) == 0.0
+    with pytest.raises(LispError):
+        run('(set! b 0 "text")', env)
+    with pytest.raises(LispError):
+        run("(get! b 4)", env)
+    with pytest.raises(LispError):
+        run('(alloc-shared! 2 "int128")', env)
+    run("(release! c)", env)
+    with pytest.raises(LispError):
+        run("(get! c 0)", env)
+    assert run("(get! b 1)", env) == 42
+    name = run("(shared-name b)", env)
+    run("(release! b)", env)
+    with pytest.raises(LispError):
+        attach_shared_block(name)
+
+
+def _fill(block, start):
+    for idx in range(start, block.size(), 2):
+        block.set(idx, idx * idx)
+
+
+def test_shared_blocks_are_passed_to_processes_by_name():
+    block = create_shared_block(1000)
+    data = pickle.dumps(block)
+    assert len(data) < 100
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_fill, args=(block, start)) for start in (0, 1)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [block.get(idx) for idx in (0, 1, 999)] == [0, 1, 999 * 999]
+    copy = pickle.loads(data)
+    assert isinstance(copy, SharedBlock) and copy.get(999) == 999 * 999
+    copy.release()
+    block.release()
+
+
+def test_mapped_blocks(tmp_path):
+    path = tmp_path / "data.bin"
+    with open(path, "wb") as f:
+        array.array("q", range(10)).tofile(f)
+    env = environment_with_builtins(builtins)
+    run(f'(define! b (mmap-block! "{path}"))', env)
+    assert run("(+ (get! b 9) (block-size b))", env) == 19
+    run("(set! b 0 100)", env)
+    run("(release! b)", env)
+    assert MappedBlock(str(path)).get(0) == 100
+    assert MappedBlock(str(path), "int32").size() == 20
+    assert pickle.loads(pickle.dumps(MappedBlock(str(path)))).get(9) == 9
+
+    path.chmod(0o444)
+    read_only = MappedBlock(str(path))
+    if read_only.read_only:  # root can write to any file
+        with pytest.raises(LispError):
+            read_only.set(0, 1)
+    (tmp_path / "odd.bin").write_bytes(b"abc")
+    with pytest.raises(LispError):
+        MappedBlock(str(tmp_path / "odd.bin"))
+    (tmp_path / "empty.bin").write_bytes(b"")
+    assert MappedBlock(str(tmp_path / "empty.bin")).size() == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from pylisp.budget import Budget, budgets
+from pylisp.errors import StepLimitExceeded, DepthLimitExceeded, DeadlineExceeded, BudgetExceeded, LispError
+from pylisp.interpreter import interpret, represent_code
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+LOOP = "(letrec ((f (fun (n) (if (= n 0) 0 (f (- n 1)))))) (f 30))"
+INFINITE_LOOP = "(letrec ((f (fun () (f)))) (f))"
+
+
+def parse_and_run(code):
+    return interpret(represent_code(Parser().parse_expr(code)), environment_with_builtins(builtins))
+
+
+def test_within_budget():
+    with Budget(max_steps=100000, max_depth=1000, timeout=10) as budget:
+        assert parse_and_run(LOOP) == 0
+    assert budget.steps > 30
+    assert budget.depth == 0
+    assert budgets.active is None
+
+
+def test_step_limit():
+    with pytest.raises(StepLimitExceeded):
+        with Budget(max_steps=100):
+            parse_and_run(LOOP)
+    assert budgets.active is None
+
+
+def test_depth_limit():
+    with pytest.raises(DepthLimitExceeded):
+        with Budget(max_depth=50):
+            parse_and_run(INFINITE_LOOP)
+
+
+def test_deadline():
+    code = "(letrec ((f (fun (n) (if (= n 0) 0 (+ (f (- n 1)) (f (- n 1))))))) (f 30))"
+    with pytest.raises(DeadlineExceeded):
+        with Budget(timeout=0.05):
+            parse_and_run(code)
+
+
+def test_budget_errors_are_lisp_errors():
+    assert issubclass(BudgetExceeded, LispError)
@@ -0,0 +1,85 @@
+import pickle
+
+import pytest
+
+from pylisp.builtins import builtins
+from pylisp.bundle import build_bundle, read_bundle, run_bundle, is_bundle, is_pure
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.interpreter import represent_code, lisp_data_to_str, interpret, lisp_list_to_python
+from pylisp.parser import Parser
+
+LIBRARY = """(define! defun (macro (name args body) `(define! ,name (fun ,args ,body))))
+(defun helper (x) (* x 2))
+(defun used (x) (helper x))
+(defun unused (x) (+ x 1))
+(define! counter (alloc! 1))
+"""
+
+PROGRAM = """(require! "lib.cl")
+(set! counter 0 (used 21))
+"""
+
+
+def code(text):
+    return represent_code(Parser().parse_expr(text))
+
+
+def write_program(tmp_path, program=PROGRAM):
+    (tmp_path / "lib.cl").write_text(LIBRARY)
+    (tmp_path / "prog.cl").write_text(program)
+
+
+def test_pure_forms():
+    assert is_pure(code("(fun (x) (print! x))"))
+    assert is_pure(code("(letrec ((f (fun () 1))) f)"))
+    assert is_pure(code("'(print! 1)"))
+    assert not is_pure(code("(print! 1)"))
+    assert not is_pure(code("(let (x (alloc! 1)) (fun () x))"))
+
+
+def test_build_and_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_program(tmp_path)
+    total, kept = build_bundle("prog.cl", "prog.bundle")
+    assert (total, kept) == (6, 4)  # the macro and unused are dropped
+    assert is_bundle("prog.bundle")
+    assert not is_bundle("prog.cl")
+    forms = [lisp_data_to_str(form) for form in read_bundle("prog.bundle")]
+    assert "(define! used (fun (x) (helper x)))" in forms
+    assert not any("unused" in form or "defun" in form for form in forms)
+    (tmp_path / "lib.cl").unlink()  # the bundle does not need the required files
+    env = environment_with_builtins(builtins)
+    run_bundle("prog.bundle", env)
+    assert interpret(code("(get! counter 0)"), env) == 42
+
+
+def test_dynamic_require_keeps_definitions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_program(tmp_path, PROGRAM + '(define! load (fun (path) (require! path)))\n(load "other.cl")')
+    total, kept = build_bundle("prog.cl", "prog.bundle")
+    assert total == kept
+
+
+def test_build_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.cl").write_text('(require! "b.cl")')
+    (tmp_path / "b.cl").write_text('(require! "a.cl")')
+    with pytest.raises(LispError):
+        build_bundle("a.cl", "a.bundle")
+    with pytest.raises(LispError):
+        build_bundle("missing.cl", "a.bundle")
+    (tmp_path / "a.cl").write_text("1")
+    with pytest.raises(LispError):
+        read_bundle("a.cl")
+
+
+def test_code_values_pickle():
+    form = code("(define! f (fun (x) (+ x 1)))")
+    interpret(form, environment_with_builtins(builtins))  # fills the symbol caches
+    restored = pickle.loads(pickle.dumps(form))
+    assert restored == form
+    assert hash(restored) == hash(form)
+    assert pickle.loads(pickle.dumps(builtins["+"])) is builtins["+"]
+    long_list = represent_code(Parser().parse_expr("(" + " ".join(["1"] * 10000) + ")"))
+    assert lisp_list_to_python(pickle.loads(pickle.dumps(long_list))) == [1] * 10000
@@ -0,0 +1,63 @@
+import pytest
+
+from pylisp.budget import Budget
+from pylisp.cek import evaluate
+from pylisp.errors import LispError, DepthLimitExceeded
+from pylisp.interpreter import interpret, represent_code
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+PROGRAMS = [
+    "(+ 1 2 3)",
+    "(let (a 42) a)",
+    "(let (id (fun (x) x)) (id 33))",
+    "(begin (define! a 2) a)",
+    "(str (cons 2 (list 3 4)))",
+    "(str '(1 2 3))",
+    "(head (tail (list 1 2)))",
+    "(letrec ((fact (fun (n) (if (= n 0) 1 (* n (fact (- n 1))))))) (fact 10))",
+    "(letrec ((not (fun (b) (if b false true))) (even (fun (n) (if (= n 0) true (not (even (- n 1))))))) (even 8))",
+    "(let (a 2) (let (f (fun () a)) (let (a 3) (f))))",
+    "(let (m (macro (x) (list '+ x 1))) (m 41))",
+    "(let (f (fun () 7)) (f))",
+    "(str (stream->list (stream-map (fun (x) (* 2 x)) (range-stream 0 3))))",
+]
+
+
+def run(code, evaluator):
+    return evaluator(represent_code(Parser().parse_expr(code)), environment_with_builtins(builtins))
+
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_same_results_as_interpret(code):
+    assert run(code, evaluate) == run(code, interpret)
+
+
+def test_errors():
+    with pytest.raises(LispError):
+        run("(1 2)", evaluate)
+    with pytest.raises(LispError):
+        run("(+ 1 'a)", evaluate)
+    with pytest.raises(LispError):
+        run("(if 1 2)", evaluate)
+
+
+def test_deep_recursion():
+    code = "(letrec ((sum-to (fun (n) (if (= n 0) 0 (+ n (sum-to (- n 1))))))) (sum-to 20000))"
+    assert run(code, evaluate) == 20000 * 20001 // 2
+    with pytest.raises(RecursionError):
+        run(code, interpret)
+
+
+def test_tail_calls_do_not_grow_the_stack():
+    code = "(letrec ((loop (fun (n) (if (= n 0) 'done (loop (- n 1)))))) (loop 5000))"
+    with Budget(max_depth=20):
+        assert run(code, evaluate).name == "done"
+
+
+def test_depth_budget():
+    code = "(letrec ((f (fun (n) (+ 1 (f n))))) (f 0))"
+    with pytest.raises(DepthLimitExceeded):
+        with Budget(max_depth=1000):
+            run(code, evaluate)
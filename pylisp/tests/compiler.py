@@ -0,0 +1,119 @@
+import pytest
+
+from pylisp.builtins import builtins, Closure
+from pylisp.compiler import tiering
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code, lisp_data_to_str
+from pylisp.parser import Parser
+from pylisp.stats import statistics
+
+
+def parse_and_run(code, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def call_many(env, call, count=tiering.threshold + 5):
+    return [parse_and_run(call, env) for _ in range(count)]
+
+
+def test_hot_function_is_compiled():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! fib (letrec ((fib (fun (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))) fib))",
+                  env)
+    assert parse_and_run("(fib 15)", env) == 610
+    fib = parse_and_run("fib", env)
+    assert isinstance(fib, Closure)
+    assert fib._compiled is not None
+    assert parse_and_run("(fib 20)", env) == 6765
+
+
+def test_compiled_forms():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! b (alloc! 3))", env)
+    parse_and_run("(define! f (fun (x lst g) (let (y (* x 2)) "
+                  "(begin (set! b 0 y) (list y (g x) 'q (nil? lst) (if lst (head lst) -1))))))", env)
+    results = call_many(env, "(f 3 '(7) (fun (z) (+ z 1)))")
+    assert parse_and_run("f", env)._compiled is not None
+    assert {lisp_data_to_str(result) for result in results} == {"(6 4 q False 7)"}
+    assert lisp_data_to_str(parse_and_run("(f 1 nil +)", env)) == "(2 1 q True -1)"
+    assert parse_and_run("(get! b 0)", env) == 2
+
+
+def test_compiled_errors():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (fun (lst) (head lst)))", env)
+    call_many(env, "(f '(1))")
+    assert parse_and_run("f", env)._compiled is not None
+    with pytest.raises(LispError):
+        parse_and_run("(f nil)", env)
+    with pytest.raises(LispError):
+        parse_and_run("(f 1 2)", env)
+
+
+def test_compiled_errors_are_reported_like_interpreted():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (fun (x) (+ x 1)))", env)
+    parse_and_run("(define! g (fun (x h) (let (y (* x 2)) (if (< y 0) 0 (list y (h y) (+ y (head x)))))))", env)
+    errors = []
+    for _ in range(tiering.threshold + 5):
+        for call in ('(f "a")', '(list (f "a"))', "(g 1 (fun (z) z))", '(g 1 +)'):
+            with pytest.raises(LispError) as err:
+                parse_and_run(call, env)
+            errors.append(str(err.value))
+    assert parse_and_run("f", env)._compiled is not None and parse_and_run("g", env)._compiled is not None
+    assert set(errors[:4]) == set(errors)
+    assert errors[:2] == ['"a" is not of required type int\n in x\n in: (+ x 1)',
+                          '"a" is not of required type int\n in x\n in: (+ x 1)\n in: (list (f "a"))']
+
+
+def test_unsupported_bodies_are_interpreted():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (fun (x) (begin (define! + -) (+ x 1))))", env)
+    assert set(call_many(env, "(f 5)")) == {4}
+    f = parse_and_run("f", env)
+    assert f.calls > tiering.threshold
+    assert f._compiled is None
+
+
+def test_changed_environment_falls_back():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! y 1)", env)
+    parse_and_run("(define! f (fun (x) (+ x y)))", env)
+    call_many(env, "(f 1)")
+    f = parse_and_run("f", env)
+    assert f._compiled is not None
+    f.env.update("y", 10)
+    assert parse_and_run("(f 1)", env) == 11
+    assert f._compiled is None
+    assert set(call_many(env, "(f 1)")) == {11}
+    assert f._compiled is not None
+
+
+def test_monitored_calls_are_interpreted():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (fun (x) (+ x 1)))", env)
+    call_many(env, "(f 1)")
+    statistics.reset()
+    statistics.enabled = True
+    try:
+        assert parse_and_run("(f 1)", env) == 2
+    finally:
+        statistics.enabled = False
+    assert statistics.function_calls == 1
+
+
+def test_special_forms_and_macros_applied_at_run_time():
+    # the operator is only known at run time, the compiled body must not evaluate the operands of a special form
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (fun (g y) (g y)))", env)
+    parse_and_run("(define! m (macro (a) (list '+ a 1)))", env)
+    results = call_many(env, "(f quote (+ 1 2))")
+    assert [lisp_data_to_str(result) for result in results] == ["y"] * len(results)
+    assert parse_and_run("f", env)._compiled is not None
+    assert parse_and_run("(f m 41)", env) == 42
+    assert parse_and_run("(f (fun (x) (* x 2)) 21)", env) == 42
+    parse_and_run("(define! h (fun (g y) (let (z (+ y 1)) (g (* y z)))))", env)
+    assert call_many(env, "(h m 2)") == [7] * (tiering.threshold + 5)
@@ -0,0 +1,72 @@
+from pylisp.document import Document, split_forms
+from pylisp.interpreter import code_parser, lisp_data_to_str
+
+
+def test_split_forms():
+    text = '(f "a (b" 2)\n\'x `(a ,@b) sym ) (g (h 1'
+    assert [text[start:end] for start, end in split_forms(text)] == \
+           ['(f "a (b" 2)', "'x", "`(a ,@b)", "sym", ")", "(g (h 1"]
+    assert split_forms("  \n ") == []
+    assert split_forms('(a "b') == [(0, 5)]
+
+
+def test_unclosed_list_stops_at_next_top_level_line():
+    text = "(define! a (f 1\n  (g 2)\n(define! b 2)"
+    document = Document(text)
+    assert [form.text for form in document.forms] == ["(define! a (f 1\n  (g 2)", "(define! b 2)"]
+    assert [form.error is None for form in document.forms] == [False, True]
+
+
+def test_forms_match_whole_parse():
+    text = '(define! f (fun (x) (+ x 1)))\n\n(f "a (b)" -2) \'(1 2) `(a ,@b) 1a'
+    document = Document(text)
+    assert document.errors() == []
+    assert [lisp_data_to_str(value) for value in document.values()] == \
+           [lisp_data_to_str(value) for value in code_parser().parse_file(text)]
+
+
+def test_only_changed_forms_are_reparsed():
+    document = Document("(define! a 1)\n(define! b 2)\n(define! c 3)")
+    assert document.parsed == 3
+    changed = document.update("\n\n(define! a 1)\n(define! b 20)\n(define! c 3)")
+    assert document.parsed == 1
+    assert [form.text for form in changed] == ["(define! b 20)"]
+    assert document.forms[2].start == document.text.index("(define! c")
+    document.edit(0, 0, "(f")
+    assert document.parsed == 1
+    assert len(document.errors()) == 1
+
+
+def test_errors_are_local():
+    document = Document("(define! a 1)\n(f (g 1) #)\n)\n(define! b 2)")
+    errors = document.errors()
+    assert [form.text for form in errors] == ["(f (g 1) #)", ")"]
+    assert document.position(errors[0].error_offset) == (1, 9)
+    assert "'#'" in errors[0].error
+    assert len(document.values()) == 2
+    assert sorted(document.definitions()) == ["a", "b"]
+
+
+def test_positions():
+    document = Document("ab\ncd\n")
+    assert document.position(4) == (1, 1)
+    assert document.offset(1, 1) == 4
+    assert document.offset(0, 10) == 2
+    assert document.offset(5, 0) == len(document.text)
+
+
+def test_incremental_scan_matches_full_scan():
+    import random
+    rng = random.Random(7)
+    pieces = ["(define! a (f 1 2))", "\n", " ", "(", ")", '"s (t"', '"', "'", "x", "\n(g", "12"]
+    document = Document("")
+    text = ""
+    for _ in range(200):
+        position = rng.randint(0, len(text))
+        if text and rng.random() < 0.3:
+            text = text[:position] + text[position + rng.randint(1, 5):]
+        else:
+            text = text[:position] + rng.choice(pieces) + text[position:]
+        document.update(text)
+        assert [(form.start, form.end) for form in document.forms] == split_forms(text)
+        assert [form.error_offset for form in document.forms] == [form.error_offset for form in Document(text).forms]
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from pylisp.embedding import Interpreter, to_lisp, to_python
+from pylisp.errors import LispError, BudgetExceeded
+from pylisp.hamt import HashMap
+from pylisp.interpreter import lisp_data_to_str
+
+
+def test_conversions():
+    assert lisp_data_to_str(to_lisp([1, "a", (2, 3), []])) == '(1 "a" (2 3) ())'
+    hashmap = to_lisp({"a": [1, 2]})
+    assert isinstance(hashmap, HashMap)
+    assert to_python(hashmap) == {"a": [1, 2]}
+    assert to_python(to_lisp([1, [2, [3]], None, True])) == [1, [2, [3]], None, True]
+    assert to_python(to_lisp({(1, 2): 3})) == {(1, 2): 3}
+
+
+def test_eval_and_define():
+    lisp = Interpreter()
+    assert lisp.eval("(define! x 2) (+ x 1)") == 3
+    lisp.define("items", [1, 2, 3])
+    assert lisp.eval("(head (tail items))") == 2
+    assert lisp.lookup("x") == 2
+    lisp.load(os.path.join(os.path.dirname(__file__), "..", "..", "stdlib.cl"))
+    assert lisp.eval("(map (fun (x) (* x 10)) items)") == [10, 20, 30]
+
+
+def test_prepared_expressions():
+    lisp = Interpreter()
+    lisp.eval("(define! double (fun (x) (* 2 x)))")
+    rule = lisp.prepare("(if (> amount limit) (double amount) amount)", ["amount", "limit"])
+    assert rule(30, 20) == 60
+    assert rule(amount=1, limit=2) == 1
+    assert rule(5, limit=3) == 10
+    assert lisp.eval_many(rule, [(1, 2), (5, 3), {"amount": 4, "limit": 0}]) == [1, 10, 8]
+    assert lisp.eval_many("(cons x nil)", [[1], [[2]]], ["x"]) == [[1], [[2]]]
+    with pytest.raises(LispError):
+        rule(1)
+    with pytest.raises(LispError):
+        rule(1, 2, other=3)
+    with pytest.raises(LispError):
+        lisp.prepare("1 2")
+    with pytest.raises(LispError):
+        lisp.prepare("x", ["x", "x"])
+
+
+def test_repeated_evaluation_does_not_parse():
+    lisp = Interpreter()
+    parses = []
+    parse_file = lisp.parser.parse_file
+    lisp.parser.parse_file = lambda text: parses.append(text) or parse_file(text)
+    rule = lisp.prepare("(+ a 1)", ["a"])
+    assert [rule(i) for i in range(100)] == list(range(1, 101))
+    for _ in range(10):
+        assert lisp.eval("(+ 1 2)") == 3
+    assert parses == ["(+ a 1)", "(+ 1 2)"]
+
+
+def test_budget():
+    lisp = Interpreter(max_steps=10000)
+    with pytest.raises(BudgetExceeded):
+        lisp.eval("(while! true nil)")
+    lisp.eval("(define! loop (fun (x) (begin (while! true nil) x)))")
+    with pytest.raises(BudgetExceeded):
+        lisp.prepare("(loop x)", ["x"])(1)
+    # every evaluation gets the whole budget
+    assert [lisp.eval("(+ 1 2)") for _ in range(10000)][-1] == 3
+    with pytest.raises(BudgetExceeded):
+        Interpreter(timeout=0.01).eval("(while! true nil)")
+
+
+def test_load_does_not_fill_the_parse_cache(tmp_path):
+    path = tmp_path / "library.cl"
+    path.write_text("(define! x 1)\n(define! y (+ x 1))\n")
+    lisp = Interpreter()
+    lisp.load(str(path))
+    assert lisp.lookup("y") == 2
+    assert not lisp._parsed
@@ -1,7 +1,8 @@
 import pytest
 
-from pylisp.environment import empty_environment
+from pylisp.environment import empty_environment, fresh_version
 from pylisp.errors import LispError
+from pylisp.interpreter import Symbol
 
 
 def test_update():
@@ -33,3 +34,64 @@ def test_fork_forward_ref():
     env2 = env.fork()
     env.fill_forward_reference("ref", 23)
     assert env2.lookup("ref") == 23
+
+
+def test_versions():
+    env = empty_environment()
+    env2 = env.fork()
+    assert env2.version == env.version
+    env2.update("ABC", 1)
+    assert env2.version != env.version
+    version = env2.version
+    env2.allocate_forward_reference("ref")
+    assert env2.version != version
+    version = env2.version
+    env2.fill_forward_reference("ref", 2)
+    assert env2.version != version
+
+
+def test_symbol_cache_sees_rebinding():
+    env = empty_environment()
+    env.update("ABC", 1)
+    symbol = Symbol("ABC")
+    assert env.lookup_symbol(symbol) == 1
+    assert symbol.cache == (env.version, 1)
+    env.update("ABC", 2)
+    assert env.lookup_symbol(symbol) == 2
+    assert env.fork().lookup_symbol(symbol) == 2
+
+
+def test_call_environments_do_not_cache_arguments():
+    env = empty_environment()
+    env.update("g", 42)
+    version = fresh_version()
+    names = frozenset(["x"])
+    x, g = Symbol("x"), Symbol("g")
+    first = env.fork_for_call(names, {"x": 1}, version)
+    assert first.lookup_symbol(x) == 1
+    assert first.lookup_symbol(g) == 42
+    second = env.fork_for_call(names, {"x": 2}, version)
+    assert second.lookup_symbol(x) == 2
+    assert g.cache == (version, 42)
+
+
+def test_loop_rebinding_keeps_other_caches():
+    env = empty_environment()
+    env.update("g", 42)
+    env.update("i", "outer")
+    i, g = Symbol("i"), Symbol("g")
+    assert env.lookup_symbol(i) == "outer"
+    frame = env.fork_for_loop("i")
+    frame.rebind_unshared("i", 0)
+    assert frame.lookup_symbol(i) == 0
+    assert frame.lookup_symbol(g) == 42
+    version = frame.version
+    frame.rebind_unshared("i", 1)
+    assert frame.version == version and g.cache == (version, 42)
+    assert frame.lookup_symbol(i) == 1
+    # a definition in the loop body makes the variable cacheable, so rebinding it gives a fresh stamp
+    frame.update("h", 0)
+    assert frame.lookup_symbol(i) == 1
+    frame.rebind_unshared("i", 2)
+    assert frame.lookup_symbol(i) == 2
+    assert env.lookup_symbol(i) == "outer"
@@ -0,0 +1,71 @@
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+
+def parse_and_run(code, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / "out.txt"
+    env = environment_with_builtins(builtins)
+    parse_and_run(f'(let (f (open! "{path}" "w")) (begin (write! f "a " 1 "\n") (write! f (list 2 3)) (close! f)))',
+                  env)
+    assert path.read_text() == "a 1\n(2 3)"
+    parse_and_run(f'(define! f (open! "{path}"))', env)
+    assert parse_and_run("(read-line! f)", env) == "a 1"
+    assert parse_and_run("(read-all! f)", env) == "(2 3)"
+    assert parse_and_run("(read-line! f)", env) is None
+    parse_and_run("(close! f)", env)
+    with pytest.raises(LispError):
+        parse_and_run("(read-line! f)", env)
+
+
+def test_read_lines(tmp_path):
+    path = tmp_path / "in.txt"
+    path.write_text("header\nx\r\ny\n")
+    code = f'(let (f (open! "{path}")) (begin (read-line! f) (stream->list (read-lines! f))))'
+    assert parse_and_run(f"(str {code})") == '("x" "y")'
+
+
+def test_mmap_lines(tmp_path):
+    path = tmp_path / "in.txt"
+    path.write_text("ą\nb\n\nc")
+    assert parse_and_run(f'(str (stream->list (mmap-lines! "{path}")))') == '("ą" "b" "" "c")'
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    assert parse_and_run(f'(stream->list (mmap-lines! "{empty}"))') is None
+
+
+def test_errors(tmp_path):
+    with pytest.raises(LispError):
+        parse_and_run(f'(open! "{tmp_path / "missing.txt"}")')
+    with pytest.raises(LispError):
+        parse_and_run(f'(open! "{tmp_path / "x.txt"}" "rw")')
+
+
+def test_wrong_mode_and_encoding(tmp_path):
+    path = tmp_path / "x.txt"
+    path.write_text("a\n")
+    for code in (f'(write! (open! "{path}") "b")', f'(read-line! (open! "{path}" "w"))',
+                 f'(read-all! (open! "{path}" "a"))'):
+        with pytest.raises(LispError):
+            parse_and_run(code)
+    binary = tmp_path / "binary.txt"
+    binary.write_bytes(b"\xff\xfe\xfa\n")
+    with pytest.raises(LispError):
+        parse_and_run(f'(read-line! (open! "{binary}"))')
+    binary.write_bytes(b"a\n\xff\xfe\xfa\n")
+    with pytest.raises(LispError):
+        parse_and_run(f'(stream->list (mmap-lines! "{binary}"))')
+    assert parse_and_run(f'(stream-head (mmap-lines! "{binary}"))') == "a"
+    text = tmp_path / "text.txt"
+    parse_and_run(f'(let (f (open! "{text}" "w")) (begin (write! f "ą") (close! f)))')
+    assert text.read_text(encoding="utf-8") == "ą"
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.hamt import HashMap
+from pylisp.interpreter import interpret, represent_code, python_list_to_lisp, Symbol
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+
+def parse_and_run(code):
+    return interpret(represent_code(Parser().parse_expr(code)), environment_with_builtins(builtins))
+
+
+class CollidingKey:
+    """
+    A key with a poor hash function, to exercise the collision nodes.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.value == other.value
+
+
+def test_against_dict():
+    rng = random.Random(42)
+    reference = {}
+    hashmap = HashMap()
+    for _ in range(5000):
+        key = rng.randrange(2000)
+        if rng.random() < 0.3:
+            reference.pop(key, None)
+            hashmap = hashmap.dissoc(key)
+        else:
+            reference[key] = rng.random()
+            hashmap = hashmap.assoc(key, reference[key])
+        assert len(hashmap) == len(reference)
+    assert dict(hashmap.items()) == reference
+    for key in range(2000):
+        assert hashmap.get(key, "missing") == reference.get(key, "missing")
+
+
+def test_persistence():
+    first = HashMap.from_items((i, i) for i in range(100))
+    second = first.assoc(5, "five").dissoc(7)
+    assert first.get(5) == 5 and 7 in first and len(first) == 100
+    assert second.get(5) == "five" and 7 not in second and len(second) == 99
+    assert first.dissoc(1000) is first
+
+
+def test_collisions():
+    hashmap = HashMap.from_items((CollidingKey(i), i) for i in range(30))
+    assert len(hashmap) == 30
+    assert all(hashmap.get(CollidingKey(i)) == i for i in range(30))
+    for i in range(0, 30, 2):
+        hashmap = hashmap.dissoc(CollidingKey(i))
+    assert sorted(hashmap.values()) == list(range(1, 30, 2))
+
+
+def test_structural_keys_and_equality():
+    key = python_list_to_lisp([1, Symbol("a")])
+    hashmap = HashMap().assoc(key, 42)
+    assert hashmap.get(python_list_to_lisp([1, Symbol("a")])) == 42
+    assert HashMap.from_items([(1, 2), (3, 4)]) == HashMap.from_items([(3, 4), (1, 2)])
+
+
+def test_keys_keep_their_type():
+    assert parse_and_run("(hlen (hassoc (hassoc (hmap) 1 'one) true 't))") == 2
+    assert parse_and_run("(hget (hassoc (hassoc (hmap) 1 'one) true 't) 1)") == Symbol("one")
+    assert parse_and_run("(hget (hassoc (hmap) (list 1) 'one) (list true) 'missing)") == Symbol("missing")
+    assert parse_and_run("(hlen (hdissoc (hmap 1 'one) true))") == 1
+    assert HashMap.from_items([(1, 1)]) != HashMap.from_items([(1, True)])
+
+
+def test_builtins():
+    assert parse_and_run("(hget (hmap 'a 1 'b 2) 'b)") == 2
+    assert parse_and_run("(hget (hmap 'a 1) 'c 0)") == 0
+    assert parse_and_run("(hget (hassoc (hmap) '(1 2) 3) '(1 2))") == 3
+    assert parse_and_run("(let (m (hmap 1 2 3 4)) (+ (hlen (hdissoc m 1)) (hlen m)))") == 3
+    assert parse_and_run("(hcontains? (hmap 1 2) 1)")
+    assert parse_and_run("(str (hkeys (hmap 1 2)))") == "(1)"
+    assert parse_and_run("(str (hitems (hmap 1 2)))") == "((1 2))"
+    with pytest.raises(LispError):
+        parse_and_run("(hmap 1)")
+    with pytest.raises(LispError):
+        parse_and_run("(hget (list 1) 1)")
@@ -0,0 +1,71 @@
+import gc
+
+import pytest
+
+from pylisp.builtins import builtins
+from pylisp.cek import evaluate
+from pylisp.environment import environment_with_builtins
+from pylisp.interpreter import interpret, code_parser, lisp_data_to_str, hash_consing, python_list_to_lisp, Symbol
+
+DEFUN = "(define! defun (macro (name args body) `(define! ,name (fun ,args ,body))))"
+
+
+@pytest.fixture
+def shared():
+    hash_consing.enabled = True
+    yield hash_consing
+    hash_consing.enabled = False
+    hash_consing.clear()
+
+
+def test_reader_shares_equal_lists(shared):
+    first, second = code_parser().parse_file("(f (+ x 1) '(1 2)) (g (+ x 1) '(1 2))")
+    assert first.tail() is second.tail()
+    assert first.head() is not second.head()
+    shared_list = code_parser().parse_expr("(+ x 1)")
+    assert shared_list is first.tail().head()
+    x_first, x_second = code_parser().parse_file("(x f) (x g)")
+    assert x_first.head() is x_second.head()
+    hash_consing.enabled = False
+    assert code_parser().parse_expr("(+ x 1)") is not shared_list
+    assert code_parser().parse_expr("(+ x 1)") == shared_list
+
+
+def test_atoms_keep_their_type(shared):
+    assert shared.list([True]) is not shared.list([1])
+    assert shared.list([1, "a"]) is shared.list([1, "a"])
+    assert shared.list(["1"]) is not shared.list([1])
+
+
+def test_macro_expansions_are_shared(shared):
+    for evaluator in (interpret, evaluate):
+        env = environment_with_builtins(builtins)
+        expansions = []
+        evaluator(code_parser().parse_expr(DEFUN), env)
+        defun = env.lookup("defun")
+        original = defun.func
+        defun.func = lambda args: expansions.append(original(args)) or expansions[-1]
+        for statement in code_parser().parse_file("(defun f (x) (+ x 1)) (defun g (x) (+ x 1)) (f (g 1))"):
+            result = evaluator(statement, env)
+        assert result == 3
+        first, second = (shared.canonical(expansion) for expansion in expansions)
+        assert first.tail().tail() is second.tail().tail()
+        assert lisp_data_to_str(first) == "(define! f (fun (x) (+ x 1)))"
+
+
+def test_canonical_reuses_cells(shared):
+    code = python_list_to_lisp([Symbol("a"), python_list_to_lisp([1, 2]), "s"])
+    canonical = shared.canonical(code)
+    assert canonical is code
+    assert shared.canonical(python_list_to_lisp([Symbol("a"), python_list_to_lisp([1, 2]), "s"])) is code
+    long = python_list_to_lisp(list(range(100000)))
+    assert shared.canonical(long) is long
+
+
+def test_unused_cells_are_collected(shared):
+    before = len(shared)
+    code = code_parser().parse_expr("(" + " ".join(f"(x {i})" for i in range(1000)) + ")")
+    assert len(shared) >= before + 2000
+    del code
+    gc.collect()
+    assert len(shared) == before
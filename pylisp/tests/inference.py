@@ -0,0 +1,94 @@
+import gc
+import weakref
+
+import pytest
+
+from pylisp.builtins import builtins, Closure
+from pylisp.environment import environment_with_builtins
+from pylisp.errors import LispError
+from pylisp.inference import inference, UncheckedBuiltin, specialize, _specialized_bodies
+from pylisp.interpreter import interpret, represent_code, ConsCell, lisp_list_to_python
+from pylisp.parser import Parser
+
+
+def code(text):
+    return represent_code(Parser().parse_expr(text))
+
+
+def unchecked_operators(body) -> list:
+    """
+    Returns the names of the unchecked builtins in the code, in the order of evaluation.
+    """
+    if not isinstance(body, ConsCell):
+        return []
+    found = [body.head().name] if isinstance(body.head(), UncheckedBuiltin) else []
+    for value in lisp_list_to_python(body):
+        found += unchecked_operators(value)
+    return found
+
+
+def specialized(args, text, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return unchecked_operators(specialize(args, code(text), env))
+
+
+def test_proven_operations_are_rewritten():
+    env = environment_with_builtins(builtins)
+    interpret(code("(define! f (fun (x) x))"), env)
+    # n is checked by <, so it is an int in both branches
+    assert specialized(["n"], "(if (< n 2) n (+ (f (- n 1)) (f (- n 2))))", env) == ["-", "-"]
+    # the result of + is an int, y is bound to it
+    assert specialized(["x"], "(let (y (+ x 1)) (* y y))") == ["*"]
+    assert specialized(["b", "i"], "(begin (get! b i) (set! b i (+ i 1)))") == ["set!", "+"]
+    assert specialized(["n"], "(let (b (alloc! n)) (set! b 0 n))") == ["set!"]
+    assert specialized(["x"], "(if (int? x) (+ x 1) x)") == ["+"]
+
+
+def test_unproven_operations_are_kept():
+    assert specialized(["x", "y"], "(+ x y)") == []
+    # only one branch checks x
+    assert specialized(["x"], "(begin (if true (+ x 1) 0) (- x 1))") == []
+    # a local shadowing a builtin is not the builtin
+    assert specialized(["-", "n"], "(begin (< n 1) (- n 1))") == []
+    # a let name shadows the outer fact
+    assert specialized(["x"], '(begin (+ x 1) (let (x "a") (+ x 1)))') == []
+
+
+def test_bodies_that_can_rebind_are_kept():
+    env = environment_with_builtins(builtins)
+    interpret(code("(define! m (macro (x) x))"), env)
+    assert specialized(["n"], "(begin (define! - +) (< n 1) (- n 1))", env) == []
+    assert specialized(["n"], "(begin (< n 1) (m (- n 1)))", env) == []
+
+
+def test_specialized_functions(monkeypatch):
+    monkeypatch.setattr(inference, "enabled", True)
+    inference.reset()
+    env = environment_with_builtins(builtins)
+    interpret(code("(define! fib (letrec ((fib (fun (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))) fib))"),
+              env)
+    fib = interpret(code("fib"), env)
+    assert isinstance(fib, Closure)
+    assert unchecked_operators(fib.body) == []  # the body is specialized on the first call
+    assert [interpret(code(f"(fib {n})"), env) for n in range(10)] == [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]
+    assert unchecked_operators(fib.body) == ["-", "-"]
+    assert inference.specialized == 2
+    assert inference.eliminated == 4
+    with pytest.raises(LispError):
+        interpret(code('(fib "a")'), env)
+    interpret(code("(define! fill (letrec ((fill (fun (b i) "
+                   "(if (< i 5) (begin (set! b i (* i i)) (fill b (+ i 1))) (get! b 4))))) fill))"), env)
+    for _ in range(60):  # the compiled code uses the unchecked operators too
+        assert interpret(code("(fill (alloc! 5) 0)"), env) == 16
+
+
+def test_unchanged_bodies_are_collected():
+    body = code("(+ x y)")
+    assert specialize(["x", "y"], body, environment_with_builtins(builtins)) is body
+    assert specialize(["x", "y"], body, environment_with_builtins(builtins)) is body
+    collected = weakref.ref(body)
+    count = len(_specialized_bodies)
+    del body
+    gc.collect()
+    assert collected() is None and len(_specialized_bodies) == count - 1
@@ -65,4 +65,47 @@ def test_binding():
     assert parse_and_run(code1) == 2
 
     code2 = "(begin (define! a 2) (define! f (fun () a)) (define! a 3) (f))"
-    assert parse_and_run(code2) == 2
\ No newline at end of file
+    assert parse_and_run(code2) == 2
+
+
+def test_rebinding_invalidates_cached_lookups():
+    env = environment_with_builtins(builtins)
+    form = represent_code(Parser().parse_expr("(+ a 1)"))
+    interpret(represent_code(Parser().parse_expr("(define! a 1)")), env)
+    assert interpret(form, env) == 2
+    assert interpret(form, env) == 2
+    interpret(represent_code(Parser().parse_expr("(define! a 10)")), env)
+    assert interpret(form, env) == 11
+    interpret(represent_code(Parser().parse_expr("(define! + -)")), env)
+    assert interpret(form, env) == 9
+
+
+def test_closures_capture_only_referenced_bindings():
+    from pylisp.builtins import capture_environment
+    env = environment_with_builtins(builtins)
+    body = represent_code(Parser().parse_expr("(+ x (head '(y)))"))
+    captured = capture_environment(env, ["x"], body)
+    assert set(captured._mapping.keys()) == {"+", "head", "quote"}
+
+    # bodies using macros may refer to anything, so the whole environment is captured
+    interpret(represent_code(Parser().parse_expr("(define! m (macro (a) (list '+ a 1)))")), env)
+    body = represent_code(Parser().parse_expr("(m x)"))
+    assert "-" in capture_environment(env, ["x"], body)._mapping
+
+
+def test_closures_with_macros():
+    code = "(begin (define! inc (macro (a) (list '+ a 1))) (define! f (fun (x) (inc x))) (f 41))"
+    assert parse_and_run(code) == 42
+    code = "(letrec ((f (fun (n) (if (= n 0) 0 (g (- n 1))))) (g (fun (n) (f n)))) (f 10))"
+    assert parse_and_run(code) == 0
+
+
+def test_closures_with_macros_bound_later():
+    # the macro is an argument or a letrec binding set after the closure is created,
+    # its expansion refers to + which does not occur in the body
+    assert parse_and_run("((fun (m) (m 1 1)) (macro (a b) (list (quote +) a b)))") == 2
+    assert parse_and_run("(letrec ((f (fun () (m 1 1))) (m (macro (a b) (list (quote +) a b)))) (f))") == 2
+    # the macro is applied as a computed head or through a local binding
+    assert parse_and_run("((fun (l) ((head l) 1 1)) (list (macro (a b) (list '+ a b))))") == 2
+    assert parse_and_run("((fun (x) (let (m x) (m 1 1))) (macro (a b) (list '+ a b)))") == 2
+    assert parse_and_run("((fun (x) (letrec ((m x)) (m 2 3))) (macro (a b) (list '* a b)))") == 6
@@ -0,0 +1,75 @@
+import io
+
+from pylisp.language_server import LanguageServer, read_message, write_message, METHOD_NOT_FOUND, INTERNAL_ERROR
+
+URI = "file:///test.cl"
+
+
+def open_document(server, text):
+    return server.handle({"jsonrpc": "2.0", "method": "textDocument/didOpen",
+                          "params": {"textDocument": {"uri": URI, "text": text}}})
+
+
+def test_diagnostics():
+    server = LanguageServer()
+    [notification] = open_document(server, "(define! a 1)\n(f (g 1) #)")
+    assert notification["method"] == "textDocument/publishDiagnostics"
+    [diagnostic] = notification["params"]["diagnostics"]
+    assert diagnostic["range"]["start"] == {"line": 1, "character": 9}
+    assert diagnostic["range"]["end"] == {"line": 1, "character": 11}
+
+    change = {"range": {"start": {"line": 1, "character": 9}, "end": {"line": 1, "character": 10}}, "text": "2"}
+    [notification] = server.handle({"jsonrpc": "2.0", "method": "textDocument/didChange", "params": {
+        "textDocument": {"uri": URI}, "contentChanges": [change]}})
+    assert notification["params"]["diagnostics"] == []
+    assert server.documents[URI].text == "(define! a 1)\n(f (g 1) 2)"
+    assert server.documents[URI].parsed == 1
+
+
+def test_hover():
+    server = LanguageServer()
+    open_document(server, "(defun twice (x) (* 2 x))\n(twice 3)")
+
+    def hover(line, character):
+        [response] = server.handle({"jsonrpc": "2.0", "id": 1, "method": "textDocument/hover", "params": {
+            "textDocument": {"uri": URI}, "position": {"line": line, "character": character}}})
+        return response["result"]
+
+    result = hover(0, 18)
+    assert result["contents"]["value"].startswith("Documentation for: *")
+    assert result["range"] == {"start": {"line": 0, "character": 18}, "end": {"line": 0, "character": 19}}
+    assert hover(1, 3)["contents"]["value"] == "(defun twice (x) (* 2 x))"
+    assert hover(1, 7) is None
+    server.handle({"jsonrpc": "2.0", "method": "textDocument/didChange", "params": {
+        "textDocument": {"uri": URI}, "contentChanges": [{"text": "(letrec)"}]}})
+    assert "Documentation for: letrec" in hover(0, 3)["contents"]["value"]
+
+
+def test_serve():
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        {"jsonrpc": "2.0", "id": 2, "method": "unknown/method"},
+        {"jsonrpc": "2.0", "id": 4, "method": "textDocument/hover", "params": {"position": {}}},
+        {"jsonrpc": "2.0", "method": "textDocument/didChange", "params": {}},
+        {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    input_stream = io.BytesIO()
+    for message in messages:
+        write_message(input_stream, message)
+    input_stream.seek(0)
+    output_stream = io.BytesIO()
+    assert LanguageServer().serve(input_stream, output_stream) == 0
+    output_stream.seek(0)
+    responses = []
+    while True:
+        message = read_message(output_stream)
+        if message is None:
+            break
+        responses.append(message)
+    assert responses[0]["result"]["capabilities"]["hoverProvider"]
+    assert responses[1]["error"]["code"] == METHOD_NOT_FOUND
+    assert responses[2]["id"] == 4 and responses[2]["error"]["code"] == INTERNAL_ERROR
+    assert responses[3]["method"] == "window/logMessage"
+    assert responses[4] == {"jsonrpc": "2.0", "id": 3, "result": None}
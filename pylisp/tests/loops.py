@@ -0,0 +1,98 @@
+import pytest
+
+from pylisp.blocks import create_shared_block
+from pylisp.budget import Budget
+from pylisp.errors import LispError, BudgetExceeded
+from pylisp.interpreter import interpret, code_parser, lisp_data_to_str
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+
+
+def run(code, env=None):
+    env = env if env is not None else environment_with_builtins(builtins)
+    result = None
+    for statement in code_parser().parse_file(code.strip()):
+        result = interpret(statement, env)
+    return result
+
+
+def test_dotimes():
+    assert lisp_data_to_str(run("""
+    (define! b (alloc! 5))
+    (dotimes (i (block-size b)) (set! b i (* i i)))
+    (define! total (alloc! 1))
+    (set! total 0 0)
+    (for-each (x b) (set! total 0 (+ (get! total 0) x)))
+    (list (get! b 4) (get! total 0))
+    """)) == "(16 30)"
+    assert run("(dotimes (i 0) (head nil))") is None
+
+
+def test_while():
+    assert run("""
+    (define! counter (alloc! 1))
+    (set! counter 0 0)
+    (while! (< (get! counter 0) 1000) (set! counter 0 (+ (get! counter 0) 1)))
+    (get! counter 0)
+    """) == 1000
+
+
+def test_for_each_sequences():
+    env = environment_with_builtins(builtins)
+    run("(define! out (alloc! 1)) (define! add (fun (x) (set! out 0 (cons x (get! out 0)))))", env)
+    for sequence in ("'(1 2 3)", "(vec 1 2 3)", "(range-stream 1 4)", "(let (t (transient (vec 1 2))) (vpush! t 3))"):
+        run(f"(set! out 0 nil) (for-each (x {sequence}) (add x))", env)
+        assert lisp_data_to_str(run("(get! out 0)", env)) == "(3 2 1)"
+    block = create_shared_block(3)
+    try:
+        env.update("shared", block)
+        run("(dotimes (i 3) (set! shared i (+ i 1))) (set! out 0 nil) (for-each (x shared) (add x))", env)
+        assert lisp_data_to_str(run("(get! out 0)", env)) == "(3 2 1)"
+    finally:
+        block.release()
+    run("(set! out 0 nil) (for-each (x nil) (add x))", env)
+    assert run("(get! out 0)", env) is None
+
+
+def test_loop_variable_scope():
+    env = environment_with_builtins(builtins)
+    # closures capture the value of the current iteration, the variable is not visible after the loop
+    assert lisp_data_to_str(run("""
+    (define! i 'outer)
+    (define! fs (alloc! 3))
+    (dotimes (i 3) (set! fs i (fun () i)))
+    (list ((get! fs 0)) ((get! fs 2)) i)
+    """, env)) == "(0 2 outer)"
+    # definitions in the body are made in the loop frame, the variable is still rebound in every iteration
+    assert lisp_data_to_str(run("""
+    (define! seen (alloc! 3))
+    (dotimes (i 3) (begin (set! seen i i) (define! i 10) (define! j i)))
+    (list (get! seen 0) (get! seen 1) (get! seen 2))
+    """, env)) == "(0 1 2)"
+    with pytest.raises(LispError):
+        run("j", env)
+
+
+def test_wrong_loops():
+    for code in ("(dotimes i 3)", "(dotimes (1 3) nil)", "(dotimes (i 'a) nil)", "(for-each (x 1) nil)",
+                 "(for-each (x (cons 1 2)) nil)", "(for-each (x) nil)"):
+        with pytest.raises(LispError):
+            run(code)
+
+
+def test_long_loops():
+    # far more iterations than the recursion depth allows, the loop does not grow the Python stack
+    assert run("""
+    (define! b (alloc! 100000))
+    (dotimes (i 100000) (set! b i i))
+    (define! sum (alloc! 1))
+    (set! sum 0 0)
+    (for-each (x b) (set! sum 0 (+ (get! sum 0) x)))
+    (get! sum 0)
+    """) == sum(range(100000))
+
+
+def test_infinite_loop_is_aborted():
+    with pytest.raises(BudgetExceeded):
+        with Budget(max_steps=10000):
+            run("(while! true nil)")
@@ -0,0 +1,73 @@
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code, ConsCell, Symbol, python_list_to_lisp
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+
+def parse_and_run(code, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def test_structural_hash():
+    assert hash(Symbol("a")) == hash(Symbol("a"))
+    assert hash(python_list_to_lisp([1, Symbol("b"), python_list_to_lisp([2])])) == \
+        hash(python_list_to_lisp([1, Symbol("b"), python_list_to_lisp([2])]))
+    assert len({ConsCell(1, None), ConsCell(1, None), ConsCell(2, None)}) == 2
+    long_list = None
+    for i in range(100000):
+        long_list = ConsCell(i, long_list)
+    hash(long_list)  # long lists are hashed without recursion
+
+
+def test_memo_fib_is_linear():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! fib (letrec ((fib (memo (fun (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))))) fib))",
+                  env)
+    assert parse_and_run("(fib 40)", env) == 102334155
+    assert parse_and_run("(str (memo-stats fib))", env) == "((hits 38) (misses 41) (entries 41) (bytes 0))"
+
+
+def test_memo_lru_eviction():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (memo (fun (l) (cons 0 l)) 2))", env)
+    parse_and_run("(begin (f '(1)) (f '(2)) (f '(1)) (f '(3)) (f '(1)))", env)
+    assert parse_and_run("(str (memo-stats f))", env) == "((hits 2) (misses 3) (entries 2) (bytes 0))"
+    parse_and_run("(f '(2))", env)  # (2) was the least recently used, so it has been evicted
+    assert parse_and_run("(head (tail (memo-stats f)))", env) == python_list_to_lisp([Symbol("misses"), 4])
+
+
+def test_memo_byte_budget():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (memo (fun (n) n) nil 500))", env)
+    parse_and_run("(begin (f 1) (f 2) (f 3) (f 4) (f 5) (f 6) (f 7) (f 8) (f 9) (f 10) (f 11) (f 12))", env)
+    func = env.lookup("f")
+    assert 0 < func.bytes <= 500
+    assert len(func) < 12
+    parse_and_run("(memo-clear! f)", env)
+    assert len(func) == 0 and func.bytes == 0
+
+
+def test_memo_keeps_the_types_of_arguments():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! f (memo (fun (x) (list x))))", env)
+    assert parse_and_run("(f 1)", env) == python_list_to_lisp([1])
+    assert parse_and_run("(f true)", env).head() is True
+    assert parse_and_run("(f (list 1 2))", env).head().head() == 1
+    assert parse_and_run("(f (list true 2))", env).head().head() is True
+    assert parse_and_run("(vget (head (f (vec 1))) 0)", env) == 1
+    assert parse_and_run("(vget (head (f (vec true))) 0)", env) is True
+    assert parse_and_run("(str (memo-stats f))", env) == "((hits 0) (misses 6) (entries 6) (bytes 0))"
+
+
+def test_memo_errors():
+    with pytest.raises(LispError):
+        parse_and_run("(memo +)")
+    with pytest.raises(LispError):
+        parse_and_run("(memo (fun (x) x) -1)")
+    with pytest.raises(LispError):
+        parse_and_run("(memo-stats (fun (x) x))")
@@ -25,3 +25,31 @@ def test_parse_file():
     assert par.parse_file("1 2") == [IntLiteral(1), IntLiteral(2)]
     assert par.parse_file("(f 2 3) 'a") == [ExpressionList([Identifier("f"), IntLiteral(2), IntLiteral(3)]), ExpressionList([Identifier("quote"), Identifier("a")])]
 
+
+def test_parse_quasiquote():
+    par = Parser()
+
+    assert par.parse_expr("`a") == ExpressionList([Identifier("quasiquote"), Identifier("a")])
+    assert par.parse_expr("`(a ,b ,@c)") == ExpressionList([Identifier("quasiquote"), ExpressionList([
+        Identifier("a"),
+        ExpressionList([Identifier("unquote"), Identifier("b")]),
+        ExpressionList([Identifier("unquote-splicing"), Identifier("c")]),
+    ])])
+    assert par.parse_expr(",(f 1)") == \
+           ExpressionList([Identifier("unquote"), ExpressionList([Identifier("f"), IntLiteral(1)])])
+
+
+def test_code_parser_reads_code_values():
+    from pylisp.interpreter import code_parser, represent_code, ConsCell, Symbol
+
+    text = "(define! f (fun (x) (list x \"a\" -1 'q `(,x ,@x) ())))"
+    code = code_parser().parse_expr(text)
+    assert isinstance(code, ConsCell)
+    assert code.head() == Symbol("define!")
+    assert code == represent_code(Parser().parse_expr(text))
+    assert code_parser().parse_file("1 a") == [1, Symbol("a")]
+
+
+def test_ast_nodes_are_slotted():
+    for node in (Identifier("a"), IntLiteral(1), StringLiteral("s"), ExpressionList([])):
+        assert not hasattr(node, "__dict__")
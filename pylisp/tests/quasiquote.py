@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code, lisp_data_to_str, interpret_file
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+
+def parse_and_run(code, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def test_quasiquote_without_unquotes_is_quote():
+    assert lisp_data_to_str(parse_and_run("`(a (b c) 1)")) == "(a (b c) 1)"
+    assert lisp_data_to_str(parse_and_run("`a")) == "a"
+    assert parse_and_run("`5") == 5
+
+
+def test_unquote_and_splicing():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! x 2)", env)
+    parse_and_run("(define! xs (list 3 4))", env)
+    assert lisp_data_to_str(parse_and_run("`(1 ,x ,@xs 5)", env)) == "(1 2 3 4 5)"
+    assert lisp_data_to_str(parse_and_run("`(a (b ,(+ x 1)) c)", env)) == "(a (b 3) c)"
+    assert lisp_data_to_str(parse_and_run("`(,@nil ,@xs)", env)) == "(3 4)"
+    assert parse_and_run("`,x", env) == 2
+
+
+def test_nested_quasiquote():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! x 2)", env)
+    # only the innermost level of unquotes is evaluated
+    assert lisp_data_to_str(parse_and_run("`(a `(b ,(c ,x)))", env)) == \
+           "(a (quasiquote (b (unquote (c 2)))))"
+
+
+def test_constant_parts_are_shared():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! make (fun (x) `(,x (b c) d e)))", env)
+    first = parse_and_run("(make 1)", env)
+    second = parse_and_run("(make 2)", env)
+    assert lisp_data_to_str(first) == "(1 (b c) d e)"
+    assert lisp_data_to_str(second) == "(2 (b c) d e)"
+    assert first.tail() is second.tail()
+    assert first is not second
+
+
+def test_unquote_errors():
+    with pytest.raises(LispError):
+        parse_and_run(",a")
+    with pytest.raises(LispError):
+        parse_and_run("`,@(list 1)")
+    with pytest.raises(LispError):
+        parse_and_run("`(1 ,@2)")
+
+
+def test_stdlib_macros():
+    env = environment_with_builtins(builtins)
+    with open(os.path.join(os.path.dirname(__file__), "..", "..", "stdlib.cl")) as f:
+        interpret_file(f, env)
+    parse_and_run("(defrec len (lst) (if (nil? lst) 0 (+ 1 (len (tail lst)))))", env)
+    assert parse_and_run("(len '(1 2 3))", env) == 3
+    assert lisp_data_to_str(parse_and_run("(map (fun (x) (* x x)) '(1 2 3))", env)) == "(1 4 9)"
+    assert parse_and_run("(sum '(1 2 3))", env) == 6
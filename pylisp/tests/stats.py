@@ -0,0 +1,52 @@
+import pytest
+
+from pylisp.interpreter import interpret, represent_code, lisp_list_to_python
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+from pylisp.stats import statistics
+
+
+@pytest.fixture
+def enabled_statistics():
+    statistics.reset()
+    statistics.enabled = True
+    yield statistics
+    statistics.enabled = False
+    statistics.reset()
+
+
+def parse_and_run(code):
+    return interpret(represent_code(Parser().parse_expr(code)), environment_with_builtins(builtins))
+
+
+def test_counters(enabled_statistics):
+    parse_and_run("(letrec ((f (fun (n) (if (= n 0) (list 1 2) (f (- n 1)))))) (f 3))")
+    assert enabled_statistics.function_calls == 4
+    assert enabled_statistics.builtin_calls["if"] == 4
+    assert enabled_statistics.builtin_calls["list"] == 1
+    assert enabled_statistics.builtin_calls["letrec"] == 1
+    assert enabled_statistics.cons_allocations >= 2
+    assert enabled_statistics.forks >= 5
+    assert enabled_statistics.fork_bytes > 0
+    assert enabled_statistics.max_depth >= 4
+    assert enabled_statistics.depth == 0
+    assert enabled_statistics.steps > 20
+
+
+def test_macro_expansions(enabled_statistics):
+    parse_and_run("(let (m (macro (x) x)) (+ (m 1) (m 2)))")
+    assert enabled_statistics.macro_expansions == 2
+
+
+def test_stats_builtin(enabled_statistics):
+    result = lisp_list_to_python(parse_and_run("(begin (+ 1 2) (stats!))"))
+    names = [lisp_list_to_python(entry)[0].name for entry in result]
+    assert names == ["steps", "function-calls", "builtin-calls", "cons-allocations", "forks", "fork-bytes",
+                     "macro-expansions", "max-depth"]
+
+
+def test_disabled_by_default():
+    statistics.reset()
+    parse_and_run("(+ 1 2)")
+    assert statistics.steps == 0
@@ -0,0 +1,72 @@
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+from pylisp.streams import Promise, stream_from_iterator, iterate_stream
+
+
+def parse_and_run(code, env=None):
+    if env is None:
+        env = environment_with_builtins(builtins)
+    return interpret(represent_code(Parser().parse_expr(code)), env)
+
+
+def test_promise_memoization():
+    calls = []
+    promise = Promise(lambda: calls.append(1) or len(calls))
+    assert promise.force() == 1
+    assert promise.force() == 1
+    assert calls == [1]
+
+
+def test_delay_force():
+    env = environment_with_builtins(builtins)
+    parse_and_run("(define! counter (alloc! 1))", env)
+    parse_and_run("(set! counter 0 0)", env)
+    parse_and_run("(define! p (delay (begin (set! counter 0 (+ 1 (get! counter 0))) 42)))", env)
+    assert parse_and_run("(get! counter 0)", env) == 0
+    assert parse_and_run("(+ (force p) (force p))", env) == 84
+    assert parse_and_run("(get! counter 0)", env) == 1
+    assert parse_and_run("(force 3)", env) == 3
+
+
+def test_generator_streams_are_lazy():
+    pulled = []
+
+    def source():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+    stream = stream_from_iterator(source())
+    assert pulled == [0]
+    assert list(iterate_stream(stream))[:3] == [0, 1, 2]
+    assert len(pulled) == 10
+
+
+def test_stream_builtins():
+    assert parse_and_run("(str (stream->list (stream-take 3 (range-stream 0 nil))))") == "(0 1 2)"
+    assert parse_and_run("(str (stream->list (range-stream 10 0 -3)))") == "(10 7 4 1)"
+    assert parse_and_run("(str (stream->list (stream-map (fun (x) (* x x)) (list->stream '(1 2 3)))))") == "(1 4 9)"
+    assert parse_and_run("(str (stream->list (stream-map str (list->stream '((1) 2)))))") == '("(1)" "2")'
+    code = "(stream-head (stream-filter (fun (x) (= 0 (mod x 1000))) (range-stream 1 nil)))"
+    assert parse_and_run(code) == 1000
+    code = "(letrec ((ones (stream-cons 1 ones))) (stream->list (stream-take 4 ones)))"
+    assert parse_and_run("(str " + code + ")") == "(1 1 1 1)"
+    assert parse_and_run("(stream->list (stream-take 5 nil))") is None
+    with pytest.raises(LispError):
+        parse_and_run("(stream-map (fun (x) x) 5)")
+
+
+def test_file_lines(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nbb\n\nccc\n")
+    assert parse_and_run(f'(str (stream->list (file-lines "{path}")))') == '("a" "bb" "" "ccc")'
+    with pytest.raises(LispError):
+        parse_and_run(f'(file-lines "{tmp_path / "missing.txt"}")')
+    binary = tmp_path / "binary.txt"
+    binary.write_bytes(b"a\n\xff\xfe\xfa\n")
+    with pytest.raises(LispError):
+        parse_and_run(f'(stream->list (file-lines "{binary}"))')
@@ -0,0 +1,44 @@
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.interpreter import interpret, represent_code
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+from pylisp.parser import Parser
+
+
+def parse_and_run(code):
+    return interpret(represent_code(Parser().parse_expr(code)), environment_with_builtins(builtins))
+
+
+def test_string_operations():
+    assert parse_and_run('(concat "ab" "c" "")') == "abc"
+    assert parse_and_run('(str-len "abc")') == 3
+    assert parse_and_run('(substring "abcdef" 2)') == "cdef"
+    assert parse_and_run('(substring "abcdef" 1 3)') == "bc"
+    assert parse_and_run('(str (split " a b  c "))') == '("a" "b" "c")'
+    assert parse_and_run('(str (split "a,b,,c" ","))') == '("a" "b" "" "c")'
+    assert parse_and_run('(join "-" (split "a,b,c" ","))') == "a-b-c"
+    assert parse_and_run('(join ", " nil)') == ""
+    with pytest.raises(LispError):
+        parse_and_run('(concat "a" 1)')
+    with pytest.raises(LispError):
+        parse_and_run('(substring "abc" 2 5)')
+    with pytest.raises(LispError):
+        parse_and_run('(join "," (list 1 2))')
+
+
+def test_format_number():
+    assert parse_and_run("(format-number 42)") == "42"
+    assert parse_and_run("(format-number 42 5)") == "   42"
+    assert parse_and_run('(format-number 42 5 "0")') == "00042"
+    assert parse_and_run('(format-number -42 5 "0")') == "-0042"
+
+
+def test_string_builder():
+    code = '(let (sb (string-builder!)) (begin (sb-append! sb "n=" 1) (sb-append! (sb-append! sb " ") (list 1 2)) sb))'
+    builder = parse_and_run(code)
+    assert builder.build() == "n=1 (1 2)"
+    assert builder.build() == "n=1 (1 2)"
+    assert builder.length == 9
+    assert parse_and_run("(sb-str (string-builder!))") == ""
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from pylisp.errors import LispError
+from pylisp.vector import PersistentVector
+from pylisp.interpreter import interpret, code_parser, lisp_data_to_str
+from pylisp.builtins import builtins
+from pylisp.environment import environment_with_builtins
+
+
+def run(code, env=None):
+    env = env if env is not None else environment_with_builtins(builtins)
+    result = None
+    for statement in code_parser().parse_file(code):
+        result = interpret(statement, env)
+    return result
+
+
+def test_against_list():
+    rng = random.Random(42)
+    for size in (0, 1, 31, 32, 33, 1024, 1056, 1057, 33 * 1024 + 1):
+        reference = list(range(size))
+        vector = PersistentVector.from_iterable(reference)
+        pushed = PersistentVector()
+        for value in reference:
+            pushed = pushed.push(value)
+        assert list(vector) == list(pushed) == reference
+        assert vector == pushed and hash(vector) == hash(pushed)
+        original = vector
+        for _ in range(200 if size else 0):
+            idx = rng.randrange(size)
+            reference[idx] = -idx
+            vector = vector.assoc(idx, -idx)
+        assert list(vector) == reference
+        assert all(vector.get(idx) == value for idx, value in enumerate(reference))
+        assert list(original) == list(range(size))
+
+
+def test_updates_share_structure():
+    vector = PersistentVector.from_iterable(range(2000))
+    updated = vector.assoc(5, "x")
+    assert updated.get(5) == "x" and vector.get(5) == 5
+    # only the path to the element is copied
+    assert updated._root is not vector._root
+    assert all(new is old for new, old in zip(updated._root.array[1:], vector._root.array[1:]))
+    assert updated._tail is vector._tail
+    assert vector.push(1)._root is vector._root
+    assert vector.assoc(5, 5) is vector
+
+
+def test_transients():
+    vector = PersistentVector.from_iterable(range(100))
+    transient = vector.transient()
+    for value in range(100, 1100):
+        transient.push(value)
+    transient.assoc(0, "a").assoc(1050, "b")
+    result = transient.persistent()
+    assert len(result) == 1100 and result.get(0) == "a" and result.get(1050) == "b" and result.get(99) == 99
+    assert list(vector) == list(range(100))
+    with pytest.raises(LispError):
+        transient.push(1)
+    again = result.transient()
+    again.assoc(0, "c")
+    assert result.get(0) == "a" and again.persistent().get(0) == "c"
+
+
+def test_elements_keep_their_type():
+    assert PersistentVector.from_iterable([1, 2]) == PersistentVector.from_iterable([1, 2])
+    assert PersistentVector.from_iterable([1, 2]) != PersistentVector.from_iterable([True, 2])
+    assert run("(hlen (hassoc (hassoc (hmap) (vec 1) 'one) (vec true) 't))") == 2
+
+
+def test_builtins():
+    env = environment_with_builtins(builtins)
+    run("(define! v (vec 1 2 3)) (define! w (vassoc (vpush v 4) 0 10))", env)
+    assert lisp_data_to_str(run("(list (vec->list v) (vec->list w) (vlen w) (vget w 3) (vec? v) (vec? nil))", env)) \
+        == "((1 2 3) (10 2 3 4) 4 4 True False)"
+    assert run("(vlen (list->vec '(1 2 3 4 5)))", env) == 5
+    assert lisp_data_to_str(run("(vec->list (persistent! (vassoc! (vpush! (transient v) 7) 0 0)))", env)) == "(0 2 3 7)"
+    assert lisp_data_to_str(run("v", env)) == "<vector of size 3>"
+    with pytest.raises(LispError):
+        run("(vget v 3)", env)
+    with pytest.raises(LispError):
+        run("(vassoc v -1 0)", env)
+    with pytest.raises(LispError):
+        run("(vpush! v 1)", env)
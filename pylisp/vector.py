@@ -0,0 +1,282 @@
+"""
+A persistent (immutable) vector implemented as a 32-way trie with a tail buffer.
+
+The elements are stored in the leaves of the trie in chunks of 32, the last (incomplete) chunk is kept aside
+in the tail, so appending to a vector usually only copies the tail. Lookups and updates are O(log32 n):
+updates copy only the nodes on the path from the root to the modified element, all other nodes are shared
+between the old and the new version of the vector.
+
+Building a vector element by element through persistent updates copies a path for every element, a transient vector
+instead modifies the nodes it has created (or copied) in place. Turning a transient into a persistent vector
+is O(1) and the transient cannot be used afterwards.
+"""
+from typing import Iterable
+
+from pylisp.errors import LispError
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+
+class _Edit:
+    """
+    The owner of the nodes created by a transient vector, they can be modified in place while it is active.
+    """
+    __slots__ = ("active",)
+
+    def __init__(self):
+        self.active = True
+
+
+class _Node:
+    """
+    A node of the trie, the array holds sub-nodes (in inner nodes) or elements (in leaves).
+    edit is the owner that can modify the node in place (None for nodes of persistent vectors).
+    """
+    __slots__ = ("edit", "array")
+
+    def __init__(self, edit, array: list):
+        self.edit = edit
+        self.array = array
+
+
+_empty_node = _Node(None, [])
+
+
+def _tail_offset(count: int) -> int:
+    """
+    Returns the index of the first element in the tail.
+    """
+    return 0 if count < _WIDTH else ((count - 1) >> _BITS) << _BITS
+
+
+def _new_path(edit, shift: int, node: _Node) -> _Node:
+    while shift > 0:
+        node = _Node(edit, [node])
+        shift -= _BITS
+    return node
+
+
+class Vector:
+    """
+    The operations shared by persistent and transient vectors.
+    """
+    __slots__ = ("_count", "_shift", "_root", "_tail")
+
+    def _array_for(self, idx: int) -> list:
+        if idx < 0 or idx >= self._count:
+            raise LispError(f"Index {idx} is out of bounds")
+        if idx >= _tail_offset(self._count):
+            return self._tail
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node.array[(idx >> level) & _MASK]
+            level -= _BITS
+        return node.array
+
+    def get(self, idx: int):
+        return self._array_for(idx)[idx & _MASK]
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        tail_offset = _tail_offset(self._count)
+        for base in range(0, tail_offset, _WIDTH):
+            yield from self._array_for(base)
+        yield from self._tail
+
+
+class PersistentVector(Vector):
+    """
+    An immutable vector, all 'modifying' operations return a new vector sharing most of its structure with the old one.
+    """
+    __slots__ = ("_hash",)
+
+    def __init__(self, count=0, shift=_BITS, root=_empty_node, tail=()):
+        self._count = count
+        self._shift = shift
+        self._root = root
+        self._tail = tail
+        self._hash = None
+
+    @staticmethod
+    def from_iterable(values: Iterable) -> "PersistentVector":
+        transient = TransientVector(_empty_vector)
+        for value in values:
+            transient.push(value)
+        return transient.persistent()
+
+    def assoc(self, idx: int, value) -> "PersistentVector":
+        """
+        Returns a vector with the element at idx replaced by value.
+        """
+        array = self._array_for(idx)
+        if array[idx & _MASK] is value:
+            return self
+        if array is self._tail:
+            slot = idx & _MASK
+            return PersistentVector(self._count, self._shift, self._root,
+                                    self._tail[:slot] + (value,) + self._tail[slot + 1:])
+        return PersistentVector(self._count, self._shift, self._assoc(self._shift, self._root, idx, value), self._tail)
+
+    @staticmethod
+    def _assoc(level: int, node: _Node, idx: int, value) -> _Node:
+        array = list(node.array)
+        if level == 0:
+            array[idx & _MASK] = value
+        else:
+            slot = (idx >> level) & _MASK
+            array[slot] = PersistentVector._assoc(level - _BITS, node.array[slot], idx, value)
+        return _Node(None, array)
+
+    def push(self, value) -> "PersistentVector":
+        """
+        Returns a vector with value appended.
+        """
+        if self._count - _tail_offset(self._count) < _WIDTH:
+            return PersistentVector(self._count + 1, self._shift, self._root, self._tail + (value,))
+        # the tail is full, it becomes a leaf of the trie
+        tail_node = _Node(None, list(self._tail))
+        shift = self._shift
+        if (self._count >> _BITS) > (1 << shift):  # the trie is full, it gets a new level
+            root = _Node(None, [self._root, _new_path(None, shift, tail_node)])
+            shift += _BITS
+        else:
+            root = self._push_tail(shift, self._root, tail_node)
+        return PersistentVector(self._count + 1, shift, root, (value,))
+
+    def _push_tail(self, level: int, parent: _Node, tail_node: _Node) -> _Node:
+        slot = ((self._count - 1) >> level) & _MASK
+        array = list(parent.array)
+        if level == _BITS:
+            inserted = tail_node
+        elif slot < len(parent.array):
+            inserted = self._push_tail(level - _BITS, parent.array[slot], tail_node)
+        else:
+            inserted = _new_path(None, level - _BITS, tail_node)
+        if slot < len(array):
+            array[slot] = inserted
+        else:
+            array.append(inserted)
+        return _Node(None, array)
+
+    def transient(self) -> "TransientVector":
+        return TransientVector(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, PersistentVector):
+            return False
+        # true and 1 are equal in Python, but not as elements of vectors
+        return self is other or len(self) == len(other) and all(type(a) is type(b) and a == b
+                                                                for a, b in zip(self, other))
+
+    def __hash__(self):
+        if self._hash is None:
+            elements = tuple(self)
+            self._hash = hash((PersistentVector, elements, tuple(map(type, elements))))
+        return self._hash
+
+    def __str__(self):
+        return f"<vector of size {len(self)}>"
+
+
+_empty_vector = PersistentVector()
+
+
+class TransientVector(Vector):
+    """
+    A mutable vector for building a persistent one (see the module documentation). It starts with the elements
+    of a persistent vector, which nodes are copied before they are modified.
+    """
+    __slots__ = ("_edit",)
+
+    def __init__(self, vector: PersistentVector):
+        self._edit = _Edit()
+        self._count = vector._count
+        self._shift = vector._shift
+        self._root = self._editable(vector._root)
+        self._tail = list(vector._tail)
+
+    def _editable(self, node: _Node) -> _Node:
+        if node.edit is self._edit:
+            return node
+        return _Node(self._edit, list(node.array))
+
+    def _ensure_active(self):
+        if not self._edit.active:
+            raise LispError("The transient vector has already been made persistent")
+
+    def get(self, idx: int):
+        self._ensure_active()
+        return super().get(idx)
+
+    def assoc(self, idx: int, value) -> "TransientVector":
+        """
+        Replaces the element at idx by value, returns this vector.
+        """
+        self._ensure_active()
+        array = self._array_for(idx)
+        if array is self._tail:
+            self._tail[idx & _MASK] = value
+            return self
+        node = self._root
+        level = self._shift
+        while level > 0:
+            slot = (idx >> level) & _MASK
+            child = self._editable(node.array[slot])
+            node.array[slot] = child
+            node = child
+            level -= _BITS
+        node.array[idx & _MASK] = value
+        return self
+
+    def push(self, value) -> "TransientVector":
+        """
+        Appends value, returns this vector.
+        """
+        self._ensure_active()
+        if self._count - _tail_offset(self._count) < _WIDTH:
+            self._tail.append(value)
+            self._count += 1
+            return self
+        tail_node = _Node(self._edit, self._tail)
+        self._tail = [value]
+        if (self._count >> _BITS) > (1 << self._shift):
+            self._root = _Node(self._edit, [self._root, _new_path(self._edit, self._shift, tail_node)])
+            self._shift += _BITS
+        else:
+            self._push_tail(self._shift, self._root, tail_node)
+        self._count += 1
+        return self
+
+    def _push_tail(self, level: int, parent: _Node, tail_node: _Node):
+        """
+        Inserts the tail node into the editable parent.
+        """
+        slot = ((self._count - 1) >> level) & _MASK
+        if level == _BITS:
+            parent.array.append(tail_node)
+        elif slot < len(parent.array):
+            child = self._editable(parent.array[slot])
+            parent.array[slot] = child
+            self._push_tail(level - _BITS, child, tail_node)
+        else:
+            parent.array.append(_new_path(self._edit, level - _BITS, tail_node))
+
+    def persistent(self) -> PersistentVector:
+        """
+        Returns a persistent vector of the elements, this vector cannot be used afterwards.
+        """
+        self._ensure_active()
+        self._edit.active = False
+        return PersistentVector(self._count, self._shift, self._root, tuple(self._tail))
+
+    def __len__(self):
+        self._ensure_active()
+        return self._count
+
+    def __str__(self):
+        return f"<transient vector of size {self._count}>"
@@ -1,26 +1,25 @@
 (define! defun (macro (name args body)
-                      (list 'define! name (list 'fun args body))
+                      `(define! ,name (fun ,args ,body))
                       ))
 
 (define! defmacro (macro (name args body)
-                         (list 'define! name (list 'macro args body))
+                         `(define! ,name (macro ,args ,body))
                          ))
 (defun id (x) x)
 (defmacro defrec (name args body)
-  (list define! name
-        (list 'letrec
-              (list (list name (list 'fun args body)))
-              name)
-        ))
+  `(define! ,name
+     (letrec ((,name (fun ,args ,body)))
+             ,name)
+     ))
 
 (defrec map (f list)
-  (if (= list nil)
+  (if (nil? list)
       nil
     (cons (f (head list)) (map f (tail list)))
     ))
 
 (defrec fold (f zero lst)
-  (if (= lst nil)
+  (if (nil? lst)
       zero
     (f (head lst) (fold f zero (tail lst)))
     )